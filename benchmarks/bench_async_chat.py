@@ -0,0 +1,95 @@
+"""
+Concurrent chat load: the sync DRF /ask/ endpoint vs the async /ask_async/.
+
+The LLM is replaced by a local OpenAI-compatible server that answers every
+chat completion after a fixed latency, so the numbers show how many
+in-flight LLM calls each endpoint can hold, not Groq's speed.
+
+1. Start the fake LLM:
+    python benchmarks/bench_async_chat.py llm-server --port 9100 --latency-ms 2000
+
+2. Start the app under ASGI, pointed at it (ANSWER_CACHE_ENABLED=false so
+   every request reaches the LLM, and a high 'ai_chat' rate in settings):
+    GROQ_BASE_URL=http://127.0.0.1:9100 ANSWER_CACHE_ENABLED=false \\
+        uvicorn config.asgi:application --port 8000 --workers 1
+
+3. Run the load against a completed document:
+    python benchmarks/bench_async_chat.py run --url http://127.0.0.1:8000 \\
+        --token <JWT access token> --document 1 --concurrency 8 32 64
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from documents.fake_llm import FakeLLMServer  # noqa: E402
+
+
+async def load(client, path, token, concurrency, requests_per_client):
+    latencies, errors = [], 0
+
+    async def worker(worker_id):
+        nonlocal errors
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            response = await client.post(
+                path,
+                json={"question": f"What are the payment terms? ({worker_id}-{i})"},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    return time.perf_counter() - start, sorted(latencies), errors
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.url, timeout=300, limits=limits) as client:
+        print(f"{'endpoint':<12} {'clients':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+        for concurrency in args.concurrency:
+            for name in ('ask', 'ask_async'):
+                path = f"/api/documents/{args.document}/{name}/"
+                elapsed, latencies, errors = await load(client, path, args.token, concurrency, args.requests)
+                p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+                print(
+                    f"{name:<12} {concurrency:>7} {len(latencies) / elapsed:>8.1f} "
+                    f"{statistics.median(latencies):>9.0f} {p95:>9.0f} {errors:>7}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    server_parser = subparsers.add_parser('llm-server', help="Serve fake chat completions")
+    server_parser.add_argument('--port', type=int, default=9100)
+    server_parser.add_argument('--latency-ms', type=float, default=2000)
+
+    run_parser = subparsers.add_parser('run', help="Load /ask/ and /ask_async/")
+    run_parser.add_argument('--url', default='http://127.0.0.1:8000')
+    run_parser.add_argument('--token', required=True)
+    run_parser.add_argument('--document', type=int, required=True)
+    run_parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 32, 64])
+    run_parser.add_argument('--requests', type=int, default=5, help="Requests per client")
+    args = parser.parse_args()
+
+    if args.command == 'llm-server':
+        server = FakeLLMServer(reply="Benchmark answer [Page 1].", latency_ms=args.latency_ms, port=args.port)
+        print(f"Fake LLM on http://127.0.0.1:{args.port} ({args.latency_ms:.0f}ms per completion)")
+        server.serve_forever()
+    else:
+        asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Before/after benchmark for chunk ingestion in analyze_document_task.
+
+Uses a stub model (no torch download needed) whose cost is a fixed
+per-call overhead plus a small per-text cost, which is how a real
+SentenceTransformer behaves on CPU. DB writes are simulated with a fixed
+round-trip latency per INSERT statement.
+
+Usage:
+    python benchmarks/bench_batch_embedding.py --chunks 2000
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings  # noqa: E402
+
+if not settings.configured:
+    settings.configure(EMBEDDING_BATCH_SIZE=32)
+
+from documents import embeddings  # noqa: E402
+from benchmarks.stubs import StubModel  # noqa: E402
+
+
+def simulate_inserts(statement_count, latency_ms):
+    time.sleep(statement_count * latency_ms / 1000)
+
+
+def run_before(chunks, insert_latency_ms):
+    # One forward pass and one INSERT per chunk (the old task loop)
+    for chunk in chunks:
+        embeddings.get_embedding(chunk)
+        simulate_inserts(1, insert_latency_ms)
+
+
+def run_after(chunks, batch_size, bulk_size, insert_latency_ms):
+    embeddings.get_embeddings(chunks, batch_size=batch_size)
+    simulate_inserts(math.ceil(len(chunks) / bulk_size), insert_latency_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chunks', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--bulk-size', type=int, default=500)
+    parser.add_argument('--call-overhead-ms', type=float, default=8.0)
+    parser.add_argument('--per-text-ms', type=float, default=1.5)
+    parser.add_argument('--insert-latency-ms', type=float, default=0.5)
+    args = parser.parse_args()
+
+    chunks = [f"chunk {i} " + "lorem ipsum " * 80 for i in range(args.chunks)]
+    stub = StubModel(args.call_overhead_ms, args.per_text_ms)
+    embeddings._model = stub
+
+    start = time.perf_counter()
+    run_before(chunks, args.insert_latency_ms)
+    before = time.perf_counter() - start
+    before_calls = stub.calls
+
+    stub.calls = 0
+    start = time.perf_counter()
+    run_after(chunks, args.batch_size, args.bulk_size, args.insert_latency_ms)
+    after = time.perf_counter() - start
+
+    print(f"chunks: {args.chunks}, batch_size: {args.batch_size}, bulk_size: {args.bulk_size}")
+    print(f"before: {args.chunks / before:8.1f} chunks/s  ({before_calls} encode calls, {args.chunks} INSERTs)")
+    print(f"after:  {args.chunks / after:8.1f} chunks/s  ({stub.calls} encode calls, "
+          f"{math.ceil(args.chunks / args.bulk_size)} INSERTs)")
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
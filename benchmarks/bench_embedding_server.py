@@ -0,0 +1,93 @@
+"""
+Throughput of get_embedding() under concurrent load: 'local' backend vs
+the shared embedding server with micro-batching.
+
+Both modes share one stub model (see benchmarks/stubs.py), so the only
+difference is whether concurrent single-text requests are batched.
+
+Usage:
+    python benchmarks/bench_embedding_server.py --clients 32 --requests 20
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings  # noqa: E402
+
+if not settings.configured:
+    settings.configure(
+        EMBEDDING_BATCH_SIZE=32,
+        EMBEDDING_SERVER_URL='http://127.0.0.1:0',
+        EMBEDDING_SERVER_TIMEOUT=30,
+        EMBEDDING_SERVER_FALLBACK=False,
+    )
+
+from documents import embeddings  # noqa: E402
+from documents.embedding_server import MicroBatcher, make_server  # noqa: E402
+from benchmarks.stubs import StubModel  # noqa: E402
+
+
+def run_clients(backend_factory, clients, requests_per_client):
+    def client(worker_id):
+        backend = backend_factory()
+        for i in range(requests_per_client):
+            backend.encode([f"question {worker_id}-{i} about the contract"], 1)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=20, help="Requests per client")
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=10)
+    # Roughly a short question through mpnet on one CPU core
+    parser.add_argument('--call-overhead-ms', type=float, default=25.0)
+    parser.add_argument('--per-text-ms', type=float, default=3.0)
+    args = parser.parse_args()
+
+    stub = StubModel(args.call_overhead_ms, args.per_text_ms)
+    embeddings._model = stub
+    total = args.clients * args.requests
+
+    # 1. Local: every request runs its own forward pass
+    local_elapsed = run_clients(embeddings.LocalBackend, args.clients, args.requests)
+    local_calls = stub.calls
+
+    # 2. Server: requests are merged into micro-batches
+    stub.calls = 0
+    local = embeddings.LocalBackend()
+    batcher = MicroBatcher(
+        lambda texts: local.encode(texts, args.max_batch_size),
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+    )
+    server = make_server('127.0.0.1', 0, batcher)
+    host, port = server.server_address
+    settings.EMBEDDING_SERVER_URL = f"http://{host}:{port}"
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        server_elapsed = run_clients(embeddings.ServerBackend, args.clients, args.requests)
+    finally:
+        server.shutdown()
+        batcher.stop()
+
+    print(f"{args.clients} concurrent clients x {args.requests} requests = {total} texts")
+    print(f"local:  {total / local_elapsed:8.1f} texts/s  ({local_calls} forward passes)")
+    print(f"server: {total / server_elapsed:8.1f} texts/s  ({stub.calls} forward passes, "
+          f"max_batch_size={args.max_batch_size}, max_wait_ms={args.max_wait_ms})")
+    print(f"speedup: {local_elapsed / server_elapsed:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
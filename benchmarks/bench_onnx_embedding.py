@@ -0,0 +1,82 @@
+"""
+CPU latency/throughput of the embedding backends: PyTorch fp32 vs ONNX
+Runtime fp32 vs ONNX Runtime int8.
+
+Needs the real model plus an exported ONNX copy:
+    python manage.py export_onnx_embedding_model
+    python benchmarks/bench_onnx_embedding.py --threads 4
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings  # noqa: E402
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def configure(threads, model_dir):
+    if not settings.configured:
+        settings.configure(
+            EMBEDDING_BATCH_SIZE=32,
+            EMBEDDING_ONNX_MODEL_DIR=model_dir,
+            EMBEDDING_ONNX_QUANTIZED=True,
+            EMBEDDING_ONNX_THREADS=threads,
+        )
+
+
+def measure(backend, question, chunks, repeats, batch_size):
+    backend.encode([question], 1)  # Warm up (loads the model)
+
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        backend.encode([question], 1)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    backend.encode(chunks, batch_size)
+    throughput = len(chunks) / (time.perf_counter() - start)
+
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1], throughput
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=0, help="ONNX intra-op threads (0 = auto)")
+    parser.add_argument('--model-dir', default=os.path.join(BASE_DIR, 'models', 'all-mpnet-base-v2-onnx'))
+    parser.add_argument('--repeats', type=int, default=50, help="Single-question latency samples")
+    parser.add_argument('--chunks', type=int, default=256, help="1000-char chunks for the throughput run")
+    parser.add_argument('--batch-size', type=int, default=32)
+    args = parser.parse_args()
+
+    configure(args.threads, args.model_dir)
+    from documents.embeddings import LocalBackend, OnnxBackend
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    question = "What is the termination notice period in this contract?"
+    chunks = [(f"Clause {i}. " + "The parties agree to the terms set out below. " * 25)[:1000]
+              for i in range(args.chunks)]
+
+    backends = [
+        ('torch fp32', LocalBackend()),
+        ('onnx fp32', OnnxBackend(quantized=False)),
+        ('onnx int8', OnnxBackend(quantized=True)),
+    ]
+
+    print(f"{'backend':<12}{'p50 ms':>10}{'p95 ms':>10}{'chunks/s':>12}")
+    for label, backend in backends:
+        p50, p95, throughput = measure(backend, question, chunks, args.repeats, args.batch_size)
+        print(f"{label:<12}{p50:>10.1f}{p95:>10.1f}{throughput:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Peak memory and time of ingestion on a synthetic PDF: the old
+"full_text += page, then chunk, then embed everything" approach vs the
+streaming page -> chunk -> batch pipeline in documents/pipeline.py.
+
+Embedding uses the stub model with zero cost and DB writes are skipped,
+so the numbers isolate extraction, chunking and vector buffering.
+
+Usage:
+    python benchmarks/bench_streaming_ingest.py --pages 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings  # noqa: E402
+
+if not settings.configured:
+    settings.configure(EMBEDDING_BATCH_SIZE=32)
+
+from documents import embeddings  # noqa: E402
+from documents.extractors import FitzExtractor  # noqa: E402
+from documents.pipeline import batched, with_page_breaks, sliding_window_chunks, strip_stream, TextStats  # noqa: E402
+from benchmarks.stubs import StubModel  # noqa: E402
+
+PARAGRAPH = (
+    "Section {n}. The service provider shall maintain the systems described in "
+    "Schedule B and report incidents within four hours of detection. "
+)
+
+
+def build_pdf(path, pages):
+    pdf = fitz.open()
+    for n in range(pages):
+        page = pdf.new_page()
+        page.insert_textbox(fitz.Rect(36, 36, 560, 800), PARAGRAPH.format(n=n) * 20, fontsize=7)
+    pdf.save(path)
+
+
+def run_before(path):
+    doc = fitz.open(path)
+    full_text = ""
+    for page in doc:
+        full_text += page.get_text() + "\n"
+    full_text = full_text.strip()
+
+    chunks = []
+    for i in range(0, len(full_text), 800):
+        chunk = full_text[i:i + 1000]
+        if len(chunk.strip()) > 50:
+            chunks.append(chunk)
+
+    vectors = embeddings.get_embeddings(chunks)
+    return len(vectors)
+
+
+def run_after(path):
+    pages = FitzExtractor().iter_pages(path)
+    stats = TextStats()
+    count = 0
+    for batch in batched(sliding_window_chunks(stats.track(strip_stream(with_page_breaks(pages)))), 32):
+        embeddings.get_embeddings(batch)  # Rows would be bulk-written here and released
+        count += len(batch)
+    return count
+
+
+def measure(fn, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunk_count = fn(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return chunk_count, elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=2000)
+    args = parser.parse_args()
+
+    embeddings._model = StubModel(call_overhead_ms=0, per_text_ms=0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'synthetic.pdf')
+        build_pdf(path, args.pages)
+        print(f"Synthetic PDF: {args.pages} pages, {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+
+        for label, fn in (('before', run_before), ('after', run_after)):
+            chunks, elapsed, peak = measure(fn, path)
+            print(f"{label:<7} {chunks} chunks  {elapsed:6.2f}s  peak Python memory {peak:8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
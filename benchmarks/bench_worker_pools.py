@@ -0,0 +1,116 @@
+"""
+Analysis throughput on a mixed workload: one prefork pool running every
+task (the old single `celery worker`) vs CPU tasks on a prefork pool and
+LLM calls on a high-concurrency pool (the 'embed' / 'llm' queues in
+config/celery.py).
+
+Each document is `--shards` CPU tasks (a busy loop of `--cpu-ms`, standing
+in for extraction and embedding) plus one summary: an HTTP chat completion
+against a local fake LLM that answers after `--llm-ms`. Tasks are queued in
+the order analyze_document_task fans them out.
+
+The pools are modelled with concurrent.futures, so no broker is needed: a
+process pool behaves like Celery's prefork pool, and for tasks that only
+wait on a socket a thread pool behaves like the gevent pool.
+
+Usage:
+    python benchmarks/bench_worker_pools.py --documents 16 --shards 3 --cpu-ms 100 --llm-ms 1000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from documents.fake_llm import FakeLLMServer  # noqa: E402
+
+
+def cpu_task(cpu_ms):
+    """Burns `cpu_ms` of CPU time, like encoding a shard of chunks."""
+    end = time.process_time() + cpu_ms / 1000
+    value = 0
+    while time.process_time() < end:
+        value = (value * 31 + 7) % 1000003
+    return value
+
+
+def llm_task(base_url):
+    """One chat completion, like summarize_document_task."""
+    response = httpx.post(
+        f"{base_url}/openai/v1/chat/completions",
+        json={"model": "llama-3.3-70b-versatile", "messages": [{"role": "user", "content": "Summarize."}]},
+        timeout=60,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def run(workload, cpu_pool, llm_pool):
+    """Submits `workload` ([(document, kind, args)]) and returns (elapsed, per-document finish times)."""
+    finished = {}
+    futures = []
+    start = time.perf_counter()
+
+    for document, kind, args in workload:
+        pool, fn = (cpu_pool, cpu_task) if kind == 'cpu' else (llm_pool, llm_task)
+        future = pool.submit(fn, *args)
+        future.add_done_callback(
+            lambda _, document=document: finished.__setitem__(document, time.perf_counter() - start)
+        )
+        futures.append(future)
+
+    wait(futures)
+    for future in futures:
+        future.result()  # Surface any failure
+    return time.perf_counter() - start, finished
+
+
+def report(label, elapsed, finished, documents):
+    latencies = sorted(finished.values())
+    print(
+        f"{label:<34} {elapsed:7.2f}s  {documents / elapsed:6.2f} docs/s  "
+        f"p50 {statistics.median(latencies):6.2f}s  last {latencies[-1]:6.2f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=16)
+    parser.add_argument('--shards', type=int, default=3, help="CPU tasks per document")
+    parser.add_argument('--cpu-ms', type=float, default=100, help="CPU time per shard")
+    parser.add_argument('--llm-ms', type=float, default=1000, help="LLM latency per summary")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help="Prefork size (cores)")
+    parser.add_argument('--green-concurrency', type=int, default=50, help="LLM pool size")
+    args = parser.parse_args()
+
+    with FakeLLMServer(latency_ms=args.llm_ms) as llm:
+        workload = []
+        for document in range(args.documents):
+            workload += [(document, 'cpu', (args.cpu_ms,)) for _ in range(args.shards)]
+            workload.append((document, 'llm', (llm.url,)))
+
+        print(
+            f"{args.documents} documents x ({args.shards} x {args.cpu_ms:g} ms CPU + {args.llm_ms:g} ms LLM), "
+            f"{args.processes} core(s)\n"
+        )
+
+        # 1. One prefork pool: an LLM wait holds a process that could be encoding
+        with ProcessPoolExecutor(args.processes) as pool:
+            pool.submit(cpu_task, 0).result()  # Start the workers before timing
+            elapsed, finished = run(workload, pool, pool)
+        report(f"single prefork x{args.processes}", elapsed, finished, args.documents)
+
+        # 2. Split queues: prefork for CPU, many cheap waiters for the LLM
+        with ProcessPoolExecutor(args.processes) as cpu_pool, ThreadPoolExecutor(args.green_concurrency) as llm_pool:
+            cpu_pool.submit(cpu_task, 0).result()
+            elapsed, finished = run(workload, cpu_pool, llm_pool)
+        report(f"embed prefork x{args.processes} + llm x{args.green_concurrency}", elapsed, finished, args.documents)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""Shared stand-ins for the benchmarks (no model downloads, no API keys)."""
+import threading
+import time
+
+import numpy as np
+
+
+class StubModel:
+    """
+    Mimics SentenceTransformer.encode() timing without loading weights.
+
+    Cost is a fixed per-call overhead plus a per-text cost. Calls are
+    serialized with a lock, like a CPU-bound forward pass competing for
+    the same cores.
+    """
+
+    def __init__(self, call_overhead_ms=8.0, per_text_ms=1.5, dimensions=768):
+        self.call_overhead = call_overhead_ms / 1000
+        self.per_text = per_text_ms / 1000
+        self.dimensions = dimensions
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        single = isinstance(sentences, str)
+        count = 1 if single else len(sentences)
+        with self._lock:
+            self.calls += 1
+            time.sleep(self.call_overhead + self.per_text * count)
+        vectors = np.random.rand(count, self.dimensions).astype(np.float32)
+        return vectors[0] if single else vectors
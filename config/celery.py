@@ -1,5 +1,7 @@
 import os
-from celery import Celery
+import sys
+
+from celery import Celery, signals
 
 # 1. Set the default Django settings module
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
@@ -11,4 +13,44 @@ app = Celery('config')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # 4. Auto-discover tasks in all installed apps
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+# 5. Route work by what it waits on (see docker-compose.yml for the workers):
+#    embed  CPU-bound (PDF extraction, chunking, in-process embedding): prefork pool, one process per core
+#    llm    network-bound calls (Groq, the embedding server): gevent pool, many calls in flight per process
+#    celery the default queue: short bookkeeping (chord callbacks, dispatch), served by the llm worker
+EMBED_QUEUE = 'embed'
+LLM_QUEUE = 'llm'
+
+
+def route_embedding(name, args, kwargs, options, task=None, **kw):
+    """
+    embed_chunks_task only waits on HTTP when the model runs in the embedding
+    server (EMBEDDING_BACKEND='server'): a prefork process per core would sit
+    idle on the socket, so it goes to the gevent pool. The 'local' and 'onnx'
+    backends run the model in the worker and stay on the CPU queue.
+    """
+    if name != 'documents.tasks.embed_chunks_task':
+        return None
+    from django.conf import settings
+    return {'queue': LLM_QUEUE if settings.EMBEDDING_BACKEND == 'server' else EMBED_QUEUE}
+
+
+app.conf.task_routes = (
+    route_embedding,
+    {
+        'documents.tasks.analyze_document_task': {'queue': EMBED_QUEUE},
+        'documents.tasks.summarize_document_task': {'queue': LLM_QUEUE},
+    },
+)
+
+
+# 6. Green-thread workers: let psycopg2 yield to other greenlets while it waits on Postgres
+@signals.worker_init.connect
+def patch_psycopg_for_gevent(**kwargs):
+    if 'gevent' not in sys.modules:
+        return
+    from gevent import monkey
+    if monkey.is_module_patched('socket'):
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
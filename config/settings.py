@@ -87,6 +87,7 @@ REST_FRAMEWORK = {
         'anon': '10/minute',   # Guests can only try 10 times (e.g. Login attempts)
         'user': '100/minute',  # Logged in users get 100 requests/min
         'uploads': '5/minute', # Special scope for heavy uploads
+        'bulk_uploads': '2/minute', # Many files per request (see BULK_UPLOAD_MAX_FILES)
         'ai_chat': '20/minute', # Limit AI calls to save $$$
     }
 }
@@ -110,6 +111,151 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 CELERY_BROKER_URL = 'redis://redis:6379/0'
 CELERY_RESULT_BACKEND = 'redis://redis:6379/0'
 
+# Live analysis progress (GET /documents/{id}/progress/, Server-Sent Events)
+PROGRESS_REDIS_URL = config('PROGRESS_REDIS_URL', default=CELERY_BROKER_URL)  # Pub/sub + replay; empty = in-process only
+PROGRESS_REPLAY_SIZE = config('PROGRESS_REPLAY_SIZE', default=100, cast=int)  # Events kept per document for late subscribers
+PROGRESS_EVENT_TTL = config('PROGRESS_EVENT_TTL', default=3600, cast=int)  # Seconds the replay buffer outlives the last event
+PROGRESS_KEEPALIVE = config('PROGRESS_KEEPALIVE', default=15, cast=float)  # Seconds between keep-alive comments
+PROGRESS_STREAM_TIMEOUT = config('PROGRESS_STREAM_TIMEOUT', default=600, cast=float)  # Seconds; EventSource reconnects
+
+# Fair analysis scheduler (documents/scheduler.py): only this many analyses are ever in the broker queue
+ANALYSIS_MAX_IN_FLIGHT = config('ANALYSIS_MAX_IN_FLIGHT', default=16, cast=int)  # All users together
+ANALYSIS_MAX_IN_FLIGHT_PER_USER = config('ANALYSIS_MAX_IN_FLIGHT_PER_USER', default=4, cast=int)
+ANALYSIS_JOB_TIMEOUT = config('ANALYSIS_JOB_TIMEOUT', default=3600, cast=int)  # Seconds without a heartbeat before a running job is requeued
+ANALYSIS_HEARTBEAT_INTERVAL = config('ANALYSIS_HEARTBEAT_INTERVAL', default=60, cast=float)  # Seconds between a worker's heartbeat writes
+ANALYSIS_DISPATCH_INTERVAL = config('ANALYSIS_DISPATCH_INTERVAL', default=60, cast=float)  # Seconds, via celery beat
+
+CELERY_BEAT_SCHEDULE = {
+    # Recovers from a broker outage or a crashed worker; normally dispatch runs on every schedule/finish
+    'dispatch-analyses': {
+        'task': 'documents.tasks.dispatch_analysis_task',
+        'schedule': ANALYSIS_DISPATCH_INTERVAL,
+    },
+}
+
+# --- EMBEDDINGS & INGEST ---
+EMBEDDING_BATCH_SIZE = config('EMBEDDING_BATCH_SIZE', default=32, cast=int)  # Texts per forward pass
+CHUNK_BULK_CREATE_BATCH_SIZE = config('CHUNK_BULK_CREATE_BATCH_SIZE', default=500, cast=int)  # Rows per INSERT
+EMBEDDING_SHARD_SIZE = config('EMBEDDING_SHARD_SIZE', default=256, cast=int)  # Chunks per embed_chunks_task
+
+# Bulk ingest (POST /documents/bulk_upload/): files are spooled to disk, never held in memory
+BULK_UPLOAD_MAX_FILES = config('BULK_UPLOAD_MAX_FILES', default=200, cast=int)  # Files per request
+DATA_UPLOAD_MAX_NUMBER_FILES = BULK_UPLOAD_MAX_FILES  # Django rejects larger multipart requests outright
+
+# PDF text extraction: 'fitz', 'fitz_parallel' (process pool over page ranges) or 'pypdf2'.
+# Analysis runs in Celery prefork children, which are daemonic and can't start a pool, so 'fitz'
+# is the default there; 'fitz_parallel' only pays off in non-daemonic processes (scripts, threads/solo pools).
+PDF_EXTRACTOR = config('PDF_EXTRACTOR', default='fitz')
+PDF_EXTRACTION_WORKERS = config('PDF_EXTRACTION_WORKERS', default=os.cpu_count() or 1, cast=int)
+PDF_PARALLEL_MIN_PAGES = config('PDF_PARALLEL_MIN_PAGES', default=200, cast=int)  # Smaller PDFs are read sequentially
+PDF_PAGES_PER_TASK = config('PDF_PAGES_PER_TASK', default=50, cast=int)  # Page range handed to each pool worker
+
+# Where get_embedding() runs the model: 'local' (in this process), 'server'
+# (shared process started with `python manage.py run_embedding_server`)
+# or 'onnx' (ONNX Runtime on CPU, see `python manage.py export_onnx_embedding_model`)
+EMBEDDING_BACKEND = config('EMBEDDING_BACKEND', default='local')
+EMBEDDING_SERVER_URL = config('EMBEDDING_SERVER_URL', default='http://embedder:8001')
+EMBEDDING_SERVER_TIMEOUT = config('EMBEDDING_SERVER_TIMEOUT', default=30, cast=float)  # Seconds
+EMBEDDING_SERVER_FALLBACK = config('EMBEDDING_SERVER_FALLBACK', default=True, cast=bool)  # Encode locally if server is down
+EMBEDDING_SERVER_MAX_BATCH_SIZE = config('EMBEDDING_SERVER_MAX_BATCH_SIZE', default=64, cast=int)
+EMBEDDING_SERVER_MAX_WAIT_MS = config('EMBEDDING_SERVER_MAX_WAIT_MS', default=10, cast=float)
+EMBEDDING_ONNX_MODEL_DIR = config('EMBEDDING_ONNX_MODEL_DIR', default=os.path.join(BASE_DIR, 'models', 'all-mpnet-base-v2-onnx'))
+EMBEDDING_ONNX_QUANTIZED = config('EMBEDDING_ONNX_QUANTIZED', default=True, cast=bool)  # Use the int8 model
+EMBEDDING_ONNX_THREADS = config('EMBEDDING_ONNX_THREADS', default=0, cast=int)  # 0 = let ONNX Runtime decide
+
+# Two-level cache for question embeddings (L1 in-process LRU, L2 Redis)
+QUERY_EMBEDDING_CACHE_ENABLED = config('QUERY_EMBEDDING_CACHE_ENABLED', default=True, cast=bool)
+QUERY_EMBEDDING_CACHE_SIZE = config('QUERY_EMBEDDING_CACHE_SIZE', default=1024, cast=int)  # L1 entries per process
+QUERY_EMBEDDING_CACHE_TTL = config('QUERY_EMBEDDING_CACHE_TTL', default=3600, cast=int)  # L1 seconds
+QUERY_EMBEDDING_REDIS_URL = config('QUERY_EMBEDDING_REDIS_URL', default=CELERY_BROKER_URL)  # Empty = L1 only
+QUERY_EMBEDDING_REDIS_TTL = config('QUERY_EMBEDDING_REDIS_TTL', default=86400, cast=int)  # L2 seconds
+
+# LLM calls (llm_client): pooled connections, timeouts, retries with jittered backoff, circuit breaker
+LLM_CONNECT_TIMEOUT = config('LLM_CONNECT_TIMEOUT', default=5.0, cast=float)  # Seconds
+LLM_TIMEOUT = config('LLM_TIMEOUT', default=30.0, cast=float)  # Seconds per read (time between bytes)
+LLM_MAX_CONNECTIONS = config('LLM_MAX_CONNECTIONS', default=20, cast=int)  # Pool size per process
+LLM_MAX_RETRIES = config('LLM_MAX_RETRIES', default=2, cast=int)  # On 429, 5xx, timeouts, connection errors
+LLM_RETRY_BASE_DELAY = config('LLM_RETRY_BASE_DELAY', default=0.5, cast=float)  # Backoff ceiling doubles per retry
+LLM_RETRY_MAX_DELAY = config('LLM_RETRY_MAX_DELAY', default=8.0, cast=float)  # Longer Retry-After = give up now
+LLM_BREAKER_THRESHOLD = config('LLM_BREAKER_THRESHOLD', default=5, cast=int)  # Consecutive failures to open
+LLM_BREAKER_RESET = config('LLM_BREAKER_RESET', default=30.0, cast=float)  # Seconds open before a trial call
+
+# Semantic cache for ask/global_ask answers (keyed on document content_version)
+ANSWER_CACHE_ENABLED = config('ANSWER_CACHE_ENABLED', default=True, cast=bool)
+ANSWER_CACHE_TTL = config('ANSWER_CACHE_TTL', default=86400, cast=int)  # Seconds
+ANSWER_CACHE_SIMILARITY_THRESHOLD = config('ANSWER_CACHE_SIMILARITY_THRESHOLD', default=0.95, cast=float)  # Paraphrase match
+ANSWER_CACHE_MAX_ENTRIES_PER_SCOPE = config('ANSWER_CACHE_MAX_ENTRIES_PER_SCOPE', default=100, cast=int)
+ANSWER_CACHE_REDIS_URL = config('ANSWER_CACHE_REDIS_URL', default=CELERY_BROKER_URL)  # Empty = in-process only
+
+# --- VECTOR SEARCH ---
+# hnsw.ef_search for ask/global_ask: higher = better recall, slower queries.
+# Tune with: python manage.py vector_recall --ef-search 20,40,100
+VECTOR_SEARCH_EF_SEARCH = config('VECTOR_SEARCH_EF_SEARCH', default=40, cast=int)
+# Filtered searches (one owner / one document) on pgvector >= 0.8 keep scanning the graph until
+# enough rows pass the filter: 'relaxed_order', 'strict_order' or 'off'. Older pgvector (and a
+# scan that hits the tuple cap) falls back to an exact scan of the filtered rows.
+VECTOR_SEARCH_ITERATIVE_SCAN = config('VECTOR_SEARCH_ITERATIVE_SCAN', default='relaxed_order')
+VECTOR_SEARCH_MAX_SCAN_TUPLES = config('VECTOR_SEARCH_MAX_SCAN_TUPLES', default=100000, cast=int)
+
+# Which HNSW index vector search uses: 'full' (float32), 'halfvec' (16-bit floats, half the
+# index size) or 'binary' (1 bit per dimension + exact cosine re-rank of OVERSAMPLE x k candidates).
+# Compact modes need pgvector >= 0.7: python manage.py vector_storage enable halfvec
+VECTOR_STORAGE = config('VECTOR_STORAGE', default='full')
+VECTOR_BINARY_OVERSAMPLE = config('VECTOR_BINARY_OVERSAMPLE', default=4, cast=int)
+
+# global_ask for small corpora: keep each user's chunk embeddings as one NumPy matrix in memory
+# (top-k = one matrix-vector product) instead of querying pgvector. Users with more than
+# USER_VECTOR_CACHE_MAX_CHUNKS chunks stay on pgvector. With USER_VECTOR_CACHE_DIR set,
+# matrices are saved there and memory-mapped, so worker processes share one copy.
+USER_VECTOR_CACHE_ENABLED = config('USER_VECTOR_CACHE_ENABLED', default=False, cast=bool)
+USER_VECTOR_CACHE_MAX_CHUNKS = config('USER_VECTOR_CACHE_MAX_CHUNKS', default=20000, cast=int)
+USER_VECTOR_CACHE_MAX_USERS = config('USER_VECTOR_CACHE_MAX_USERS', default=1000, cast=int)
+USER_VECTOR_CACHE_MAX_MB = config('USER_VECTOR_CACHE_MAX_MB', default=512, cast=int)
+USER_VECTOR_CACHE_TTL = config('USER_VECTOR_CACHE_TTL', default=3600, cast=int)
+USER_VECTOR_CACHE_DIR = config('USER_VECTOR_CACHE_DIR', default='')
+
+# --- ASYNC (ASGI) CHAT ENDPOINTS ---
+# Threads that compute question embeddings for ask_async/global_ask_async
+ASYNC_EMBEDDING_WORKERS = config('ASYNC_EMBEDDING_WORKERS', default=4, cast=int)
+
+# Retrieval for ask/global_ask: 'vector' (cosine only) or 'hybrid' (vector + full-text,
+# merged with reciprocal rank fusion). Requests can override with {"retrieval": "hybrid"}.
+RETRIEVAL_MODE = config('RETRIEVAL_MODE', default='vector')
+RETRIEVAL_CANDIDATES = config('RETRIEVAL_CANDIDATES', default=20, cast=int)  # Per retriever, before fusion
+RETRIEVAL_RRF_K = config('RETRIEVAL_RRF_K', default=60, cast=int)
+
+# LLM context: overlapping neighbour chunks are merged, then spans packed by relevance into this many tokens
+CONTEXT_TOKEN_BUDGET = config('CONTEXT_TOKEN_BUDGET', default=2000, cast=int)
+CONTEXT_TOKENIZER_ENCODING = config('CONTEXT_TOKENIZER_ENCODING', default='cl100k_base')  # tiktoken encoding
+
+# Document analysis: texts longer than one prompt (15,000 chars) are summarized map-reduce style
+# ('prefix' = old behaviour, only the first 15,000 characters are read)
+SUMMARY_MODE = config('SUMMARY_MODE', default='map_reduce')
+SUMMARY_SECTION_TOKENS = config('SUMMARY_SECTION_TOKENS', default=3000, cast=int)  # Per map (section) call
+SUMMARY_REDUCE_TOKENS = config('SUMMARY_REDUCE_TOKENS', default=6000, cast=int)  # Notes sent to the final call
+SUMMARY_CONCURRENCY = config('SUMMARY_CONCURRENCY', default=4, cast=int)  # Section calls in flight per task
+SUMMARY_CACHE_REDIS_URL = config('SUMMARY_CACHE_REDIS_URL', default=CELERY_BROKER_URL)  # Empty = no section cache
+SUMMARY_SECTION_CACHE_TTL = config('SUMMARY_SECTION_CACHE_TTL', default=30 * 86400, cast=int)  # Seconds, 0 = forever
+
+# Persistent cache of LLM analyses, keyed on the extracted text's hash + prompt version + model
+ANALYSIS_CACHE_ENABLED = config('ANALYSIS_CACHE_ENABLED', default=True, cast=bool)
+ANALYSIS_CACHE_TTL = config('ANALYSIS_CACHE_TTL', default=90 * 86400, cast=int)  # Seconds, 0 = never expires
+ANALYSIS_CACHE_MAX_ENTRIES = config('ANALYSIS_CACHE_MAX_ENTRIES', default=10000, cast=int)  # LRU beyond this
+# A file whose bytes were already analyzed gets a copy of that analysis, from any user's document. Shared handbooks
+# are then analyzed once, but a near-instant analysis tells the uploader someone else has the file: set False to
+# copy only from the uploader's own documents when users must not learn anything about each other's files.
+ANALYSIS_DEDUP_ACROSS_OWNERS = config('ANALYSIS_DEDUP_ACROSS_OWNERS', default=True, cast=bool)
+
+# Optional cross-encoder reranking: over-fetch RERANK_CANDIDATES chunks, keep the best k.
+# If scoring takes longer than RERANK_BUDGET_MS the retrieval order is used instead.
+# Requests can opt in/out with {"rerank": true} and lower the budget with {"rerank_budget_ms": 80}.
+RERANK_ENABLED = config('RERANK_ENABLED', default=False, cast=bool)
+RERANKER = config('RERANKER', default='cross_encoder')  # 'cross_encoder' or 'stub'
+RERANK_MODEL = config('RERANK_MODEL', default='cross-encoder/ms-marco-MiniLM-L-6-v2')
+RERANK_CANDIDATES = config('RERANK_CANDIDATES', default=20, cast=int)
+RERANK_BUDGET_MS = config('RERANK_BUDGET_MS', default=150, cast=int)
+RERANK_WORKERS = config('RERANK_WORKERS', default=2, cast=int)
+
 # Swagger
 SPECTACULAR_SETTINGS = {
     'TITLE': 'SmartDoc Enterprise API',
@@ -1,6 +1,4 @@
-import os
-from PyPDF2 import PdfReader
-from django.conf import settings
+from .extractors import PyPDF2Extractor
 
 class AIEngine:
     
@@ -10,15 +8,8 @@ class AIEngine:
         Opens a PDF file from the hard drive and returns the text.
         """
         try:
-            # 1. Open the file
-            reader = PdfReader(file_path)
-            text = ""
-            
-            # 2. Read every page
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            
-            return text.strip()
+            # Read every page through the shared extractor interface
+            return PyPDF2Extractor().extract_text(file_path)
         except Exception as e:
             return f"Error reading file: {str(e)}"
 
@@ -0,0 +1,81 @@
+"""
+Persistent cache of document analyses (the LLM insights), in the
+AnalysisCache table.
+
+The key covers everything the insights depend on: the SHA-256 of the
+extracted text, the summary mode (single prompt or map-reduce, with its
+section settings), the prompt versions and the model. Re-analyzing a
+document, or analyzing a different file whose text is identical, reuses
+the stored insights instead of calling the LLM.
+
+Entries expire after ANALYSIS_CACHE_TTL seconds; beyond
+ANALYSIS_CACHE_MAX_ENTRIES the least recently used ones are evicted.
+"""
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+
+from .llm_utils import ANALYSIS_PARAMS, ANALYSIS_PROMPT_VERSION, SECTION_PARAMS, SECTION_PROMPT_VERSION
+from .models import AnalysisCache
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(text_hash, map_reduce=False):
+    parts = [text_hash, f"analysis-v{ANALYSIS_PROMPT_VERSION}", ANALYSIS_PARAMS['model']]
+    if map_reduce:
+        parts += [
+            f"sections-v{SECTION_PROMPT_VERSION}", SECTION_PARAMS['model'],
+            str(settings.SUMMARY_SECTION_TOKENS), str(settings.SUMMARY_REDUCE_TOKENS),
+        ]
+    return hashlib.sha256(':'.join(parts).encode()).hexdigest()
+
+
+def _fresh():
+    entries = AnalysisCache.objects.all()
+    if settings.ANALYSIS_CACHE_TTL:
+        entries = entries.filter(created_at__gte=timezone.now() - timedelta(seconds=settings.ANALYSIS_CACHE_TTL))
+    return entries
+
+
+def get(key):
+    """The cached insights for `key`, or None."""
+    if not settings.ANALYSIS_CACHE_ENABLED:
+        return None
+
+    insights = _fresh().filter(key=key).values_list('insights', flat=True).first()
+    if insights is not None:
+        AnalysisCache.objects.filter(key=key).update(last_used_at=timezone.now())
+    return insights
+
+
+def store(key, insights):
+    if not settings.ANALYSIS_CACHE_ENABLED:
+        return
+
+    try:
+        AnalysisCache.objects.update_or_create(
+            key=key,
+            defaults={"insights": insights, "created_at": timezone.now(), "last_used_at": timezone.now()}
+        )
+    except IntegrityError:
+        return  # Another worker stored the same analysis first
+    evict()
+
+
+def evict():
+    """Drops expired entries, then the least recently used beyond ANALYSIS_CACHE_MAX_ENTRIES."""
+    expired = AnalysisCache.objects.exclude(id__in=_fresh().values('id'))
+    overflow = list(
+        AnalysisCache.objects.order_by('-last_used_at', '-id')
+        .values_list('id', flat=True)[settings.ANALYSIS_CACHE_MAX_ENTRIES:]
+    )
+    deleted, _ = expired.delete()
+    if overflow:
+        deleted += AnalysisCache.objects.filter(id__in=overflow).delete()[0]
+    if deleted:
+        logger.info(f"🧹 Evicted {deleted} cached analyses")
@@ -0,0 +1,149 @@
+"""
+Semantic cache for ask/global_ask answers.
+
+Entries live under a *scope*: one document at one content_version (ask), or
+the exact set of a user's completed documents and their versions
+(global_ask). Re-analysis bumps content_version and deletion changes the
+document set, so stale answers are never looked up again; they simply
+expire with the TTL.
+
+Inside a scope a question matches either exactly (normalized text) or by
+paraphrase, when the cosine similarity of the question embeddings is at
+least ANSWER_CACHE_SIMILARITY_THRESHOLD.
+"""
+import base64
+import hashlib
+import json
+import logging
+
+import numpy as np
+import redis
+from django.conf import settings
+
+from .caching import LRUCache, get_redis
+from .embedding_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+# Global variable to hold the process-wide cache once built
+_cache = None
+
+KEY_PREFIX = 'smartdoc:answers'
+
+
+def _retrieval_suffix(retrieval):
+    # Different retrievers pick different context, so their answers are cached apart
+    return '' if retrieval == 'vector' else f":{retrieval}"
+
+
+def document_scope(document, retrieval='vector'):
+    return f"doc:{document.id}:v{document.content_version}{_retrieval_suffix(retrieval)}"
+
+
+def global_scope(user_id, documents, retrieval='vector'):
+    """`documents` is an iterable of (id, content_version) pairs."""
+    fingerprint = ','.join(f"{doc_id}:{version}" for doc_id, version in sorted(documents))
+    return f"user:{user_id}:{hashlib.sha256(fingerprint.encode()).hexdigest()[:32]}{_retrieval_suffix(retrieval)}"
+
+
+class AnswerCache:
+
+    def __init__(self, redis_client=None, ttl=86400, threshold=0.95, max_entries=100):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # Used when Redis is not configured (tests, local dev)
+        self.local = LRUCache(max_size=1024, ttl=ttl)
+
+    def get(self, scope, question, query_vector):
+        """
+        Returns (response_dict, similarity) for the best cached match in
+        `scope`, or (None, None) on a miss.
+        """
+        entries = self._load(scope)
+        if not entries:
+            return None, None
+
+        normalized = normalize_question(question)
+        for entry in entries:
+            if entry['q'] == normalized:
+                return entry['r'], 1.0
+
+        # Paraphrase match: one vectorized cosine over every entry in the scope
+        matrix = np.stack([_decode_vector(entry['v']) for entry in entries])
+        query = np.asarray(query_vector, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        similarities = matrix @ query / np.clip(norms, 1e-12, None)
+
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.threshold:
+            return entries[best]['r'], round(float(similarities[best]), 4)
+        return None, None
+
+    def set(self, scope, question, query_vector, response):
+        entry = {
+            'q': normalize_question(question),
+            'v': _encode_vector(query_vector),
+            'r': response,
+        }
+        key = f"{KEY_PREFIX}:{scope}"
+
+        if self.redis is None:
+            entries = [entry] + (self.local.get(key) or [])
+            self.local.set(key, entries[:self.max_entries])
+            return
+
+        try:
+            pipe = self.redis.pipeline()
+            pipe.lpush(key, json.dumps(entry))
+            pipe.ltrim(key, 0, self.max_entries - 1)
+            pipe.expire(key, self.ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.debug(f"Answer cache write failed: {str(e)}")
+
+    def invalidate(self, scope):
+        key = f"{KEY_PREFIX}:{scope}"
+        self.local.delete(key)
+        if self.redis is None:
+            return
+        try:
+            self.redis.delete(key)
+        except redis.RedisError as e:
+            logger.debug(f"Answer cache invalidation failed: {str(e)}")
+
+    def _load(self, scope):
+        key = f"{KEY_PREFIX}:{scope}"
+        if self.redis is None:
+            return self.local.get(key) or []
+        try:
+            return [json.loads(raw) for raw in self.redis.lrange(key, 0, -1)]
+        except redis.RedisError as e:
+            logger.debug(f"Answer cache read failed: {str(e)}")
+            return []
+
+
+def _encode_vector(vector):
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode()
+
+
+def _decode_vector(encoded):
+    return np.frombuffer(base64.b64decode(encoded), dtype=np.float32)
+
+
+def get_answer_cache():
+    """Returns the process-wide AnswerCache, or None when caching is disabled."""
+    global _cache
+
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+
+    if _cache is None:
+        _cache = AnswerCache(
+            redis_client=get_redis(settings.ANSWER_CACHE_REDIS_URL),
+            ttl=settings.ANSWER_CACHE_TTL,
+            threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES_PER_SCOPE,
+        )
+    return _cache
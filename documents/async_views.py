@@ -0,0 +1,390 @@
+"""
+Async (ASGI) versions of the LLM-bound chat endpoints:
+
+    POST /api/documents/{id}/ask_async/
+    POST /api/documents/global_ask_async/
+
+Same body, validation and JSON response as the DRF ask/global_ask actions.
+The analysis progress stream (GET /api/documents/{id}/progress/) lives here
+too: an open EventSource only holds an `await` on a Redis subscription, for
+as long as PROGRESS_STREAM_TIMEOUT, instead of a worker thread.
+While the 2-10s LLM call is in flight the request only holds an `await`,
+not a worker thread, so one ASGI worker serves many concurrent chats:
+
+- the LLM call goes through AsyncGroq (llm_utils.agenerate_*)
+- document lookups use the async ORM
+- the question embedding (CPU-bound, sync) runs on a small thread pool
+- retrieval and the answer cache run via sync_to_async (retrieval sets
+  hnsw.ef_search in a transaction, so it stays on the sync path)
+
+Streaming (?stream=1) stays on the DRF endpoints. Serve with an ASGI server:
+    uvicorn config.asgi:application --workers 2
+"""
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.throttling import ScopedRateThrottle, UserRateThrottle
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from . import progress
+from .models import Document, DocumentChunk
+from .embedding_cache import get_query_embedding
+from .answer_cache import get_answer_cache, document_scope, global_scope
+from .retrieval import RETRIEVAL_MODES, context_label, retrieve_context
+from .streaming import stream_progress_response
+from .user_vectors import get_user_index
+from .llm_client import LLMUnavailable
+from .llm_utils import agenerate_answer, agenerate_multi_document_answer, validate_context_quality
+from .views import (
+    build_answer_meta, build_global_answer_meta, llm_unavailable_body, parse_retrieval_mode, parse_rerank_options,
+)
+
+logger = logging.getLogger(__name__)
+
+_jwt_authentication = JWTAuthentication()
+
+# Global variable to hold the embedding thread pool (created on first use)
+_embedding_executor = None
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+async def _authenticate(request):
+    """JWT (Authorization: Bearer ...) like the DRF views. Returns the user or None."""
+    try:
+        result = await sync_to_async(_jwt_authentication.authenticate)(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return result[0] if result else None
+
+
+@sync_to_async
+def _throttle_wait(request, user, scope='ai_chat'):
+    """Applies the same 'user' and `scope` rate limits as the DRF actions. Seconds to wait, or None."""
+    request.user = user
+    view = SimpleNamespace(throttle_scope=scope)
+    for throttle in (UserRateThrottle(), ScopedRateThrottle()):
+        if not throttle.allow_request(request, view):
+            return throttle.wait() or 1
+    return None
+
+
+async def _embed(question):
+    global _embedding_executor
+
+    if _embedding_executor is None:
+        _embedding_executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_EMBEDDING_WORKERS, thread_name_prefix='embed'
+        )
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_embedding_executor, get_query_embedding, question)
+
+
+async def _retrieve(queryset, question, query_vector, top_k, retrieval, rerank, rerank_budget_ms, vector_index=None):
+    # Same path as the sync views: ef_search, the storage mode's oversampling and the exact fallback for filtered queries
+    return await sync_to_async(retrieve_context)(
+        queryset, question, query_vector, top_k,
+        mode=retrieval, rerank=rerank, rerank_budget_ms=rerank_budget_ms, vector_index=vector_index
+    )
+
+
+def _llm_unavailable_response(error):
+    body, retry_after = llm_unavailable_body(error)
+    response = JsonResponse(body, status=503)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+async def _prepare(request):
+    """
+    Shared front half of both endpoints: auth, throttling, body validation.
+    Returns (user, data, error_response); error_response is None on success.
+    """
+    if request.method != 'POST':
+        return None, None, JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+
+    user = await _authenticate(request)
+    if user is None:
+        return None, None, JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    wait = await _throttle_wait(request, user)
+    if wait is not None:
+        response = JsonResponse({"detail": f"Request was throttled. Expected available in {int(wait)} seconds."},
+                                status=429)
+        response['Retry-After'] = str(int(wait))
+        return user, None, response
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return user, None, JsonResponse({"error": "Request body must be JSON"}, status=400)
+    if not isinstance(data, dict):
+        return user, None, JsonResponse({"error": "Request body must be a JSON object"}, status=400)
+
+    question = str(data.get('question', '')).strip()
+    if not question:
+        return user, None, JsonResponse({"error": "Question is required"}, status=400)
+    if len(question) > 500:
+        return user, None, JsonResponse({"error": "Question exceeds 500 character limit"}, status=400)
+
+    retrieval = parse_retrieval_mode(data)
+    if retrieval is None:
+        return user, None, JsonResponse(
+            {"error": f"retrieval must be one of: {', '.join(RETRIEVAL_MODES)}"}, status=400
+        )
+
+    rerank, rerank_budget_ms = parse_rerank_options(data)
+    return user, {
+        "question": question,
+        "retrieval": retrieval,
+        "rerank": rerank,
+        "rerank_budget_ms": rerank_budget_ms,
+    }, None
+
+
+# ============================================================================
+# SINGLE-DOCUMENT CHAT ENDPOINT
+# ============================================================================
+
+@csrf_exempt
+async def ask_async(request, pk):
+    """Async twin of DocumentViewSet.ask (JSON only)."""
+    user, data, error = await _prepare(request)
+    if error is not None:
+        return error
+    question = data["question"]
+
+    try:
+        document = await Document.objects.aget(id=pk, owner=user)
+    except Document.DoesNotExist:
+        return JsonResponse({"detail": "No Document matches the given query."}, status=404)
+
+    # Check document status
+    if document.status != 'completed':
+        return JsonResponse(
+            {
+                "error": f"Document is not ready for questions. Status: {document.status}",
+                "status": document.status,
+                "suggestion": "Please wait for analysis to complete or trigger analysis if status is 'pending'."
+            },
+            status=400
+        )
+
+    try:
+        # Embedding runs on the thread pool, the event loop keeps serving other requests
+        query_vector = await _embed(question)
+
+        if not query_vector:
+            logger.error(f"Failed to generate embedding for question: {question[:50]}...")
+            return JsonResponse({"error": "Failed to process your question. Please try again."}, status=500)
+
+        # Serve a cached answer if this (or a paraphrased) question was already answered
+        answer_cache = get_answer_cache()
+        scope = document_scope(document, context_label(data["retrieval"], data["rerank"]))
+        if answer_cache is not None:
+            cached, similarity = await sync_to_async(answer_cache.get)(scope, question, query_vector)
+            if cached is not None:
+                return JsonResponse({**cached, "cached": True, "cache_similarity": similarity})
+
+        # Retrieve most relevant chunks
+        context_chunks, reranked = await _retrieve(
+            DocumentChunk.objects.filter(document=document),
+            question, query_vector,
+            top_k=3,
+            retrieval=data["retrieval"],
+            rerank=data["rerank"],
+            rerank_budget_ms=data["rerank_budget_ms"]
+        )
+
+        is_valid, reason = validate_context_quality(question, context_chunks)
+        if not is_valid:
+            return JsonResponse({
+                "answer": f"I couldn't find relevant information to answer your question. {reason}",
+                "sources": [],
+                "confidence": "low"
+            })
+
+        meta = build_answer_meta(context_chunks, data["retrieval"], reranked)
+
+        # The LLM call: awaited, no thread is blocked for its 2-10 seconds
+        answer = await agenerate_answer(question, context_chunks)
+        logger.info(f"Question answered (async) for document {document.id}, confidence: {meta['confidence']}")
+
+        if answer_cache is not None:
+            await sync_to_async(answer_cache.set)(scope, question, query_vector, {"answer": answer, **meta})
+        return JsonResponse({"answer": answer, **meta, "cached": False})
+
+    except LLMUnavailable as e:
+        logger.warning(f"LLM unavailable for document {pk}: {str(e)}")
+        return _llm_unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error in ask_async endpoint for document {pk}: {str(e)}", exc_info=True)
+        return JsonResponse(
+            {
+                "error": "An unexpected error occurred while processing your question.",
+                "detail": str(e) if user.is_staff else None
+            },
+            status=500
+        )
+
+
+# ============================================================================
+# GLOBAL MULTI-DOCUMENT SEARCH ENDPOINT
+# ============================================================================
+
+@csrf_exempt
+async def global_ask_async(request):
+    """Async twin of DocumentViewSet.global_ask (JSON only)."""
+    user, data, error = await _prepare(request)
+    if error is not None:
+        return error
+    question = data["question"]
+
+    try:
+        query_vector = await _embed(question)
+
+        if not query_vector:
+            logger.error(f"Failed to generate embedding for global question: {question[:50]}...")
+            return JsonResponse({"error": "Failed to process your question. Please try again."}, status=500)
+
+        # The cache scope is the exact set of completed documents (and their versions)
+        completed_docs = [
+            pair async for pair in Document.objects.filter(
+                owner=user,
+                status='completed'
+            ).values_list('id', 'content_version')
+        ]
+
+        answer_cache = get_answer_cache()
+        scope = global_scope(user.id, completed_docs, context_label(data["retrieval"], data["rerank"]))
+        if answer_cache is not None and completed_docs:
+            cached, similarity = await sync_to_async(answer_cache.get)(scope, question, query_vector)
+            if cached is not None:
+                return JsonResponse({**cached, "cached": True, "cache_similarity": similarity})
+
+        # Retrieve top chunks across ALL completed documents
+        vector_index = await sync_to_async(get_user_index)(user.id, completed_docs)
+        context_chunks, reranked = await _retrieve(
+            DocumentChunk.objects.filter(
+                document__owner=user,
+                document__status='completed'
+            ).select_related('document'),
+            question, query_vector,
+            top_k=5,
+            retrieval=data["retrieval"],
+            rerank=data["rerank"],
+            rerank_budget_ms=data["rerank_budget_ms"],
+            vector_index=vector_index
+        )
+
+        if not context_chunks:
+            if not completed_docs:
+                return JsonResponse(
+                    {
+                        "error": "No analyzed documents found. Please upload and analyze documents first.",
+                        "suggestion": "Upload a PDF and click 'Analyze' to enable global search."
+                    },
+                    status=404
+                )
+            return JsonResponse({
+                "answer": "I couldn't find relevant information across your documents to answer this question.",
+                "sources": [],
+                "documents_searched": len(completed_docs)
+            })
+
+        is_valid, reason = validate_context_quality(question, context_chunks)
+        if not is_valid:
+            return JsonResponse({
+                "answer": f"I found some content but it's not sufficient to answer your question. {reason}",
+                "sources": [],
+                "confidence": "low"
+            })
+
+        meta = build_global_answer_meta(context_chunks, data["retrieval"], reranked)
+        answer = await agenerate_multi_document_answer(question, context_chunks)
+        logger.info(
+            f"Global search answered (async) for user {user.id}, "
+            f"{meta['documents_searched']} documents, confidence: {meta['confidence']}"
+        )
+
+        if answer_cache is not None:
+            await sync_to_async(answer_cache.set)(scope, question, query_vector, {"answer": answer, **meta})
+        return JsonResponse({"answer": answer, **meta, "cached": False})
+
+    except LLMUnavailable as e:
+        logger.warning(f"LLM unavailable for global search of user {user.id}: {str(e)}")
+        return _llm_unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error in global_ask_async endpoint: {str(e)}", exc_info=True)
+        return JsonResponse(
+            {
+                "error": "An unexpected error occurred while searching your documents.",
+                "detail": str(e) if user.is_staff else None
+            },
+            status=500
+        )
+
+
+# ============================================================================
+# ANALYSIS PROGRESS STREAM
+# ============================================================================
+
+async def progress_stream(request, pk):
+    """
+    Follow a document's analysis as Server-Sent Events, instead of polling GET /documents/{id}/.
+
+    Request:
+        GET /documents/{id}/progress/
+        Last-Event-ID header (or ?last_event_id=) resumes after that event.
+
+    Response:
+        200 - text/event-stream: started, pages_extracted, chunks_saved, chunks_embedded,
+              summary_started, summary_finished, then completed or failed (the stream ends)
+        401 - No valid token
+        404 - Document not found
+        405 - Not a GET
+    """
+    if request.method != 'GET':
+        return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+
+    user = await _authenticate(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    wait = await _throttle_wait(request, user, scope=None)
+    if wait is not None:
+        response = JsonResponse({"detail": f"Request was throttled. Expected available in {int(wait)} seconds."},
+                                status=429)
+        response['Retry-After'] = str(int(wait))
+        return response
+
+    if not await Document.objects.filter(id=pk, owner=user).aexists():
+        return JsonResponse({"detail": "No Document matches the given query."}, status=404)
+
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or request.GET.get('last_event_id', 0))
+    except ValueError:
+        last_event_id = 0
+
+    async def final_event():
+        status_value, analysis = await Document.objects.filter(id=pk).values_list(
+            'status', 'analysis_result'
+        ).aget()
+        if status_value == 'completed':
+            return {"id": 0, "event": "completed", "data": {"status": "completed"}}
+        if status_value == 'failed':
+            return {"id": 0, "event": "failed", "data": {"error": (analysis or {}).get('error')}}
+        return None
+
+    return stream_progress_response(progress.iter_events(pk, final_event, last_event_id=last_event_id))
@@ -0,0 +1,85 @@
+"""
+Bulk ingest: many PDFs in one multipart request (POST /documents/bulk_upload/).
+
+    files        the request's upload handlers are swapped for
+                 TemporaryFileUploadHandler, so every file is streamed to a
+                 temp file in 64 KB chunks instead of being held in memory;
+                 ContentAddressedStorage then moves it into place
+    rows         one bulk_create for every valid file
+    analysis     queued as bulk work in the fair scheduler (scheduler.py), which
+                 publishes each batch it claims as one Celery group over a
+                 single broker connection
+
+Each file is validated and stored on its own: a bad file is reported in the
+response without failing the rest of the batch.
+"""
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+from .models import Document
+
+logger = logging.getLogger(__name__)
+
+PDF_MAGIC = b'%PDF-'
+
+
+def use_streaming_upload_handlers(request):
+    """Spool uploads to disk, never to memory (must run before request.FILES is read)."""
+    request.upload_handlers = [TemporaryFileUploadHandler(request)]
+
+
+def validate_upload(upload):
+    """The reason `upload` can't be ingested, or None."""
+    if not upload.name.lower().endswith('.pdf'):
+        return "Only PDF files are supported"
+    if upload.size == 0:
+        return "File is empty"
+
+    upload.seek(0)
+    header = upload.read(len(PDF_MAGIC))
+    upload.seek(0)
+    if header != PDF_MAGIC:
+        return "File is not a valid PDF"
+    return None
+
+
+def store_uploads(uploads, owner):
+    """
+    Stores every valid file and creates its Document row.
+    Returns (documents, results): results has one entry per upload, in order,
+    with either the new document id or the error.
+    """
+    pending = []
+    results = []
+    title_length = Document._meta.get_field('title').max_length
+
+    for upload in uploads:
+        error = validate_upload(upload)
+        if error is None:
+            document = Document(
+                title=os.path.splitext(os.path.basename(upload.name))[0][:title_length] or upload.name,
+                owner=owner,
+            )
+            try:
+                # Content-addressed: the temp file is moved into place (or dropped if the bytes exist)
+                document.file.save(upload.name, upload, save=False)
+            except OSError as e:
+                logger.error(f"❌ Could not store {upload.name}: {str(e)}")
+                error = "Could not store file"
+            else:
+                pending.append(document)
+        upload.close()
+
+        results.append({"file": upload.name, "error": error} if error else {"file": upload.name})
+
+    documents = Document.objects.bulk_create(pending, batch_size=settings.CHUNK_BULK_CREATE_BATCH_SIZE)
+
+    created = iter(documents)
+    for result in results:
+        if "error" not in result:
+            result["id"] = next(created).id
+    return documents, results
+
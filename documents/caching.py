@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# One Redis client per process (it pools its own connections)
+_redis_clients = {}
+
+
+class LRUCache:
+    """
+    Small thread-safe in-process cache with a size limit and a TTL.
+    The least recently used entry is evicted once `max_size` is reached.
+    With `max_weight` and a `weigh(value)` function (e.g. bytes), entries are
+    also evicted while the total weight is over the limit; a single value
+    heavier than the limit is not stored at all.
+    """
+
+    def __init__(self, max_size=1024, ttl=3600, max_weight=None, weigh=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self.weigh = weigh or (lambda value: 0)
+        self.weight = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+
+            value, expires_at, weight = item
+            if expires_at is not None and expires_at < time.monotonic():
+                self._pop(key)
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        weight = self.weigh(value)
+        with self._lock:
+            self._pop(key)
+            if self.max_weight is not None and weight > self.max_weight:
+                return
+            self._data[key] = (value, expires_at, weight)
+            self.weight += weight
+            while len(self._data) > self.max_size or (self.max_weight is not None and self.weight > self.max_weight):
+                self._pop(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def _pop(self, key):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.weight -= item[2]
+
+    def __len__(self):
+        return len(self._data)
+
+
+def get_redis(url=None):
+    """
+    Returns a shared Redis client for `url` (defaults to the Celery broker),
+    or None when no URL is configured. Timeouts are short: the cache is an
+    optimization and must never stall a request.
+    """
+    url = url if url is not None else settings.CELERY_BROKER_URL
+    if not url:
+        return None
+
+    if url not in _redis_clients:
+        _redis_clients[url] = redis.Redis.from_url(
+            url,
+            socket_timeout=0.25,
+            socket_connect_timeout=0.25,
+        )
+    return _redis_clients[url]
@@ -0,0 +1,166 @@
+"""
+Builds the LLM context from retrieved chunks.
+
+Chunks come from a 1000/200 sliding window, so two retrieved chunks with
+consecutive chunk_index share 200 characters. pack_context() merges runs of
+consecutive chunks of the same document into one span, keeping the shared
+text once, then packs spans by relevance until settings.CONTEXT_TOKEN_BUDGET
+tokens are used:
+
+    spans = pack_context(context_chunks)
+    span.text_content, span.chunk_index .. span.last_index, span.distance
+
+Tokens are counted with tiktoken (settings.CONTEXT_TOKENIZER_ENCODING,
+close to the Llama 3 vocabulary). Without tiktoken a 4-characters-per-token
+estimate is used.
+"""
+import logging
+import math
+
+from django.conf import settings
+
+from .pipeline import CHUNK_OVERLAP
+
+logger = logging.getLogger(__name__)
+
+# Global variable to hold the tokenizer (loaded on first use)
+_tokenizer = None
+
+# Shorter suffix/prefix matches between neighbours are coincidence, not window overlap
+MIN_OVERLAP_CHARS = 20
+
+
+class TiktokenTokenizer:
+
+    def __init__(self, encoding_name):
+        import tiktoken
+        self.encoding = tiktoken.get_encoding(encoding_name)
+
+    def count(self, text):
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text, max_tokens):
+        tokens = self.encoding.encode(text, disallowed_special=())
+        return self.encoding.decode(tokens[:max_tokens])
+
+
+class EstimateTokenizer:
+    """~4 characters per token: the usual rule of thumb for English text."""
+
+    chars_per_token = 4
+
+    def count(self, text):
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def truncate(self, text, max_tokens):
+        return text[:max_tokens * self.chars_per_token]
+
+
+def get_tokenizer():
+    global _tokenizer
+
+    if _tokenizer is None:
+        try:
+            _tokenizer = TiktokenTokenizer(settings.CONTEXT_TOKENIZER_ENCODING)
+        except Exception as e:
+            logger.warning(f"⚠️ tiktoken unavailable ({str(e)}), estimating context tokens from length")
+            _tokenizer = EstimateTokenizer()
+    return _tokenizer
+
+
+class ContextSpan:
+    """
+    One or more consecutive chunks of a document, merged. Quacks like a
+    DocumentChunk for the prompt builders: chunk_index is the first chunk,
+    distance and rank the best (smallest) of the merged chunks.
+    """
+
+    def __init__(self, chunk, rank):
+        self.first_chunk = chunk
+        self.rank = rank
+        self.document_id = getattr(chunk, 'document_id', None)
+        self.chunk_index = chunk.chunk_index
+        self.last_index = chunk.chunk_index
+        self.text_content = chunk.text_content
+        self.distance = float(getattr(chunk, 'distance', 0))
+        self.chunk_count = 1
+
+    def extend(self, chunk, rank):
+        overlap = overlap_length(self.text_content, chunk.text_content)
+        separator = '' if overlap else '\n'
+        self.text_content += separator + chunk.text_content[overlap:]
+        self.last_index = chunk.chunk_index
+        self.distance = min(self.distance, float(getattr(chunk, 'distance', 0)))
+        self.rank = min(self.rank, rank)
+        self.chunk_count += 1
+
+    @property
+    def document(self):
+        # Read on demand: only the multi-document prompt needs it (select_related there)
+        return self.first_chunk.document
+
+    @property
+    def pages(self):
+        first, last = self.chunk_index + 1, self.last_index + 1
+        return f"Page {first}" if first == last else f"Pages {first}-{last}"
+
+
+def overlap_length(left, right, expected=CHUNK_OVERLAP):
+    """Characters at the end of `left` repeated at the start of `right` (0 if they don't overlap)."""
+    # Fast path: neighbouring sliding windows share exactly `expected` characters
+    if 0 < expected <= min(len(left), len(right)) and right.startswith(left[-expected:]):
+        return expected
+
+    for size in range(min(len(left), len(right)), MIN_OVERLAP_CHARS - 1, -1):
+        if right.startswith(left[-size:]):
+            return size
+    return 0
+
+
+def merge_chunks(chunks):
+    """
+    Spans of consecutive chunks per document. `chunks` arrive most relevant
+    first (vector, fused or reranked order); spans are returned in the order
+    of their best chunk.
+    """
+    by_document = {}
+    for rank, chunk in enumerate(chunks):
+        by_document.setdefault(getattr(chunk, 'document_id', None), []).append((chunk.chunk_index, rank, chunk))
+
+    spans = []
+    for document_chunks in by_document.values():
+        current = None
+        for chunk_index, rank, chunk in sorted(document_chunks, key=lambda item: item[:2]):
+            if current is not None and chunk_index == current.last_index:
+                continue  # The same chunk retrieved twice
+            if current is not None and chunk_index == current.last_index + 1:
+                current.extend(chunk, rank)
+            else:
+                current = ContextSpan(chunk, rank)
+                spans.append(current)
+
+    return sorted(spans, key=lambda span: span.rank)
+
+
+def pack_context(chunks, budget=None, tokenizer=None):
+    """
+    merge_chunks(), then keep the most relevant spans that fit in `budget`
+    tokens (settings.CONTEXT_TOKEN_BUDGET). A span that doesn't fit is
+    skipped so a smaller, less relevant one can still use the room; if not
+    even the best span fits, it is truncated rather than dropped.
+    """
+    budget = settings.CONTEXT_TOKEN_BUDGET if budget is None else budget
+    tokenizer = tokenizer or get_tokenizer()
+
+    packed = []
+    used = 0
+    for span in merge_chunks(chunks):
+        tokens = tokenizer.count(span.text_content)
+        if used + tokens <= budget:
+            packed.append(span)
+            used += tokens
+        elif not packed:
+            span.text_content = tokenizer.truncate(span.text_content, budget)
+            packed.append(span)
+            used = budget
+    return packed
@@ -0,0 +1,156 @@
+"""
+Two-level cache for question embeddings used by ask/global_ask.
+
+L1: in-process LRU (size + TTL bounded).
+L2: Redis (shared by every API worker), vectors stored as raw float32 bytes.
+
+Keys are the normalized question text plus the embedding model identifier,
+so switching EMBEDDING_BACKEND (e.g. fp32 -> int8) never serves stale vectors.
+"""
+import hashlib
+import logging
+import threading
+import time
+
+import numpy as np
+import redis
+from django.conf import settings
+
+from .caching import LRUCache, get_redis
+from .embeddings import get_backend, get_embedding
+
+logger = logging.getLogger(__name__)
+
+# Global variable to hold the process-wide cache once built
+_cache = None
+
+KEY_PREFIX = 'smartdoc:qemb'
+STATS_KEY = f'{KEY_PREFIX}:stats'
+STAT_FIELDS = ('l1_hits', 'l2_hits', 'misses', 'encode_seconds')
+
+
+def normalize_question(question):
+    # The mpnet tokenizer lower-cases and ignores extra whitespace anyway
+    return ' '.join(question.lower().split())
+
+
+def make_key(question, model_id):
+    digest = hashlib.sha256(normalize_question(question).encode()).hexdigest()
+    return f"{KEY_PREFIX}:{model_id}:{digest}"
+
+
+class QueryEmbeddingCache:
+
+    def __init__(self, max_size=1024, ttl=3600, redis_client=None, redis_ttl=86400):
+        self.local = LRUCache(max_size=max_size, ttl=ttl)
+        self.redis = redis_client
+        self.redis_ttl = redis_ttl
+        self.counters = dict.fromkeys(STAT_FIELDS, 0)
+        self._lock = threading.Lock()
+
+    def get_embedding(self, question):
+        key = make_key(question, get_backend().model_id)
+
+        # 1. In-process LRU
+        vector = self.local.get(key)
+        if vector is not None:
+            self._record('l1_hits')
+            return vector
+
+        # 2. Shared Redis tier
+        vector = self._redis_get(key)
+        if vector is not None:
+            self.local.set(key, vector)
+            self._record('l2_hits')
+            return vector
+
+        # 3. Miss: run the model and fill both tiers
+        start = time.perf_counter()
+        vector = get_embedding(normalize_question(question))
+        elapsed = time.perf_counter() - start
+
+        self.local.set(key, vector)
+        self._redis_set(key, vector)
+        self._record('misses', elapsed)
+        return vector
+
+    def stats(self):
+        """Counters for this process, plus an estimate of encode time saved."""
+        with self._lock:
+            return summarize_stats(dict(self.counters))
+
+    def _record(self, field, encode_seconds=0.0):
+        with self._lock:
+            self.counters[field] += 1
+            self.counters['encode_seconds'] += encode_seconds
+
+        if self.redis is None:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hincrby(STATS_KEY, field, 1)
+            if encode_seconds:
+                pipe.hincrbyfloat(STATS_KEY, 'encode_seconds', encode_seconds)
+            pipe.execute()
+        except redis.RedisError:
+            pass  # Stats are best-effort
+
+    def _redis_get(self, key):
+        if self.redis is None:
+            return None
+        try:
+            raw = self.redis.get(key)
+        except redis.RedisError as e:
+            logger.debug(f"Query embedding cache read failed: {str(e)}")
+            return None
+        return np.frombuffer(raw, dtype=np.float32).tolist() if raw else None
+
+    def _redis_set(self, key, vector):
+        if self.redis is None:
+            return
+        try:
+            self.redis.set(key, np.asarray(vector, dtype=np.float32).tobytes(), ex=self.redis_ttl)
+        except redis.RedisError as e:
+            logger.debug(f"Query embedding cache write failed: {str(e)}")
+
+
+def summarize_stats(counters):
+    hits = counters['l1_hits'] + counters['l2_hits']
+    lookups = hits + counters['misses']
+    avg_encode = counters['encode_seconds'] / counters['misses'] if counters['misses'] else 0.0
+    return {
+        **counters,
+        'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+        'avg_encode_seconds': round(avg_encode, 4),
+        'estimated_seconds_saved': round(hits * avg_encode, 2),
+    }
+
+
+def get_shared_stats():
+    """Counters aggregated across every process, read from Redis."""
+    client = get_redis(settings.QUERY_EMBEDDING_REDIS_URL)
+    raw = client.hgetall(STATS_KEY) if client is not None else {}
+    counters = {field: float(raw.get(field.encode(), 0)) for field in STAT_FIELDS}
+    for field in ('l1_hits', 'l2_hits', 'misses'):
+        counters[field] = int(counters[field])
+    return summarize_stats(counters)
+
+
+def get_query_cache():
+    global _cache
+
+    if _cache is None:
+        _cache = QueryEmbeddingCache(
+            max_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+            ttl=settings.QUERY_EMBEDDING_CACHE_TTL,
+            redis_client=get_redis(settings.QUERY_EMBEDDING_REDIS_URL),
+            redis_ttl=settings.QUERY_EMBEDDING_REDIS_TTL,
+        )
+    return _cache
+
+
+def get_query_embedding(question):
+    """Drop-in replacement for get_embedding() for user questions."""
+    if not settings.QUERY_EMBEDDING_CACHE_ENABLED:
+        return get_embedding(question)
+    return get_query_cache().get_embedding(question)
@@ -0,0 +1,149 @@
+"""
+Standalone embedding service.
+
+One process holds one copy of the embedding model and serves every API
+and Celery worker over HTTP. Concurrent requests are gathered into
+micro-batches so the model runs one forward pass for many callers.
+
+Start it with:
+    python manage.py run_embedding_server --port 8001
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects texts from many threads and encodes them together.
+
+    A batch is flushed when it reaches `max_batch_size` texts or when
+    `max_wait_ms` has passed since its first text arrived, whichever
+    comes first.
+    """
+
+    def __init__(self, encode_fn, max_batch_size=64, max_wait_ms=10):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, texts):
+        """Queue texts for encoding. Returns a Future resolving to a list of vectors."""
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future
+
+    def encode(self, texts, timeout=None):
+        return self.submit(texts).result(timeout=timeout)
+
+    def stop(self):
+        self._stopped.set()
+        self._worker.join(timeout=1)
+
+    def _collect_batch(self):
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                vectors = self.encode_fn(texts)
+            except Exception as e:
+                logger.error(f"❌ Embedding batch of {len(texts)} texts failed: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            # Hand each caller back its own slice of the batch
+            offset = 0
+            for item_texts, future in batch:
+                future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+
+class EmbeddingRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /embed  {"texts": ["...", ...]}  ->  {"embeddings": [[...], ...]}
+    GET  /health                          ->  {"status": "ok"}
+    """
+
+    batcher = None  # Set by make_server()
+    request_timeout = 60
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path != '/embed':
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            texts = json.loads(self.rfile.read(length))['texts']
+        except (ValueError, KeyError, TypeError):
+            self._send_json(400, {"error": "Body must be JSON with a 'texts' list"})
+            return
+
+        try:
+            vectors = self.batcher.encode(texts, timeout=self.request_timeout)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+
+        self._send_json(200, {"embeddings": vectors})
+
+    def _send_json(self, status_code, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def make_server(host, port, batcher):
+    handler = type('BoundEmbeddingRequestHandler', (EmbeddingRequestHandler,), {'batcher': batcher})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
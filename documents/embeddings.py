@@ -1,19 +1,31 @@
-from sentence_transformers import SentenceTransformer
-import torch
+from django.conf import settings
 import logging
+import os
+import numpy as np
+import requests
 
 logger = logging.getLogger(__name__)
 
 # Global variable to hold the model in memory once loaded
 _model = None
 
-def get_embedding(text):
+# Global variable to hold the configured backend (see settings.EMBEDDING_BACKEND)
+_backend = None
+
+EMBEDDING_DIMENSIONS = 768
+
+
+def _get_model():
     global _model
-    
+
     # Only load the model when the first request comes in
     if _model is None:
         logger.info("🧠 [Lazy Load] Initializing Embedding Model (all-mpnet-base-v2)...")
         try:
+            # Heavy imports live here so importing this module stays cheap
+            from sentence_transformers import SentenceTransformer
+            import torch
+
             device = 'cuda' if torch.cuda.is_available() else 'cpu'
             _model = SentenceTransformer('all-mpnet-base-v2', device=device)
             logger.info("✅ Model loaded successfully.")
@@ -21,9 +33,174 @@ def get_embedding(text):
             logger.error(f"❌ Failed to load embedding model: {str(e)}")
             raise e
 
+    return _model
+
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+class LocalBackend:
+    """Runs the model inside this process (one copy per worker)."""
+
+    model_id = 'all-mpnet-base-v2'
+
+    def encode(self, texts, batch_size):
+        return [vector.tolist() for vector in _get_model().encode(texts, batch_size=batch_size)]
+
+
+class ServerBackend:
+    """
+    Sends texts to the shared embedding server (documents/embedding_server.py)
+    so only one process holds the model. Falls back to the local model when
+    the server is unreachable, if settings.EMBEDDING_SERVER_FALLBACK is on.
+    """
+
+    # The server always runs the local PyTorch model
+    model_id = LocalBackend.model_id
+
+    def __init__(self):
+        self.url = settings.EMBEDDING_SERVER_URL.rstrip('/') + '/embed'
+        self.timeout = settings.EMBEDDING_SERVER_TIMEOUT
+        self.fallback = settings.EMBEDDING_SERVER_FALLBACK
+        # One pooled session per process: keeps the TCP connection alive
+        self.session = requests.Session()
+
+    def encode(self, texts, batch_size):
+        try:
+            response = self.session.post(self.url, json={"texts": texts}, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()['embeddings']
+        except requests.RequestException as e:
+            if not self.fallback:
+                raise
+            logger.warning(f"⚠️ Embedding server unavailable ({str(e)}), encoding locally.")
+            return LocalBackend().encode(texts, batch_size)
+
+
+class OnnxBackend:
+    """
+    Runs all-mpnet-base-v2 with ONNX Runtime on CPU, optionally int8-quantized.
+    The model is exported once with `python manage.py export_onnx_embedding_model`.
+    Output matches SentenceTransformer: mean pooling + L2 normalization.
+    """
+
+    max_seq_length = 384  # Same limit SentenceTransformer uses for mpnet
+
+    def __init__(self, quantized=None):
+        self.quantized = settings.EMBEDDING_ONNX_QUANTIZED if quantized is None else quantized
+        self._session = None
+        self._tokenizer = None
+
+    @property
+    def model_id(self):
+        # int8 vectors differ slightly from fp32, so they get their own identity
+        return f"all-mpnet-base-v2-onnx-{'int8' if self.quantized else 'fp32'}"
+
+    def _load(self):
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        model_dir = settings.EMBEDDING_ONNX_MODEL_DIR
+        filename = 'model.int8.onnx' if self.quantized else 'model.onnx'
+        model_path = os.path.join(model_dir, filename)
+
+        logger.info(f"🧠 [Lazy Load] Initializing ONNX Embedding Model ({model_path})...")
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if settings.EMBEDDING_ONNX_THREADS:
+            options.intra_op_num_threads = settings.EMBEDDING_ONNX_THREADS
+
+        self._session = onnxruntime.InferenceSession(
+            model_path, options, providers=['CPUExecutionProvider']
+        )
+        self._tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        logger.info("✅ ONNX model loaded successfully.")
+
+    def encode(self, texts, batch_size):
+        if self._session is None:
+            self._load()
+
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self._tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors='np',
+            )
+            inputs = {
+                'input_ids': tokens['input_ids'].astype(np.int64),
+                'attention_mask': tokens['attention_mask'].astype(np.int64),
+            }
+            token_embeddings = self._session.run(None, inputs)[0]
+
+            # Mean pooling over real (non-padding) tokens, then normalize
+            mask = inputs['attention_mask'][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.extend(pooled.tolist())
+
+        return vectors
+
+
+EMBEDDING_BACKENDS = {
+    'local': LocalBackend,
+    'server': ServerBackend,
+    'onnx': OnnxBackend,
+}
+
+
+def get_backend():
+    global _backend
+
+    if _backend is None:
+        name = getattr(settings, 'EMBEDDING_BACKEND', 'local')
+        if name not in EMBEDDING_BACKENDS:
+            raise ValueError(
+                f"Unknown EMBEDDING_BACKEND '{name}'. Choose from: {', '.join(EMBEDDING_BACKENDS)}"
+            )
+        _backend = EMBEDDING_BACKENDS[name]()
+
+    return _backend
+
+
+# ============================================================================
+# PUBLIC API
+# ============================================================================
+
+def get_embedding(text):
     # Ensure text is not empty
     if not text:
-        return [0.0] * 768  # Return zero vector for empty input
+        return [0.0] * EMBEDDING_DIMENSIONS  # Return zero vector for empty input
+
+    return get_embeddings([text])[0]
+
+
+def get_embeddings(texts, batch_size=None):
+    """
+    Batch version of get_embedding().
+    Encodes a list of texts in batches of `batch_size` (defaults to
+    settings.EMBEDDING_BATCH_SIZE) and returns one vector per input, in order.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+
+    batch_size = batch_size or getattr(settings, 'EMBEDDING_BATCH_SIZE', 32)
+
+    # Empty strings keep the zero-vector behaviour of get_embedding()
+    vectors = [[0.0] * EMBEDDING_DIMENSIONS for _ in texts]
+    non_empty = [i for i, text in enumerate(texts) if text]
+    if not non_empty:
+        return vectors
+
+    backend = get_backend()
+    for start in range(0, len(non_empty), batch_size):
+        indexes = non_empty[start:start + batch_size]
+        encoded = backend.encode([texts[i] for i in indexes], batch_size)
+        for i, embedding in zip(indexes, encoded):
+            vectors[i] = embedding
 
-    embedding = _model.encode(text)
-    return embedding.tolist()
\ No newline at end of file
+    return vectors
@@ -0,0 +1,130 @@
+"""
+PDF text extractors behind one interface.
+
+    extractor = get_extractor()
+    for text in extractor.iter_pages(path):   # one string per page, in order
+        ...
+
+- FitzExtractor          PyMuPDF, one page at a time in this process
+- ParallelFitzExtractor  PyMuPDF, page ranges spread over a process pool
+                         (not in daemonic processes such as Celery prefork children)
+- PyPDF2Extractor        PyPDF2 (used by AIEngine.extract_text)
+"""
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+from PyPDF2 import PdfReader
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TextExtractor:
+    """Base interface: subclasses implement page_count() and iter_pages()."""
+
+    def page_count(self, path):
+        raise NotImplementedError
+
+    def iter_pages(self, path):
+        raise NotImplementedError
+
+    def extract_text(self, path):
+        """Whole document as one string (pages separated by newlines)."""
+        return ''.join(text + "\n" for text in self.iter_pages(path)).strip()
+
+
+class FitzExtractor(TextExtractor):
+
+    def page_count(self, path):
+        with fitz.open(path) as pdf:
+            return len(pdf)
+
+    def iter_pages(self, path):
+        with fitz.open(path) as pdf:
+            for page in pdf:
+                yield page.get_text()
+
+
+def _extract_page_range(path, start, end):
+    """Runs in a pool worker: each worker opens the file itself."""
+    with fitz.open(path) as pdf:
+        return [pdf[number].get_text() for number in range(start, end)]
+
+
+class ParallelFitzExtractor(FitzExtractor):
+    """
+    Splits the document into ranges of `pages_per_task` pages and extracts
+    them on `workers` processes. Pages still come out in order, and only a
+    few ranges are in flight at once so memory stays bounded.
+    Documents shorter than `min_pages` are read sequentially, where the
+    pool start-up cost isn't worth it, and so is every document in a
+    daemonic process (a Celery prefork child), which may not have children.
+    """
+
+    def __init__(self, workers=None, min_pages=None, pages_per_task=None):
+        self.workers = workers or settings.PDF_EXTRACTION_WORKERS
+        self.min_pages = min_pages if min_pages is not None else settings.PDF_PARALLEL_MIN_PAGES
+        self.pages_per_task = pages_per_task or settings.PDF_PAGES_PER_TASK
+
+    def iter_pages(self, path):
+        page_count = self.page_count(path)
+        if self.workers < 2 or page_count < self.min_pages or multiprocessing.current_process().daemon:
+            yield from super().iter_pages(path)
+            return
+
+        ranges = deque(
+            (start, min(start + self.pages_per_task, page_count))
+            for start in range(0, page_count, self.pages_per_task)
+        )
+
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        in_flight = deque()
+        max_in_flight = self.workers * 2
+
+        def fill():
+            while ranges and len(in_flight) < max_in_flight:
+                start, end = ranges.popleft()
+                in_flight.append(executor.submit(_extract_page_range, path, start, end))
+
+        try:
+            # Worker processes start on the first submit
+            fill()
+        except OSError as e:
+            # e.g. out of processes or memory
+            executor.shutdown(cancel_futures=True)
+            logger.warning(f"⚠️ Parallel extraction unavailable ({str(e)}), reading pages sequentially.")
+            yield from super().iter_pages(path)
+            return
+
+        with executor:
+            while in_flight:
+                # Oldest range first keeps the output in page order
+                yield from in_flight.popleft().result()
+                fill()
+
+
+class PyPDF2Extractor(TextExtractor):
+
+    def page_count(self, path):
+        return len(PdfReader(path).pages)
+
+    def iter_pages(self, path):
+        for page in PdfReader(path).pages:
+            yield page.extract_text()
+
+
+EXTRACTORS = {
+    'fitz': FitzExtractor,
+    'fitz_parallel': ParallelFitzExtractor,
+    'pypdf2': PyPDF2Extractor,
+}
+
+
+def get_extractor(name=None):
+    name = name or settings.PDF_EXTRACTOR
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown PDF_EXTRACTOR '{name}'. Choose from: {', '.join(EXTRACTORS)}")
+    return EXTRACTORS[name]()
@@ -0,0 +1,181 @@
+"""
+Local stand-in for the Groq client.
+
+Mirrors the subset of the Groq SDK that llm_utils uses
+(client.chat.completions.create, with and without stream=True) and
+returns a canned answer, so tests and offline development never call the
+real API. Enable it with LLM_FAKE=true.
+
+FakeAsyncGroqClient does the same for the AsyncGroq client (non-streaming).
+
+FakeLLMServer is an OpenAI-compatible HTTP server for exercising the real
+SDK path instead: latency, timeouts, 429/5xx responses and recovery
+(tests of llm_client, benchmarks/bench_async_chat.py).
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+DEFAULT_REPLY = (
+    "This is a simulated answer from the local fake LLM. "
+    "It is based on the provided excerpts."
+)
+
+
+class FakeCompletions:
+
+    def __init__(self, reply, token_delay):
+        self.reply = reply
+        self.token_delay = token_delay
+        self.calls = []
+
+    def create(self, messages, stream=False, **kwargs):
+        self.calls.append({"messages": messages, "stream": stream, **kwargs})
+        if stream:
+            return self._stream()
+
+        time.sleep(self.token_delay * len(self._tokens()))
+        message = SimpleNamespace(content=self.reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def _tokens(self):
+        # Split on spaces but keep them, so joined tokens == reply
+        words = self.reply.split(' ')
+        return [word + ' ' for word in words[:-1]] + [words[-1]]
+
+    def _stream(self):
+        for token in self._tokens():
+            time.sleep(self.token_delay)
+            delta = SimpleNamespace(content=token)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class FakeGroqClient:
+
+    def __init__(self, reply=DEFAULT_REPLY, token_delay=0.0):
+        self.chat = SimpleNamespace(completions=FakeCompletions(reply, token_delay))
+
+
+class FakeAsyncCompletions(FakeCompletions):
+
+    async def create(self, messages, stream=False, **kwargs):
+        self.calls.append({"messages": messages, "stream": stream, **kwargs})
+        await asyncio.sleep(self.token_delay * len(self._tokens()))
+        message = SimpleNamespace(content=self.reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class FakeAsyncGroqClient:
+
+    def __init__(self, reply=DEFAULT_REPLY, token_delay=0.0):
+        self.chat = SimpleNamespace(completions=FakeAsyncCompletions(reply, token_delay))
+
+
+class FakeLLMServer:
+    """
+    Serves POST .../chat/completions on 127.0.0.1. Each request plays the next
+    step of `script` (the last step repeats):
+        'ok'        -> 200 with `reply` after `latency_ms` (SSE when stream=true)
+        'hang'      -> 200 after `hang_seconds`, longer than any sane client timeout
+        429, 503... -> that status code; 429 and 503 carry Retry-After: `retry_after`
+
+    Use as a context manager; `url` is the base_url for Groq(...).
+    """
+
+    def __init__(self, script=('ok',), reply=DEFAULT_REPLY, latency_ms=0, hang_seconds=5, retry_after=1, port=0):
+        self.script = list(script)
+        self.reply = reply
+        self.latency_ms = latency_ms
+        self.hang_seconds = hang_seconds
+        self.retry_after = retry_after
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def _next_step(self):
+        with self._lock:
+            step = self.script[min(self.requests, len(self.script) - 1)]
+            self.requests += 1
+        return step
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                step = server._next_step()
+
+                if step == 'hang':
+                    time.sleep(server.hang_seconds)
+                elif step != 'ok':
+                    return self._send_error(step)
+
+                time.sleep(server.latency_ms / 1000)
+                if body.get('stream'):
+                    return self._send_stream()
+                self._send_json(200, {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get('model', 'fake'),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": server.reply},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+                })
+
+            def _send_error(self, status):
+                headers = {'Retry-After': str(server.retry_after)} if status in (429, 503) else {}
+                self._send_json(status, {"error": {"message": f"fake upstream error {status}"}}, headers)
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.end_headers()
+                for token in FakeCompletions(server.reply, 0)._tokens():
+                    chunk = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": "fake",
+                        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.write(b"data: [DONE]\n\n")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
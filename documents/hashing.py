@@ -0,0 +1,26 @@
+"""
+Content hashes used to tell whether a file or a chunk has changed since the
+last analysis, and to store identical uploads only once.
+"""
+import hashlib
+
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+def stream_hash(blocks):
+    """SHA-256 of an iterable of byte strings."""
+    digest = hashlib.sha256()
+    for block in blocks:
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def file_hash(path):
+    """SHA-256 of a file, read in 1 MB blocks."""
+    with open(path, 'rb') as f:
+        return stream_hash(iter(lambda: f.read(READ_BLOCK_SIZE), b''))
+
+
+def text_hash(text):
+    """SHA-256 of a chunk's text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
@@ -0,0 +1,292 @@
+"""
+Resilience layer shared by every LLM call (answers, multi-document answers,
+document summaries; sync, async and streaming).
+
+- Pooled clients: one httpx connection pool per process (keep-alive reused
+  across calls) with explicit connect/read timeouts instead of the SDK's
+  10-minute default. The SDK's own retries are off; retries happen here.
+- Retries: 429, 5xx, timeouts and connection errors are retried up to
+  LLM_MAX_RETRIES times with full-jitter exponential backoff. A Retry-After
+  from the provider is the minimum wait; if it asks for more than
+  LLM_RETRY_MAX_DELAY the call gives up instead of parking a request thread.
+- Circuit breaker: after LLM_BREAKER_THRESHOLD consecutive failed attempts
+  calls fail immediately for LLM_BREAKER_RESET seconds, then a single trial
+  call decides whether it closes again. A Retry-After also holds back every
+  other call in the process until it has passed, so parallel callers (e.g.
+  map-reduce summaries) don't keep hitting a rate limit.
+
+Every failure surfaces as LLMUnavailable, never as answer text: the views
+turn it into a 503 with Retry-After and nothing is cached; a failed summary
+fails the analysis.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import httpx
+from django.conf import settings
+from groq import APIConnectionError, APIStatusError, AsyncGroq, Groq
+
+logger = logging.getLogger(__name__)
+
+# Global variable to hold the per-process circuit breaker (created on first use)
+_breaker = None
+
+
+class LLMUnavailable(Exception):
+    """The LLM gave no usable response. `retry_after` (seconds) is a hint for the client, if known."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# ============================================================================
+# POOLED CLIENTS
+# ============================================================================
+
+def _timeout():
+    return httpx.Timeout(settings.LLM_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT)
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_CONNECTIONS
+    )
+
+
+def build_client(api_key, base_url=None):
+    return Groq(
+        api_key=api_key,
+        base_url=base_url,
+        max_retries=0,
+        http_client=httpx.Client(timeout=_timeout(), limits=_limits()),
+    )
+
+
+def build_async_client(api_key, base_url=None):
+    return AsyncGroq(
+        api_key=api_key,
+        base_url=base_url,
+        max_retries=0,
+        http_client=httpx.AsyncClient(timeout=_timeout(), limits=_limits()),
+    )
+
+
+# ============================================================================
+# CIRCUIT BREAKER
+# ============================================================================
+
+class CircuitBreaker:
+    """
+    closed    -> calls go through; consecutive failures are counted
+    open      -> calls fail fast until `reset_timeout` seconds have passed
+    half_open -> one trial call goes through; success closes, failure re-opens
+    Independently, hold() pauses calls until a provider Retry-After has passed.
+    """
+
+    def __init__(self, threshold, reset_timeout, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.hold_until = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def before_call(self, max_wait=None):
+        """
+        Seconds to wait before sending (a Retry-After still running). Raises
+        LLMUnavailable if the circuit is open or the wait is over `max_wait`.
+        """
+        with self._lock:
+            now = self.clock()
+            state = self.state
+            if state == 'open' or (state == 'half_open' and self._trial_in_flight):
+                retry_after = max(1.0, self.opened_at + self.reset_timeout - now)
+                raise LLMUnavailable("The AI service is temporarily unavailable.", retry_after=retry_after)
+
+            wait = max(0.0, self.hold_until - now)
+            if max_wait is not None and wait > max_wait:
+                raise LLMUnavailable("The AI service is rate limiting requests.", retry_after=wait)
+            if state == 'half_open':
+                self._trial_in_flight = True
+            return wait
+
+    def hold(self, seconds):
+        """The provider asked (Retry-After) for no requests during the next `seconds`."""
+        with self._lock:
+            self.hold_until = max(self.hold_until, self.clock() + seconds)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.threshold:
+                if self.opened_at is None or self._trial_in_flight:
+                    logger.warning(f"⚡ LLM circuit breaker opened after {self.failures} failed attempts")
+                self.opened_at = self.clock()
+            self._trial_in_flight = False
+
+    def release(self):
+        """A call ended without telling anything about provider health (e.g. a 400)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+def get_breaker():
+    global _breaker
+
+    if _breaker is None:
+        _breaker = CircuitBreaker(settings.LLM_BREAKER_THRESHOLD, settings.LLM_BREAKER_RESET)
+    return _breaker
+
+
+# ============================================================================
+# RETRY POLICY
+# ============================================================================
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify(error):
+    """(retryable, retry_after) for an exception raised by the SDK."""
+    if isinstance(error, APIStatusError):
+        retryable = error.status_code == 429 or error.status_code >= 500
+        return retryable, parse_retry_after(error.response.headers.get('retry-after'))
+    if isinstance(error, APIConnectionError):  # Includes APITimeoutError
+        return True, None
+    return False, None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Seconds to sleep before retry number `attempt` + 1, or None to give up
+    because the provider asks for a longer wait than LLM_RETRY_MAX_DELAY.
+    """
+    if retry_after is not None and retry_after > settings.LLM_RETRY_MAX_DELAY:
+        return None
+    # Full jitter: spreads retries from many workers instead of synchronizing them
+    ceiling = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * 2 ** attempt)
+    return max(random.uniform(0, ceiling), retry_after or 0)
+
+
+def _next_delay(breaker, error, attempt):
+    """Records a failed attempt; returns the sleep before the next one or raises LLMUnavailable."""
+    retryable, retry_after = classify(error)
+    if not retryable:
+        breaker.release()
+        raise LLMUnavailable(f"The AI service rejected the request: {str(error)}") from error
+
+    breaker.record_failure()
+    if retry_after:
+        breaker.hold(retry_after)
+    delay = backoff_delay(attempt, retry_after)
+    if attempt >= settings.LLM_MAX_RETRIES or delay is None:
+        logger.error(f"❌ LLM call failed after {attempt + 1} attempts: {str(error)}")
+        raise LLMUnavailable("The AI service is temporarily unavailable.", retry_after=retry_after) from error
+
+    logger.warning(f"⚠️ LLM attempt {attempt + 1} failed ({str(error)}), retrying in {delay:.2f}s")
+    return delay
+
+
+# ============================================================================
+# CALLS
+# ============================================================================
+
+def complete(client, messages, **params):
+    """chat.completions.create() with retries and the breaker; returns the message text."""
+    breaker = get_breaker()
+    attempt = 0
+    while True:
+        time.sleep(breaker.before_call(settings.LLM_RETRY_MAX_DELAY))
+        try:
+            response = client.chat.completions.create(messages=messages, **params)
+        except Exception as e:
+            time.sleep(_next_delay(breaker, e, attempt))
+            attempt += 1
+            continue
+        breaker.record_success()
+        return response.choices[0].message.content
+
+
+async def acomplete(async_client, messages, **params):
+    """Async complete(): backoff sleeps with asyncio.sleep, so waiting holds no thread."""
+    breaker = get_breaker()
+    attempt = 0
+    while True:
+        await asyncio.sleep(breaker.before_call(settings.LLM_RETRY_MAX_DELAY))
+        try:
+            response = await async_client.chat.completions.create(messages=messages, **params)
+        except Exception as e:
+            await asyncio.sleep(_next_delay(breaker, e, attempt))
+            attempt += 1
+            continue
+        breaker.record_success()
+        return response.choices[0].message.content
+
+
+def stream(client, messages, **params):
+    """
+    Yields answer text pieces. Only opening the stream is retried: once
+    tokens have been sent a retry would repeat them, so a broken stream
+    raises LLMUnavailable.
+    """
+    breaker = get_breaker()
+    attempt = 0
+    while True:
+        time.sleep(breaker.before_call(settings.LLM_RETRY_MAX_DELAY))
+        try:
+            chunks = client.chat.completions.create(messages=messages, stream=True, **params)
+        except Exception as e:
+            time.sleep(_next_delay(breaker, e, attempt))
+            attempt += 1
+            continue
+        break
+
+    try:
+        for chunk in chunks:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+    except GeneratorExit:
+        # The client went away mid-answer; that says nothing about the provider
+        breaker.release()
+        raise
+    except Exception as e:
+        retryable, _ = classify(e)
+        if retryable:
+            breaker.record_failure()
+        else:
+            breaker.release()
+        raise LLMUnavailable("The answer stream was interrupted.") from e
+    breaker.record_success()
@@ -1,34 +1,41 @@
 import os
-from groq import Groq
+from .fake_llm import FakeGroqClient, FakeAsyncGroqClient
+from .llm_client import acomplete, build_async_client, build_client, complete, stream
+from .context_packing import pack_context
 
 # Read API key from environment
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "YOUR_GROQ_API_KEY_HERE")
 
-client = Groq(api_key=GROQ_API_KEY)
+# Point the SDK at another OpenAI-compatible server (e.g. fake_llm.FakeLLMServer for load tests)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+
+# LLM_FAKE=true swaps Groq for a local canned-response client (tests, load tests, offline dev)
+LLM_FAKE = os.getenv("LLM_FAKE", "false").lower() == "true"
+
+# Pooled, with timeouts; retries and the circuit breaker live in llm_client
+client = FakeGroqClient() if LLM_FAKE else build_client(GROQ_API_KEY, GROQ_BASE_URL)
+
+# Used by the async (ASGI) endpoints in async_views.py: awaiting it doesn't hold a thread
+async_client = FakeAsyncGroqClient() if LLM_FAKE else build_async_client(GROQ_API_KEY, GROQ_BASE_URL)
 
 # ============================================================================
 # ENHANCED ANSWER GENERATION (RAG)
 # ============================================================================
 
-def generate_answer(question, context_chunks):
+def build_answer_messages(question, context_chunks):
     """
-    Enhanced RAG answer generation with:
-    - Better context structuring
-    - Source awareness
-    - Confidence indicators
-    - Fallback handling
+    Builds the chat messages for single-document RAG answers.
+    Shared by generate_answer() and stream_answer().
     """
     
-    # Build enriched context with metadata
+    # Build enriched context with metadata (overlapping neighbours merged, within the token budget)
     context_parts = []
-    for i, chunk in enumerate(context_chunks):
-        # Extract metadata
-        page = getattr(chunk, 'chunk_index', i) + 1
-        similarity = 1 - float(getattr(chunk, 'distance', 0))
+    for i, span in enumerate(pack_context(context_chunks)):
+        similarity = 1 - span.distance
         
         context_parts.append(
-            f"[SOURCE {i+1}] (Page {page}, Relevance: {similarity:.0%})\n"
-            f"{chunk.text_content}\n"
+            f"[SOURCE {i+1}] ({span.pages}, Relevance: {similarity:.0%})\n"
+            f"{span.text_content}\n"
         )
     
     context_text = "\n---\n".join(context_parts)
@@ -66,44 +73,52 @@ USER QUESTION:
 
 Please provide a clear, accurate answer based on the excerpts above. If the information needed to answer isn't present, let me know."""
 
-    try:
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            model="llama-3.3-70b-versatile",
-            temperature=0.2,  # Low for factual accuracy
-            max_tokens=800,   # Allow detailed answers
-            top_p=0.9,        # Nucleus sampling for quality
-        )
-        
-        return chat_completion.choices[0].message.content
-        
-    except Exception as e:
-        return f"I encountered an error processing your question: {str(e)}. Please try again or rephrase your question."
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+ANSWER_PARAMS = {
+    "model": "llama-3.3-70b-versatile",
+    "temperature": 0.2,  # Low for factual accuracy
+    "max_tokens": 800,   # Allow detailed answers
+    "top_p": 0.9,        # Nucleus sampling for quality
+}
+
+
+def generate_answer(question, context_chunks):
+    """
+    Enhanced RAG answer generation with:
+    - Better context structuring
+    - Source awareness
+    - Confidence indicators
+    Raises LLMUnavailable if the LLM can't answer (never returns an error as the answer).
+    """
+    return complete(client, build_answer_messages(question, context_chunks), **ANSWER_PARAMS)
+
+
+async def agenerate_answer(question, context_chunks):
+    """Async version of generate_answer() for the ASGI endpoints."""
+    return await acomplete(async_client, build_answer_messages(question, context_chunks), **ANSWER_PARAMS)
+
+
+def stream_answer(question, context_chunks):
+    """
+    Streaming version of generate_answer().
+    Yields answer text pieces as the LLM produces them.
+    """
+    yield from stream(client, build_answer_messages(question, context_chunks), **ANSWER_PARAMS)
 
 
 # ============================================================================
 # ENHANCED DOCUMENT ANALYSIS (SUMMARIZATION)
 # ============================================================================
 
-def generate_beneficial_analysis(text):
-    """
-    Enhanced document analysis with:
-    - Specific, actionable insights
-    - Document type identification
-    - Key facts extraction
-    - Concrete examples
-    """
-    
-    # Safety clip to prevent API overload
-    safe_text = text[:15000]
-    
-    # Word count for context
-    word_count = len(safe_text.split())
-    
-    system_prompt = """You are an expert document analyst specializing in extracting actionable insights.
+# Bump when ANALYSIS_SYSTEM_PROMPT or the analysis user prompts change: cached analyses are keyed on it
+ANALYSIS_PROMPT_VERSION = 1
+
+ANALYSIS_SYSTEM_PROMPT = """You are an expert document analyst specializing in extracting actionable insights.
 
 YOUR TASK:
 Create a comprehensive analysis that helps users quickly understand:
@@ -150,37 +165,101 @@ QUALITY STANDARDS:
 - Keep total length under 300 words
 - Use clear, professional language"""
 
+
+ANALYSIS_PARAMS = {
+    "model": "llama-3.3-70b-versatile",
+    "temperature": 0.3,   # Slightly higher for nuanced analysis
+    "max_tokens": 1000,   # Allow detailed summaries
+    "top_p": 0.95,
+}
+
+
+def generate_beneficial_analysis(text):
+    """
+    Enhanced document analysis with:
+    - Specific, actionable insights
+    - Document type identification
+    - Key facts extraction
+    - Concrete examples
+    """
+    
+    # Safety clip to prevent API overload
+    safe_text = text[:15000]
+    
+    # Word count for context
+    word_count = len(safe_text.split())
+    
     user_prompt = f"""Analyze this document excerpt ({word_count} words):
 
 {safe_text}
 
 Provide a detailed analysis following the structure specified."""
 
-    try:
-        response = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            model="llama-3.3-70b-versatile",
-            temperature=0.3,      # Slightly higher for nuanced analysis
-            max_tokens=1000,      # Allow detailed summaries
-            top_p=0.95,
-        )
-        
-        return response.choices[0].message.content
-        
-    except Exception as e:
-        return f"""## Summary
-Analysis failed due to a technical error. The document contains {word_count} words of content.
+    # LLMUnavailable propagates: the analysis is marked failed instead of storing an error as insights
+    return complete(
+        client,
+        [
+            {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ],
+        **ANALYSIS_PARAMS,
+    )
 
-## Key Insights
-* Unable to generate insights due to: {str(e)}
-* Please try re-analyzing the document
-* If the error persists, the document may contain formatting issues
 
-## Document Type
-Unknown - Analysis incomplete"""
+# ============================================================================
+# MAP-REDUCE ANALYSIS FOR LONG DOCUMENTS (see summarization.py)
+# ============================================================================
+
+# Bump when SECTION_SYSTEM_PROMPT changes: cached section notes are keyed on it
+SECTION_PROMPT_VERSION = 1
+
+SECTION_SYSTEM_PROMPT = """You are reading one section of a longer document so that it can be analyzed as a whole later.
+
+Write dense notes on this section only:
+- Keep SPECIFIC facts: names, numbers, dates, definitions, techniques, frameworks, conclusions
+- Note what kind of content it is (e.g. contract clauses, tutorial steps, results, policy rules)
+- No introduction, no commentary about the section itself
+- At most 150 words, as bullet points"""
+
+SECTION_PARAMS = {
+    "model": "llama-3.3-70b-versatile",
+    "temperature": 0.2,
+    "max_tokens": 300,
+}
+
+
+def summarize_section(text):
+    """Map step: bullet-point notes for one section. Raises LLMUnavailable."""
+    return complete(
+        client,
+        [
+            {"role": "system", "content": SECTION_SYSTEM_PROMPT},
+            {"role": "user", "content": f"SECTION:\n\n{text}"}
+        ],
+        **SECTION_PARAMS,
+    )
+
+
+def combine_section_summaries(notes, word_count):
+    """
+    Reduce step: the usual ## Summary / ## Key Insights / ## Document Type
+    analysis, written from the ordered notes of every section.
+    """
+    sections_text = "\n\n".join(f"[Section {i+1}]\n{note}" for i, note in enumerate(notes))
+    user_prompt = f"""The document ({word_count} words) was read in {len(notes)} sections. Notes on each section, in order:
+
+{sections_text}
+
+Analyze the WHOLE document from these notes, following the structure specified."""
+
+    return complete(
+        client,
+        [
+            {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ],
+        **ANALYSIS_PARAMS,
+    )
 
 
 # ============================================================================
@@ -213,36 +292,35 @@ def validate_context_quality(question, context_chunks):
 # OPTIONAL: MULTI-DOCUMENT ANSWER GENERATION
 # ============================================================================
 
-def generate_multi_document_answer(question, context_chunks):
+def build_multi_document_messages(question, context_chunks):
     """
-    Enhanced version for global_ask endpoint that handles multiple documents.
-    Similar to generate_answer but optimized for cross-document queries.
+    Builds the chat messages for cross-document answers.
+    Shared by generate_multi_document_answer() and stream_multi_document_answer().
     """
     
-    # Group chunks by document
+    # Group spans by document (overlapping neighbours merged, within the token budget)
     docs_map = {}
-    for chunk in context_chunks:
-        doc_id = chunk.document.id
-        doc_title = chunk.document.title
+    for span in pack_context(context_chunks):
+        doc_id = span.document.id
+        doc_title = span.document.title
         
         if doc_id not in docs_map:
             docs_map[doc_id] = {
                 'title': doc_title,
-                'chunks': []
+                'spans': []
             }
-        docs_map[doc_id]['chunks'].append(chunk)
+        docs_map[doc_id]['spans'].append(span)
     
     # Build context with document separation
     context_parts = []
     for doc_id, doc_data in docs_map.items():
         context_parts.append(f"\n{'='*60}\nDOCUMENT: {doc_data['title']}\n{'='*60}")
         
-        for i, chunk in enumerate(doc_data['chunks']):
-            page = chunk.chunk_index + 1
-            similarity = 1 - float(chunk.distance)
+        for i, span in enumerate(doc_data['spans']):
+            similarity = 1 - span.distance
             context_parts.append(
-                f"\n[Excerpt {i+1}, Page {page}, Relevance: {similarity:.0%}]\n"
-                f"{chunk.text_content}"
+                f"\n[Excerpt {i+1}, {span.pages}, Relevance: {similarity:.0%}]\n"
+                f"{span.text_content}"
             )
     
     context_text = "\n".join(context_parts)
@@ -276,19 +354,39 @@ USER QUESTION:
 
 Provide a comprehensive answer synthesizing information from these documents."""
 
-    try:
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            model="llama-3.3-70b-versatile",
-            temperature=0.25,
-            max_tokens=1000,
-            top_p=0.9,
-        )
-        
-        return chat_completion.choices[0].message.content
-        
-    except Exception as e:
-        return f"Error synthesizing answer from multiple documents: {str(e)}"
\ No newline at end of file
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+MULTI_DOCUMENT_PARAMS = {
+    "model": "llama-3.3-70b-versatile",
+    "temperature": 0.25,
+    "max_tokens": 1000,
+    "top_p": 0.9,
+}
+
+
+def generate_multi_document_answer(question, context_chunks):
+    """
+    Enhanced version for global_ask endpoint that handles multiple documents.
+    Similar to generate_answer but optimized for cross-document queries.
+    Raises LLMUnavailable if the LLM can't answer.
+    """
+    return complete(client, build_multi_document_messages(question, context_chunks), **MULTI_DOCUMENT_PARAMS)
+
+
+async def agenerate_multi_document_answer(question, context_chunks):
+    """Async version of generate_multi_document_answer() for the ASGI endpoints."""
+    return await acomplete(
+        async_client, build_multi_document_messages(question, context_chunks), **MULTI_DOCUMENT_PARAMS
+    )
+
+
+def stream_multi_document_answer(question, context_chunks):
+    """
+    Streaming version of generate_multi_document_answer().
+    Yields answer text pieces as the LLM produces them.
+    """
+    yield from stream(client, build_multi_document_messages(question, context_chunks), **MULTI_DOCUMENT_PARAMS)
@@ -0,0 +1,51 @@
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.embeddings import LocalBackend, OnnxBackend
+from documents.models import DocumentChunk
+
+SAMPLE_TEXTS = [
+    "The tenant shall pay rent on the first day of each month.",
+    "Invoice #4821 is due within 30 days of receipt.",
+    "Temperature 0.2 produces consistent outputs for code generation.",
+    "This policy applies to all full-time employees and contractors.",
+    "Section 7.3 limits liability to the fees paid in the prior twelve months.",
+    "The quarterly report shows revenue growth of 14% year over year.",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ONNX (fp32 and int8) embeddings against the PyTorch fp32 model "
+        "using cosine similarity. Exits with an error if parity is below --min-cosine."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=200, help="Chunks to sample from the DB")
+        parser.add_argument('--min-cosine', type=float, default=0.99)
+        parser.add_argument('--batch-size', type=int, default=32)
+
+    def handle(self, *args, **options):
+        # 1. Real chunks if we have them, built-in sentences otherwise
+        texts = list(
+            DocumentChunk.objects.order_by('?').values_list('text_content', flat=True)[:options['samples']]
+        ) or SAMPLE_TEXTS
+        self.stdout.write(f"Comparing {len(texts)} texts against PyTorch fp32...")
+
+        batch_size = options['batch_size']
+        reference = np.array(LocalBackend().encode(texts, batch_size), dtype=np.float32)
+
+        failed = False
+        for label, quantized in (('onnx fp32', False), ('onnx int8', True)):
+            candidate = np.array(OnnxBackend(quantized=quantized).encode(texts, batch_size), dtype=np.float32)
+            cosines = (reference * candidate).sum(axis=1) / (
+                np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+            )
+            self.stdout.write(
+                f"{label:<10} mean cosine={cosines.mean():.5f}  min cosine={cosines.min():.5f}"
+            )
+            failed = failed or cosines.min() < options['min_cosine']
+
+        if failed:
+            raise CommandError(f"Parity below {options['min_cosine']}. Keep EMBEDDING_BACKEND='local'.")
+        self.stdout.write(self.style.SUCCESS("Parity OK."))
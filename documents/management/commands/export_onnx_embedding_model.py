@@ -0,0 +1,59 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Export all-mpnet-base-v2 to ONNX (model.onnx) and a dynamically "
+        "int8-quantized copy (model.int8.onnx) for EMBEDDING_BACKEND='onnx'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.EMBEDDING_ONNX_MODEL_DIR)
+        parser.add_argument('--model', default='sentence-transformers/all-mpnet-base-v2')
+        parser.add_argument('--opset', type=int, default=14)
+        parser.add_argument('--no-quantize', action='store_true', help="Only export the fp32 model")
+
+    def handle(self, *args, **options):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        output = options['output']
+        os.makedirs(output, exist_ok=True)
+        fp32_path = os.path.join(output, 'model.onnx')
+
+        # 1. Export the transformer; pooling + normalization happen in OnnxBackend
+        self.stdout.write(f"Exporting {options['model']} to {fp32_path}...")
+        tokenizer = AutoTokenizer.from_pretrained(options['model'])
+        model = AutoModel.from_pretrained(options['model'])
+        model.eval()
+
+        sample = tokenizer(["SmartDoc export sample"], return_tensors='pt')
+        dynamic_axes = {'input_ids': {0: 'batch', 1: 'sequence'},
+                        'attention_mask': {0: 'batch', 1: 'sequence'},
+                        'last_hidden_state': {0: 'batch', 1: 'sequence'}}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (sample['input_ids'], sample['attention_mask']),
+                fp32_path,
+                input_names=['input_ids', 'attention_mask'],
+                output_names=['last_hidden_state'],
+                dynamic_axes=dynamic_axes,
+                opset_version=options['opset'],
+            )
+        tokenizer.save_pretrained(output)
+
+        # 2. Dynamic int8 quantization of the weights (activations stay fp32)
+        if not options['no_quantize']:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            int8_path = os.path.join(output, 'model.int8.onnx')
+            self.stdout.write(f"Quantizing to {int8_path}...")
+            quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+        self.stdout.write(self.style.SUCCESS(
+            "Done. Check quality with: python manage.py embedding_parity"
+        ))
@@ -0,0 +1,60 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from documents.models import Document
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete stored PDFs that no Document references. Identical uploads share one file "
+        "(ContentAddressedStorage), so deleting a Document never deletes its file; run this "
+        "periodically (e.g. daily from cron) to reclaim the space."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="List what would be deleted, delete nothing")
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help="Keep files written or reused more recently than this (an upload may not have saved its row yet)"
+        )
+
+    def handle(self, *args, **options):
+        field = Document._meta.get_field('file')
+        storage = field.storage
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+
+        # 1. Everything under the upload directory, listed before the references are read
+        names = list(self._walk(storage, field.upload_to.rstrip('/')))
+
+        # 2. Files some Document still points at
+        referenced = set(Document.objects.exclude(file='').values_list('file', flat=True))
+
+        # 3. Unreferenced and past the grace period
+        deleted = freed = 0
+        for name in names:
+            if name in referenced or storage.get_modified_time(name) > cutoff:
+                continue
+            size = storage.size(name)
+            if options['dry_run']:
+                self.stdout.write(f"would delete {name} ({size / 1024:.1f} KB)")
+            else:
+                storage.delete(name)
+            deleted += 1
+            freed += size
+
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {deleted} of {len(names)} files ({freed / 1024 / 1024:.1f} MB), {len(referenced)} referenced."
+        ))
+
+    def _walk(self, storage, directory):
+        if not storage.exists(directory):
+            return
+        subdirectories, files = storage.listdir(directory)
+        for filename in files:
+            yield posixpath.join(directory, filename)
+        for subdirectory in subdirectories:
+            yield from self._walk(storage, posixpath.join(directory, subdirectory))
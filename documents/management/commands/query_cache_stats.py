@@ -0,0 +1,26 @@
+import redis
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.caching import get_redis
+from documents.embedding_cache import STATS_KEY, get_shared_stats
+
+
+class Command(BaseCommand):
+    help = "Show query-embedding cache hit/miss counters aggregated across all workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Zero the counters after printing")
+
+    def handle(self, *args, **options):
+        try:
+            stats = get_shared_stats()
+        except redis.RedisError as e:
+            raise CommandError(f"Could not read stats from Redis: {str(e)}")
+
+        for field, value in stats.items():
+            self.stdout.write(f"{field:<24} {value}")
+
+        if options['reset']:
+            get_redis(settings.QUERY_EMBEDDING_REDIS_URL).delete(STATS_KEY)
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
@@ -0,0 +1,87 @@
+import random
+import re
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.embeddings import get_embedding
+from documents.models import DocumentChunk
+from documents.retrieval import RETRIEVAL_MODES, retrieve_chunks
+
+TOKEN_PATTERN = re.compile(r"\b[A-Za-z0-9]+(?:[./-][A-Za-z0-9]+)*\b")
+
+
+def is_identifier(token):
+    """Clause numbers, product codes, invoice ids: 14.2, SKU-4471, INV2024 (not plain numbers like 30)."""
+    has_digit = any(c.isdigit() for c in token)
+    has_letter_or_separator = any(c.isalpha() or c in './-' for c in token)
+    return len(token) >= 3 and has_digit and has_letter_or_separator
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare vector-only and hybrid (vector + full-text, RRF) retrieval: hit rate@k and latency. "
+        "Queries are built from stored chunks: 'identifier' queries name a code such as 14.2 or SKU-4471, "
+        "'passage' queries are the opening words of a chunk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=5, help="Number of chunks retrieved per query")
+        parser.add_argument('--queries', type=int, default=50, help="Number of queries per query set")
+        parser.add_argument('--passage-words', type=int, default=12)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        k = options['k']
+        chunks = list(DocumentChunk.objects.filter(embedding__isnull=False).values_list('id', 'text_content'))
+        if not chunks:
+            raise CommandError("No embedded chunks found. Analyze some documents first.")
+
+        random.seed(options['seed'])
+        query_sets = {
+            "identifier": self._identifier_queries(chunks, options['queries']),
+            "passage": self._passage_queries(chunks, options['queries'], options['passage_words']),
+        }
+        self.stdout.write(f"Corpus: {len(chunks)} chunks, k={k}")
+
+        queryset = DocumentChunk.objects.filter(embedding__isnull=False)
+        for name, queries in query_sets.items():
+            if not queries:
+                self.stdout.write(f"{name}: no queries could be built from this corpus, skipped")
+                continue
+
+            # Embed once up front so the timings only cover retrieval
+            vectors = [get_embedding(question) for question, _ in queries]
+            for mode in RETRIEVAL_MODES:
+                hits, latencies = 0, []
+                for (question, expected), vector in zip(queries, vectors):
+                    start = time.perf_counter()
+                    found = retrieve_chunks(queryset, question, vector, top_k=k, mode=mode)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    hits += bool(expected & {chunk.id for chunk in found})
+                self._report(f"{name}/{mode}", hits / len(queries), latencies)
+
+    def _identifier_queries(self, chunks, count):
+        """'What does the document say about X?' -> every chunk containing X is a correct hit."""
+        containing = {}
+        for chunk_id, text in chunks:
+            for identifier in {token for token in TOKEN_PATTERN.findall(text) if is_identifier(token)}:
+                containing.setdefault(identifier, set()).add(chunk_id)
+
+        identifiers = sorted(containing)
+        sample = random.sample(identifiers, min(count, len(identifiers)))
+        return [(f"What does the document say about {identifier}?", containing[identifier]) for identifier in sample]
+
+    def _passage_queries(self, chunks, count, words):
+        """The opening words of a chunk -> that chunk is the correct hit."""
+        sample = random.sample(chunks, min(count, len(chunks)))
+        return [(' '.join(text.split()[:words]), {chunk_id}) for chunk_id, text in sample]
+
+    def _report(self, label, hit_rate, latencies):
+        latencies = sorted(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(
+            f"{label:<20} hit@k={hit_rate:.3f}  "
+            f"mean={statistics.mean(latencies):.2f}ms  p95={p95:.2f}ms"
+        )
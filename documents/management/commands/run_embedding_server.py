@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from documents.embedding_server import MicroBatcher, make_server
+from documents.embeddings import LocalBackend
+
+
+class Command(BaseCommand):
+    help = "Run the shared embedding server (one model copy, dynamic micro-batching)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='0.0.0.0')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--max-batch-size', type=int, default=settings.EMBEDDING_SERVER_MAX_BATCH_SIZE)
+        parser.add_argument('--max-wait-ms', type=float, default=settings.EMBEDDING_SERVER_MAX_WAIT_MS)
+        parser.add_argument(
+            '--no-warmup', action='store_true',
+            help="Skip loading the model before accepting requests"
+        )
+
+    def handle(self, *args, **options):
+        # The server always encodes in-process, whatever EMBEDDING_BACKEND says
+        local = LocalBackend()
+        batch_size = options['max_batch_size']
+
+        if not options['no_warmup']:
+            local.encode(["warmup"], batch_size)
+
+        batcher = MicroBatcher(
+            lambda texts: local.encode(texts, batch_size),
+            max_batch_size=batch_size,
+            max_wait_ms=options['max_wait_ms'],
+        )
+        server = make_server(options['host'], options['port'], batcher)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Embedding server listening on {options['host']}:{options['port']} "
+            f"(max_batch_size={batch_size}, max_wait_ms={options['max_wait_ms']})"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            batcher.stop()
@@ -0,0 +1,86 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.models import DocumentChunk
+from documents.vector_search import exact_search, nearest, search
+
+# How ask and global_ask narrow the search: (label, chunk -> queryset of the chunks it is searched among)
+SCOPES = (
+    ('all', lambda chunk: DocumentChunk.objects.all()),
+    ('owner', lambda chunk: DocumentChunk.objects.filter(
+        document__owner_id=chunk.document.owner_id, document__status='completed'
+    )),
+    ('document', lambda chunk: DocumentChunk.objects.filter(document_id=chunk.document_id)),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure recall@k and latency of the HNSW index against exact search, over the whole "
+        "table and filtered the way global_ask (one owner) and ask (one document) search. "
+        "Queries are sampled from stored chunk embeddings of completed documents."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=5, help="Number of neighbours to compare")
+        parser.add_argument('--queries', type=int, default=50, help="Number of sampled query vectors")
+        parser.add_argument(
+            '--ef-search', default='20,40,100,200',
+            help="Comma-separated hnsw.ef_search values to evaluate"
+        )
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        k = options['k']
+        ef_values = [int(v) for v in options['ef_search'].split(',') if v.strip()]
+
+        # 1. Sample query vectors from the corpus
+        chunk_ids = list(
+            DocumentChunk.objects.filter(
+                embedding__isnull=False, document__status='completed'
+            ).values_list('id', flat=True)
+        )
+        if not chunk_ids:
+            raise CommandError("No embedded chunks found. Analyze some documents first.")
+
+        random.seed(options['seed'])
+        sample_ids = random.sample(chunk_ids, min(options['queries'], len(chunk_ids)))
+        samples = list(DocumentChunk.objects.filter(id__in=sample_ids).select_related('document'))
+
+        self.stdout.write(f"Corpus: {DocumentChunk.objects.count()} chunks, {len(samples)} queries, k={k}")
+
+        for scope, scoped in SCOPES:
+            self.stdout.write(f"\n{scope}")
+            querysets = [scoped(sample).only('id') for sample in samples]
+            queries = [list(sample.embedding) for sample in samples]
+
+            # 2. Ground truth with a sequential scan
+            truth, exact_latencies = [], []
+            for queryset, query in zip(querysets, queries):
+                start = time.perf_counter()
+                with exact_search():
+                    ids = [chunk.id for chunk in nearest(queryset, query, k, storage='full')]
+                exact_latencies.append((time.perf_counter() - start) * 1000)
+                truth.append(set(ids))
+            self._report("exact", 1.0, exact_latencies)
+
+            # 3. The search ask/global_ask run (ANN, exact fallback when short) at each ef_search value
+            for ef_search in ef_values:
+                recalls, latencies = [], []
+                for queryset, query, expected in zip(querysets, queries, truth):
+                    start = time.perf_counter()
+                    ids = {chunk.id for chunk in search(queryset, query, k, ef_search=ef_search)}
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    recalls.append(len(expected & ids) / len(expected) if expected else 1.0)
+                self._report(f"ef_search={ef_search}", statistics.mean(recalls), latencies)
+
+    def _report(self, label, recall, latencies):
+        latencies = sorted(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(
+            f"  {label:<16} recall@k={recall:.3f}  "
+            f"mean={statistics.mean(latencies):.2f}ms  p95={p95:.2f}ms"
+        )
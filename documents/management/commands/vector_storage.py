@@ -0,0 +1,157 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from pgvector.django import CosineDistance
+
+from documents.models import DocumentChunk
+from documents.vector_search import VECTOR_STORAGE_MODES, ann_search, candidates_needed, exact_search, nearest
+
+TABLE = DocumentChunk._meta.db_table
+
+# The 'full' index belongs to the model (migration 0008); the compact ones are managed here
+INDEXES = {
+    'full': ('documentchunk_embedding_hnsw', None),
+    'halfvec': (
+        'documentchunk_embedding_half_hnsw',
+        "USING hnsw ((embedding::halfvec(768)) halfvec_cosine_ops) WITH (m = 16, ef_construction = 64)",
+    ),
+    'binary': (
+        'documentchunk_embedding_bit_hnsw',
+        "USING hnsw ((binary_quantize(embedding)::bit(768)) bit_hamming_ops) WITH (m = 16, ef_construction = 64)",
+    ),
+}
+
+# halfvec and binary_quantize() arrived in pgvector 0.7.0
+MIN_COMPACT_VERSION = (0, 7, 0)
+
+
+def parse_version(version):
+    return tuple(int(part) for part in version.split('.')[:3])
+
+
+class Command(BaseCommand):
+    help = (
+        "Manage compact vector indexes for DocumentChunk.embedding and compare them. "
+        "enable/disable build or drop a halfvec or binary-quantized HNSW index (CONCURRENTLY, no table rewrite); "
+        "status shows sizes; benchmark reports index size, latency and recall@k against exact search. "
+        "Switch queries over with VECTOR_STORAGE once the index exists."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['status', 'enable', 'disable', 'benchmark'])
+        parser.add_argument('mode', nargs='?', choices=['halfvec', 'binary'], help="Index to enable/disable")
+        parser.add_argument('--k', type=int, default=10, help="Neighbours per query (benchmark)")
+        parser.add_argument('--queries', type=int, default=50, help="Sampled query vectors (benchmark)")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        action = options['action']
+        if action in ('enable', 'disable') and not options['mode']:
+            raise CommandError(f"'{action}' needs a mode: halfvec or binary")
+
+        if action == 'enable':
+            self._check_version()
+            name, definition = INDEXES[options['mode']]
+            self.stdout.write(f"Building {name} (this can take a while on large tables)...")
+            with connection.cursor() as cursor:
+                cursor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {TABLE} {definition}")
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {name} ready. Set VECTOR_STORAGE={options['mode']} to query through it."
+            ))
+        elif action == 'disable':
+            name, _ = INDEXES[options['mode']]
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            self.stdout.write(f"Dropped {name}. Make sure VECTOR_STORAGE no longer points at it.")
+        elif action == 'status':
+            self._status()
+        else:
+            self._benchmark(options)
+
+    def _check_version(self):
+        version = self._extension_version()
+        if version is None or parse_version(version) < MIN_COMPACT_VERSION:
+            raise CommandError(
+                f"halfvec/binary indexes need pgvector >= 0.7.0 (installed: {version or 'none'}). "
+                f"Upgrade the extension with ALTER EXTENSION vector UPDATE."
+            )
+
+    def _extension_version(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def _index_sizes(self):
+        """{mode: size in bytes} for every index that exists."""
+        sizes = {}
+        with connection.cursor() as cursor:
+            for mode, (name, _) in INDEXES.items():
+                cursor.execute("SELECT pg_relation_size(to_regclass(%s))", [name])
+                size = cursor.fetchone()[0]
+                if size is not None:
+                    sizes[mode] = size
+        return sizes
+
+    def _status(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_table_size(%s), count(*) FROM " + TABLE, [TABLE])
+            table_size, rows = cursor.fetchone()
+
+        self.stdout.write(f"pgvector {self._extension_version()}, {rows} chunks, table {table_size / 1024 / 1024:.1f} MB")
+        sizes = self._index_sizes()
+        for mode in VECTOR_STORAGE_MODES:
+            name, _ = INDEXES[mode]
+            size = f"{sizes[mode] / 1024 / 1024:.1f} MB" if mode in sizes else "not built"
+            self.stdout.write(f"{mode:<8} {name:<36} {size}")
+
+    def _benchmark(self, options):
+        k = options['k']
+        self._status()
+
+        # 1. Sample query vectors from the corpus
+        chunk_ids = list(DocumentChunk.objects.filter(embedding__isnull=False).values_list('id', flat=True))
+        if not chunk_ids:
+            raise CommandError("No embedded chunks found. Analyze some documents first.")
+        random.seed(options['seed'])
+        sample_ids = random.sample(chunk_ids, min(options['queries'], len(chunk_ids)))
+        queries = [
+            list(vector) for vector in
+            DocumentChunk.objects.filter(id__in=sample_ids).values_list('embedding', flat=True)
+        ]
+        self.stdout.write(f"\n{len(queries)} queries, k={k}")
+
+        # 2. Ground truth with a sequential scan
+        truth = []
+        for query in queries:
+            with exact_search():
+                truth.append(set(
+                    DocumentChunk.objects.annotate(
+                        distance=CosineDistance('embedding', query)
+                    ).order_by('distance').values_list('id', flat=True)[:k]
+                ))
+
+        # 3. Every storage mode whose index exists
+        sizes = self._index_sizes()
+        for mode in VECTOR_STORAGE_MODES:
+            if mode not in sizes:
+                continue
+            recalls, latencies = [], []
+            ef_search = max(settings.VECTOR_SEARCH_EF_SEARCH, candidates_needed(k, mode))
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                with ann_search(ef_search):
+                    ids = {chunk.id for chunk in nearest(DocumentChunk.objects.only('id'), query, k, storage=mode)}
+                latencies.append((time.perf_counter() - start) * 1000)
+                recalls.append(len(expected & ids) / len(expected))
+
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            self.stdout.write(
+                f"{mode:<8} index={sizes[mode] / 1024 / 1024:8.1f} MB  recall@k={statistics.mean(recalls):.3f}  "
+                f"mean={statistics.mean(latencies):.2f}ms  p95={p95:.2f}ms"
+            )
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:11
+
+import pgvector.django
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_documentchunk'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='documentchunk',
+            index=pgvector.django.HnswIndex(ef_construction=64, fields=['embedding'], m=16, name='documentchunk_embedding_hnsw', opclasses=['vector_cosine_ops']),
+        ),
+    ]
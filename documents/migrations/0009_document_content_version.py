@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0008_documentchunk_embedding_hnsw'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='content_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
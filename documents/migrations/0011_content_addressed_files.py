@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:25
+
+import documents.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0010_document_file_hash_documentchunk_content_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='document',
+            name='file',
+            field=models.FileField(storage=documents.storage.ContentAddressedStorage(), upload_to='pdfs/'),
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='file_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:27
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0011_content_addressed_files'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentchunk',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.SearchVector('text_content', config='english'), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='documentchunk',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='documentchunk_search_gin'),
+        ),
+    ]
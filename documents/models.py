@@ -1,10 +1,14 @@
 from django.db import models
 from django.conf import settings
-from pgvector.django import VectorField 
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from pgvector.django import VectorField, HnswIndex
+from .storage import ContentAddressedStorage
 
 class Document(models.Model):
     title = models.CharField(max_length=255)
-    file = models.FileField(upload_to='pdfs/')
+    # Stored by content hash: identical uploads share one file
+    file = models.FileField(upload_to='pdfs/', storage=ContentAddressedStorage())
     uploaded_at = models.DateTimeField(auto_now_add=True)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     
@@ -18,6 +22,13 @@ class Document(models.Model):
     
     analysis_result = models.JSONField(default=dict, blank=True)
 
+    # Bumped every time analysis produces new chunks; caches key on it
+    content_version = models.PositiveIntegerField(default=0)
+
+    # SHA-256 of the file that produced the current chunks; unchanged file = nothing to re-analyze,
+    # and another document with the same hash can copy these chunks instead of recomputing them
+    file_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+
     # 768 dimensions matches the 'all-mpnet-base-v2' model we are using
     embedding = VectorField(dimensions=768, blank=True, null=True)
 
@@ -32,9 +43,80 @@ class DocumentChunk(models.Model):
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='chunks')
     chunk_index = models.IntegerField(help_text="The order of this paragraph in the document")
     text_content = models.TextField(help_text="The actual text of this paragraph")
+    content_hash = models.CharField(max_length=64, blank=True, default='', help_text="SHA-256 of text_content")
+
+    # Full-text index of text_content for lexical (keyword) retrieval.
+    # Computed by Postgres on every insert/update, so every ingest path keeps it current.
+    search_vector = models.GeneratedField(
+        expression=SearchVector('text_content', config='english'),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
     
     # 768 dimensions to match our 'all-mpnet-base-v2' model
     embedding = VectorField(dimensions=768, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Approximate nearest-neighbour index so CosineDistance ordering
+            # doesn't fall back to a full sequential scan.
+            # Query-time recall is tuned with settings.VECTOR_SEARCH_EF_SEARCH.
+            HnswIndex(
+                name='documentchunk_embedding_hnsw',
+                fields=['embedding'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_cosine_ops'],
+            ),
+            # Keyword matches (clause numbers, product codes) for hybrid retrieval
+            GinIndex(name='documentchunk_search_gin', fields=['search_vector']),
+        ]
+
+    def __str__(self):
+        return f"{self.document.title} - Chunk {self.chunk_index}"
+
+
+class AnalysisCache(models.Model):
+    """
+    LLM analyses of text seen before, so re-analyzing a document, or a
+    different file with the same extracted text, skips the summary call.
+    See documents/analysis_cache.py for the key and the eviction policy.
+    """
+    key = models.CharField(max_length=64, unique=True, help_text="SHA-256 of text hash, summary mode, prompt, model")
+    insights = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Analysis {self.key[:12]}"
+
+
+class AnalysisJob(models.Model):
+    """
+    A document waiting for ('queued') or being ('running') analyzed. Deleted
+    when the analysis ends; documents/scheduler.py decides what runs next.
+    """
+    PRIORITY_BULK = 0  # analyze_all, bulk_upload
+    PRIORITY_INTERACTIVE = 10  # A user clicked "analyze" on one document
+
+    STATE_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+    ]
+
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, related_name='analysis_job')
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    priority = models.SmallIntegerField(default=PRIORITY_BULK)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default='queued')
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Last sign of life from a worker running it
+
+    class Meta:
+        indexes = [
+            # Per-owner queues, highest priority then oldest first
+            models.Index(name='analysisjob_queue_idx', fields=['state', 'owner', '-priority', 'created_at']),
+        ]
+
     def __str__(self):
-        return f"{self.document.title} - Chunk {self.chunk_index}"
\ No newline at end of file
+        return f"{self.document_id} ({self.state}, priority {self.priority})"
@@ -0,0 +1,179 @@
+"""
+Generator pipeline for document ingestion:
+
+    PDF pages (documents/extractors.py) -> text pieces -> sliding-window chunks -> batches
+
+A Spool runs a stage to the end without holding its output in memory, so
+the PDF can be fully parsed before a database transaction is opened.
+
+Every stage pulls from the previous one, so peak memory is bounded by one
+page plus one chunk window no matter how long the document is. The chunks
+are exactly the ones the original "build full_text, then slide a window"
+algorithm produced.
+"""
+import hashlib
+import json
+import tempfile
+from itertools import islice
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+MIN_CHUNK_CHARS = 50  # Ignore tiny, useless fragments
+
+# generate_beneficial_analysis() only ever reads this many characters
+SUMMARY_INPUT_CHARS = 15000
+
+
+def with_page_breaks(pages):
+    """Yields each page's text followed by a newline, like the original full_text loop."""
+    for text in pages:
+        yield text + "\n"
+
+
+def strip_stream(pieces):
+    """
+    Streaming equivalent of ''.join(pieces).strip().
+    Leading whitespace is dropped; trailing whitespace is held back until
+    more real text arrives, and discarded at the end.
+    """
+    started = False
+    pending_whitespace = ""
+
+    for piece in pieces:
+        if not started:
+            piece = piece.lstrip()
+            if not piece:
+                continue
+            started = True
+
+        body = piece.rstrip()
+        if not body:
+            pending_whitespace += piece
+            continue
+
+        yield pending_whitespace + body
+        pending_whitespace = piece[len(body):]
+
+
+def sliding_window_chunks(pieces, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP, min_chars=MIN_CHUNK_CHARS):
+    """
+    Sliding window over a stream of text pieces. The overlap carries over
+    piece (page) boundaries, so the output matches:
+
+        for i in range(0, len(text), chunk_size - overlap):
+            chunk = text[i:i + chunk_size]
+    """
+    step = chunk_size - overlap
+    buffer = ""
+    buffer_start = 0   # Absolute position of buffer[0] in the full text
+    window_start = 0   # Absolute position of the next window
+
+    for piece in pieces:
+        buffer += piece
+
+        # Emit every window that is now complete
+        while window_start + chunk_size <= buffer_start + len(buffer):
+            offset = window_start - buffer_start
+            chunk = buffer[offset:offset + chunk_size]
+            if len(chunk.strip()) > min_chars:
+                yield chunk
+            window_start += step
+
+        # Forget text no future window can reach
+        if window_start > buffer_start:
+            buffer = buffer[window_start - buffer_start:]
+            buffer_start = window_start
+
+    # Tail windows (shorter than chunk_size)
+    text_end = buffer_start + len(buffer)
+    while window_start < text_end:
+        offset = window_start - buffer_start
+        chunk = buffer[offset:offset + chunk_size]
+        if len(chunk.strip()) > min_chars:
+            yield chunk
+        window_start += step
+
+
+def batched(iterable, size):
+    """Yields lists of up to `size` items."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class TextStats:
+    """
+    Counts characters/words of a text stream as it flows through, keeps
+    the first `prefix_chars` characters (the summarizer's input) and hashes
+    the whole text (the analysis cache key).
+    """
+
+    def __init__(self, prefix_chars=SUMMARY_INPUT_CHARS):
+        self.prefix_chars = prefix_chars
+        self.char_count = 0
+        self.word_count = 0
+        self._prefix = []
+        self._prefix_len = 0
+        self._ends_mid_word = False
+        self._digest = hashlib.sha256()
+
+    @property
+    def prefix(self):
+        return ''.join(self._prefix)
+
+    @property
+    def text_hash(self):
+        """SHA-256 of all the text seen so far (same as hashing.text_hash of the joined text)."""
+        return self._digest.hexdigest()
+
+    def track(self, pieces):
+        for piece in pieces:
+            self._count(piece)
+            yield piece
+
+    def _count(self, piece):
+        if not piece:
+            return
+        self.char_count += len(piece)
+        self._digest.update(piece.encode('utf-8'))
+
+        words = len(piece.split())
+        # A word split across two pieces must only be counted once
+        if self._ends_mid_word and not piece[0].isspace():
+            words -= 1
+        self.word_count += words
+        self._ends_mid_word = not piece[-1].isspace()
+
+        if self._prefix_len < self.prefix_chars:
+            kept = piece[:self.prefix_chars - self._prefix_len]
+            self._prefix.append(kept)
+            self._prefix_len += len(kept)
+
+
+class Spool:
+    """
+    Drains `items` (JSON-serializable) into a temporary file, then reads
+    them back in order, as many times as needed. Use as a context manager;
+    the file is deleted on exit.
+    """
+
+    def __init__(self, items):
+        self._file = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self.count = 0
+        for item in items:
+            self._file.write(json.dumps(item) + '\n')
+            self.count += 1
+
+    def __iter__(self):
+        self._file.seek(0)
+        for line in self._file:
+            yield json.loads(line)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._file.close()
@@ -0,0 +1,291 @@
+"""
+Live analysis progress, relayed to clients as Server-Sent Events
+(GET /documents/{id}/progress/) instead of polling GET /documents/{id}/.
+
+Analysis tasks publish events as they go:
+
+    started          {"page_count"}
+    pages_extracted  {"pages", "total"}             every few pages while extracting
+    chunks_saved     {"chunks", "to_embed", "reused"}
+    chunks_embedded  {"embedded", "total"}          after every embedding batch is saved, all shards together
+    summary_started  {"mode": "single" | "map_reduce"}
+    summary_finished {"cached"}
+    completed        {"status": "completed"}        terminal
+    failed           {"error"}                      terminal
+
+Every event carries an increasing id (the SSE `id:` field, so a reconnecting
+EventSource resumes after Last-Event-ID). Events go through Redis pub/sub
+(settings.PROGRESS_REDIS_URL) and the last PROGRESS_REPLAY_SIZE of them per
+document are kept in a Redis list, so a client that subscribes late is
+replayed what it missed. Without a Redis URL everything stays in-process
+(one process only: runserver with eager Celery, tests).
+
+Publishing is best-effort: a Redis error is logged and never fails the
+analysis.
+
+Relaying is async (iter_events, served by async_views.progress_stream): an
+open stream waits on an asyncio Redis subscription and holds no worker
+thread, so open dashboards don't use up the server's workers.
+"""
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+from .caching import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'smartdoc:progress'
+TERMINAL_EVENTS = ('completed', 'failed')
+
+# One broker per Redis URL ('' = in-process)
+_brokers = {}
+
+
+class RedisProgressBroker:
+    """
+    Per document:
+        KEY_PREFIX:<id>           pub/sub channel
+        KEY_PREFIX:<id>:events    replay buffer (JSON events, newest last, capped)
+        KEY_PREFIX:<id>:seq       event id counter
+        KEY_PREFIX:<id>:embedded  chunks embedded so far by all shards of the current run
+    """
+
+    def __init__(self, redis_client, replay_size, ttl, url=None):
+        self.redis = redis_client
+        self.replay_size = replay_size
+        self.ttl = ttl
+        self.url = url
+
+    def _key(self, document_id, suffix=''):
+        return f"{KEY_PREFIX}:{document_id}{suffix}"
+
+    def publish(self, document_id, event, data):
+        event_id = self.redis.incr(self._key(document_id, ':seq'))
+        payload = json.dumps({"id": event_id, "event": event, "data": data})
+
+        pipe = self.redis.pipeline()
+        pipe.rpush(self._key(document_id, ':events'), payload)
+        pipe.ltrim(self._key(document_id, ':events'), -self.replay_size, -1)
+        pipe.expire(self._key(document_id, ':events'), self.ttl)
+        pipe.expire(self._key(document_id, ':seq'), self.ttl)
+        pipe.publish(self._key(document_id), payload)
+        pipe.execute()
+
+    def replay(self, document_id):
+        return [json.loads(raw) for raw in self.redis.lrange(self._key(document_id, ':events'), 0, -1)]
+
+    async def subscribe(self, document_id):
+        # asyncio clients belong to one event loop: one per stream, closed with it
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(self._key(document_id))
+        return RedisSubscription(client, pubsub, self._key(document_id, ':events'))
+
+    def add_embedded(self, document_id, count):
+        pipe = self.redis.pipeline()
+        pipe.incrby(self._key(document_id, ':embedded'), count)
+        pipe.expire(self._key(document_id, ':embedded'), self.ttl)
+        return pipe.execute()[0]
+
+    def reset(self, document_id):
+        """A new analysis run: forget the previous run's events and counts (ids keep increasing)."""
+        self.redis.delete(self._key(document_id, ':events'), self._key(document_id, ':embedded'))
+
+
+class RedisSubscription:
+
+    def __init__(self, client, pubsub, events_key):
+        self.client = client
+        self.pubsub = pubsub
+        self.events_key = events_key
+
+    async def replay(self):
+        return [json.loads(raw) for raw in await self.client.lrange(self.events_key, 0, -1)]
+
+    async def get(self, timeout):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        return json.loads(message['data']) if message is not None else None
+
+    async def close(self):
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+class LocalProgressBroker:
+    """Same interface, in this process only."""
+
+    def __init__(self, replay_size):
+        self.replay_size = replay_size
+        self._events = {}
+        self._seq = {}
+        self._embedded = {}
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, document_id, event, data):
+        with self._lock:
+            self._seq[document_id] = self._seq.get(document_id, 0) + 1
+            message = {"id": self._seq[document_id], "event": event, "data": data}
+            self._events.setdefault(document_id, deque(maxlen=self.replay_size)).append(message)
+            for subscriber in self._subscribers.get(document_id, ()):
+                subscriber.put(message)
+
+    def replay(self, document_id):
+        with self._lock:
+            return list(self._events.get(document_id, ()))
+
+    async def subscribe(self, document_id):
+        subscription = LocalSubscription(self, document_id)
+        with self._lock:
+            self._subscribers.setdefault(document_id, []).append(subscription.queue)
+        return subscription
+
+    def unsubscribe(self, document_id, subscriber):
+        with self._lock:
+            self._subscribers.get(document_id, []).remove(subscriber)
+
+    def add_embedded(self, document_id, count):
+        with self._lock:
+            self._embedded[document_id] = self._embedded.get(document_id, 0) + count
+            return self._embedded[document_id]
+
+    def reset(self, document_id):
+        with self._lock:
+            self._events.pop(document_id, None)
+            self._embedded.pop(document_id, None)
+
+
+class LocalSubscription:
+
+    def __init__(self, broker, document_id):
+        self.broker = broker
+        self.document_id = document_id
+        self.queue = queue.Queue()
+
+    async def replay(self):
+        return self.broker.replay(self.document_id)
+
+    async def get(self, timeout):
+        # Publishers are other threads; waiting on the queue takes a thread, fine in-process only
+        try:
+            return await asyncio.to_thread(self.queue.get, timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def close(self):
+        self.broker.unsubscribe(self.document_id, self.queue)
+
+
+def get_broker():
+    url = settings.PROGRESS_REDIS_URL
+    if url not in _brokers:
+        if url:
+            _brokers[url] = RedisProgressBroker(
+                get_redis(url), settings.PROGRESS_REPLAY_SIZE, settings.PROGRESS_EVENT_TTL, url=url
+            )
+        else:
+            _brokers[url] = LocalProgressBroker(settings.PROGRESS_REPLAY_SIZE)
+    return _brokers[url]
+
+
+# ============================================================================
+# PUBLISHING (analysis tasks)
+# ============================================================================
+
+def publish(document_id, event, **data):
+    """Sends one progress event; never raises."""
+    try:
+        get_broker().publish(document_id, event, data)
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Progress event '{event}' for document {document_id} not published: {str(e)}")
+
+
+def start(document_id, page_count):
+    try:
+        get_broker().reset(document_id)
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Progress reset for document {document_id} failed: {str(e)}")
+    publish(document_id, 'started', page_count=page_count)
+
+
+def track_pages(document_id, pages, total):
+    """Passes `pages` through, publishing pages_extracted about every 5% (and at the end)."""
+    step = max(1, total // 20)
+    count = 0
+    for page in pages:
+        yield page
+        count += 1
+        if count % step == 0 or count == total:
+            publish(document_id, 'pages_extracted', pages=count, total=total)
+
+
+def chunks_embedded(document_id, count, total):
+    """Adds one batch to the document's embedded count (shards run on different workers) and publishes it."""
+    try:
+        embedded = get_broker().add_embedded(document_id, count)
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Embedding progress for document {document_id} not counted: {str(e)}")
+        return
+    publish(document_id, 'chunks_embedded', embedded=embedded, total=total)
+
+
+# ============================================================================
+# RELAYING (SSE endpoint)
+# ============================================================================
+
+async def iter_events(document_id, final_event, last_event_id=0, keepalive=None, max_seconds=None):
+    """
+    Async generator: replay buffer then live events after `last_event_id`,
+    until a terminal event or `max_seconds`. Yields None every `keepalive`
+    seconds without events. `await final_event()` is the document's final
+    state as an event, or None while it is being analyzed; it is read after
+    subscribing, so an analysis that ends in between is not missed.
+    """
+    keepalive = settings.PROGRESS_KEEPALIVE if keepalive is None else keepalive
+    max_seconds = settings.PROGRESS_STREAM_TIMEOUT if max_seconds is None else max_seconds
+    broker = get_broker()
+
+    # Subscribe before reading the buffer, so nothing published in between is lost
+    subscription = await broker.subscribe(document_id)
+    try:
+        final = await final_event()
+        replayed = await subscription.replay()
+        if final is None:
+            # Being analyzed: a previous run's events (until the new run resets them) are stale
+            ends = [index for index, event in enumerate(replayed) if event["event"] in TERMINAL_EVENTS]
+            replayed = replayed[ends[-1] + 1:] if ends else replayed
+        elif not any(event["event"] in TERMINAL_EVENTS for event in replayed):
+            # Over, and its events expired: the final state is all there is to say
+            yield final
+            return
+
+        for event in replayed:
+            if event["id"] > last_event_id:
+                last_event_id = event["id"]
+                yield event
+            if event["event"] in TERMINAL_EVENTS:
+                return
+
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            event = await subscription.get(timeout=min(keepalive, max(deadline - time.monotonic(), 0)))
+            if event is None:
+                yield None
+                continue
+            if event["id"] <= last_event_id:
+                continue  # Already replayed
+            last_event_id = event["id"]
+            yield event
+            if event["event"] in TERMINAL_EVENTS:
+                return
+    finally:
+        await subscription.close()
@@ -0,0 +1,142 @@
+"""
+Optional reranking stage for ask/global_ask.
+
+Retrieval over-fetches settings.RERANK_CANDIDATES chunks, a cross-encoder
+scores every (question, chunk) pair in one batch, and the best k are kept.
+Scoring runs under a millisecond budget: if it doesn't finish in time the
+chunks are returned in their original (retrieval) order instead.
+
+    reranker = get_reranker()
+    chunks, reranked = rerank(question, candidates, top_k=3, budget_ms=150)
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Global variable to hold the configured reranker (see settings.RERANKER)
+_reranker = None
+
+# Scoring runs on these threads so the request can stop waiting when the budget runs out
+_executor = None
+_slots = None
+
+
+class Reranker:
+    """Base interface: score(question, texts) returns one relevance score per text (higher = better)."""
+
+    def score(self, question, texts):
+        raise NotImplementedError
+
+
+class CrossEncoderReranker(Reranker):
+    """A small sentence-transformers cross-encoder, run on CPU."""
+
+    def __init__(self, model_name=None):
+        self.model_name = model_name or settings.RERANK_MODEL
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        # Only load the model when the first rerank comes in
+        with self._lock:
+            if self._model is None:
+                logger.info(f"🧠 [Lazy Load] Initializing reranker ({self.model_name})...")
+                from sentence_transformers import CrossEncoder
+                self._model = CrossEncoder(self.model_name, device='cpu')
+                logger.info("✅ Reranker loaded successfully.")
+        return self._model
+
+    def score(self, question, texts):
+        pairs = [(question, text) for text in texts]
+        return [float(score) for score in self._get_model().predict(pairs, batch_size=len(pairs))]
+
+
+class StubReranker(Reranker):
+    """
+    Test double: scores by how many question words a text contains.
+    `delay_ms` simulates a slow model.
+    """
+
+    def __init__(self, delay_ms=0):
+        self.delay_ms = delay_ms
+        self.calls = []
+
+    def score(self, question, texts):
+        self.calls.append(len(texts))
+        if self.delay_ms:
+            time.sleep(self.delay_ms / 1000)
+        words = set(question.lower().split())
+        return [float(len(words & set(text.lower().split()))) for text in texts]
+
+
+RERANKERS = {
+    'cross_encoder': CrossEncoderReranker,
+    'stub': StubReranker,
+}
+
+
+def get_reranker():
+    global _reranker
+
+    if _reranker is None:
+        name = settings.RERANKER
+        if name not in RERANKERS:
+            raise ValueError(f"Unknown RERANKER '{name}'. Choose from: {', '.join(RERANKERS)}")
+        _reranker = RERANKERS[name]()
+
+    return _reranker
+
+
+def _get_executor():
+    global _executor, _slots
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.RERANK_WORKERS, thread_name_prefix='rerank')
+        _slots = threading.BoundedSemaphore(settings.RERANK_WORKERS)
+    return _executor, _slots
+
+
+def rerank(question, chunks, top_k, budget_ms=None, reranker=None):
+    """
+    Returns (chunks, reranked): the best `top_k` chunks by cross-encoder score,
+    or the first `top_k` in their original order when scoring fails, is busy,
+    or takes longer than `budget_ms`.
+    """
+    if len(chunks) <= 1:
+        return chunks[:top_k], False
+
+    budget_ms = settings.RERANK_BUDGET_MS if budget_ms is None else budget_ms
+    reranker = reranker or get_reranker()
+    executor, slots = _get_executor()
+
+    # Every scoring thread is still busy with an earlier (timed-out) request: don't queue behind it
+    if not slots.acquire(blocking=False):
+        logger.warning("⚠️ Reranker busy, keeping retrieval order.")
+        return chunks[:top_k], False
+
+    def score():
+        try:
+            return reranker.score(question, [chunk.text_content for chunk in chunks])
+        finally:
+            slots.release()
+
+    start = time.perf_counter()
+    future = executor.submit(score)
+    try:
+        scores = future.result(timeout=budget_ms / 1000)
+    except FutureTimeout:
+        logger.warning(f"⚠️ Reranking exceeded its {budget_ms}ms budget, keeping retrieval order.")
+        return chunks[:top_k], False
+    except Exception as e:
+        logger.error(f"❌ Reranking failed: {str(e)}")
+        return chunks[:top_k], False
+
+    # Stable sort: equal scores keep their retrieval order
+    order = sorted(range(len(chunks)), key=lambda i: -scores[i])
+    logger.debug(f"Reranked {len(chunks)} chunks in {(time.perf_counter() - start) * 1000:.1f}ms")
+    return [chunks[i] for i in order[:top_k]], True
@@ -0,0 +1,134 @@
+"""
+Chunk retrieval for ask/global_ask.
+
+    vector   cosine distance over the HNSW index (semantic matches)
+    hybrid   vector candidates + Postgres full-text candidates, merged with
+             reciprocal rank fusion, so exact identifiers such as "14.2" or
+             "SKU-4471" are found even when the embedding misses them
+
+Both modes return chunks annotated with `distance` (used for confidence
+and source relevance), best first. retrieve_context() can add a
+cross-encoder reranking pass on top (documents/reranking.py).
+"""
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+from pgvector.django import CosineDistance
+
+from .reranking import rerank as rerank_chunks
+from .vector_search import search
+
+RETRIEVAL_MODES = ('vector', 'hybrid')
+
+
+def context_label(mode, rerank=False):
+    """Names the retrieval strategy, e.g. 'hybrid+rerank' (answers are cached per strategy)."""
+    return f"{mode}+rerank" if rerank else mode
+
+
+CONTEXT_LABELS = tuple(context_label(mode, rerank) for mode in RETRIEVAL_MODES for rerank in (False, True))
+
+# Words, numbers and identifiers such as 14.2, SKU-4471 or 2024/17
+TOKEN_PATTERN = re.compile(r"\w+(?:[./-]\w+)*")
+
+
+def keyword_terms(question):
+    return TOKEN_PATTERN.findall(question.lower())
+
+
+def keyword_query(question):
+    """
+    Full-text query matching ANY word of the question (stop words are
+    dropped by Postgres). Ranking favours chunks matching more of them.
+    """
+    tokens = keyword_terms(question)
+    if not tokens:
+        return None
+    return SearchQuery(' | '.join(f"'{token}'" for token in tokens), search_type='raw', config='english')
+
+
+def vector_candidates(queryset, query_vector, limit):
+    return [chunk.id for chunk in search(queryset.only('id'), query_vector, limit)]
+
+
+def lexical_candidates(queryset, question, limit):
+    query = keyword_query(question)
+    if query is None:
+        return []
+    return list(
+        queryset.filter(
+            search_vector=query
+        ).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', 'id').values_list('id', flat=True)[:limit]
+    )
+
+
+def reciprocal_rank_fusion(rankings, k=None):
+    """
+    Merges ranked id lists: score(id) = sum(1 / (k + rank)) over every list
+    it appears in (rank starts at 1). Returns ids, best first.
+    """
+    k = k or settings.RETRIEVAL_RRF_K
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda item: (-scores[item], item))
+
+
+def retrieve_chunks(queryset, question, query_vector, top_k, mode=None, vector_index=None):
+    """
+    Top `top_k` chunks of `queryset` for the question. `mode` is 'vector' or
+    'hybrid' (default: settings.RETRIEVAL_MODE). With a `vector_index`
+    (documents/user_vectors.py) covering exactly `queryset`, the vector side
+    runs in memory instead of in pgvector.
+    """
+    mode = mode or settings.RETRIEVAL_MODE
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode '{mode}'. Choose from: {', '.join(RETRIEVAL_MODES)}")
+
+    if mode == 'vector':
+        if vector_index is not None:
+            hits = vector_index.search(query_vector, top_k)
+            chunks = queryset.in_bulk([chunk_id for chunk_id, _ in hits])
+            for chunk_id, distance in hits:
+                if chunk_id in chunks:
+                    chunks[chunk_id].distance = distance
+            return [chunks[chunk_id] for chunk_id, _ in hits if chunk_id in chunks]
+
+        return search(queryset, query_vector, top_k)
+
+    # Hybrid: a wider candidate list from each retriever, fused, then the winners loaded
+    candidates = max(top_k, settings.RETRIEVAL_CANDIDATES)
+    if vector_index is not None:
+        vector_ids = [chunk_id for chunk_id, _ in vector_index.search(query_vector, candidates)]
+    else:
+        vector_ids = vector_candidates(queryset, query_vector, candidates)
+    lexical_ids = lexical_candidates(queryset, question, candidates)
+    fused_ids = reciprocal_rank_fusion([vector_ids, lexical_ids])[:top_k]
+    chunks = {
+        chunk.id: chunk for chunk in queryset.filter(id__in=fused_ids).annotate(
+            distance=CosineDistance('embedding', query_vector)
+        )
+    }
+    return [chunks[chunk_id] for chunk_id in fused_ids if chunk_id in chunks]
+
+
+def retrieve_context(queryset, question, query_vector, top_k, mode=None, rerank=False, rerank_budget_ms=None,
+                     vector_index=None):
+    """
+    retrieve_chunks(), optionally followed by reranking settings.RERANK_CANDIDATES
+    candidates down to `top_k`. Returns (chunks, reranked); reranked is False
+    when reranking was off, failed or ran over its budget.
+    """
+    if not rerank:
+        return retrieve_chunks(queryset, question, query_vector, top_k, mode=mode, vector_index=vector_index), False
+
+    candidates = retrieve_chunks(
+        queryset, question, query_vector, max(top_k, settings.RERANK_CANDIDATES), mode=mode,
+        vector_index=vector_index
+    )
+    return rerank_chunks(question, candidates, top_k, budget_ms=rerank_budget_ms)
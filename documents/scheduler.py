@@ -0,0 +1,199 @@
+"""
+Fair scheduling of document analyses.
+
+Analyses are not sent to Celery directly: each one becomes an AnalysisJob
+row, and a dispatcher (tasks.dispatch_analysis_task) claims the next jobs
+and publishes only those. The broker queue therefore never holds more than
+ANALYSIS_MAX_IN_FLIGHT analyses, so one user's backlog of hundreds of
+files can't starve everyone else.
+
+Which jobs run next (claim()):
+
+    1. Higher priority first: PRIORITY_INTERACTIVE (one document's analyze
+       button) before PRIORITY_BULK (analyze_all, bulk_upload).
+    2. Within a priority, round-robin across owners, each owner's oldest
+       job first.
+    3. At most ANALYSIS_MAX_IN_FLIGHT_PER_USER running jobs per owner.
+
+Claiming is atomic: the owners being served and their jobs are locked with
+SELECT ... FOR UPDATE SKIP LOCKED, so concurrent dispatchers split the work
+instead of claiming the same job twice or pushing an owner past the cap.
+(The global ANALYSIS_MAX_IN_FLIGHT is approximate when several dispatchers
+run at once.)
+
+Workers running an analysis call heartbeat() as they make progress (pages,
+chunk batches, embedding batches, summary sections). A running job whose
+last heartbeat is older than ANALYSIS_JOB_TIMEOUT (its worker crashed) is
+queued again; a long analysis that keeps beating is left alone.
+"""
+import logging
+import time
+from collections import Counter, OrderedDict
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils import timezone
+
+from .models import AnalysisJob, Document
+
+logger = logging.getLogger(__name__)
+
+# When this process last wrote each document's heartbeat (time.monotonic())
+_last_beats = {}
+
+
+def schedule(documents, priority=AnalysisJob.PRIORITY_BULK):
+    """
+    Queues an analysis job for every document and marks them 'processing'.
+    A document already queued keeps its place, moved up if `priority` is higher.
+    """
+    documents = list(documents)
+    if not documents:
+        return
+
+    document_ids = [document.id for document in documents]
+    with transaction.atomic():
+        AnalysisJob.objects.bulk_create(
+            [AnalysisJob(document_id=document.id, owner_id=document.owner_id, priority=priority)
+             for document in documents],
+            ignore_conflicts=True  # One job per document
+        )
+        AnalysisJob.objects.filter(
+            document_id__in=document_ids, state='queued', priority__lt=priority
+        ).update(priority=priority)
+        Document.objects.filter(id__in=document_ids).update(status='processing')
+
+    logger.info(f"🗂️ Scheduled {len(document_ids)} analyses at priority {priority}")
+
+
+def release(document_id):
+    """Drops the job of a finished (or failed) analysis. True if there was one, so a slot is free."""
+    deleted, _ = AnalysisJob.objects.filter(document_id=document_id).delete()
+    return deleted > 0
+
+
+def heartbeat(document_id):
+    """
+    Marks the document's running job as alive. Cheap to call often: this
+    process writes it at most once per ANALYSIS_HEARTBEAT_INTERVAL.
+    """
+    now = time.monotonic()
+    if now - _last_beats.get(document_id, float('-inf')) < settings.ANALYSIS_HEARTBEAT_INTERVAL:
+        return
+    if len(_last_beats) > 1024:
+        _last_beats.clear()  # Finished analyses' entries; costs at most one extra write each
+    _last_beats[document_id] = now
+    AnalysisJob.objects.filter(document_id=document_id, state='running').update(heartbeat_at=timezone.now())
+
+
+def beating(document_id, items):
+    """Passes `items` through, with a heartbeat() as each one is taken."""
+    for item in items:
+        heartbeat(document_id)
+        yield item
+
+
+def requeue_stale():
+    """Running jobs without a heartbeat for ANALYSIS_JOB_TIMEOUT (their worker died) go back in the queue."""
+    cutoff = timezone.now() - timedelta(seconds=settings.ANALYSIS_JOB_TIMEOUT)
+    requeued = (
+        AnalysisJob.objects.filter(state='running')
+        .alias(last_seen=Coalesce('heartbeat_at', 'claimed_at'))
+        .filter(last_seen__lt=cutoff)
+        .update(state='queued', claimed_at=None, heartbeat_at=None)
+    )
+    if requeued:
+        logger.warning(f"⚠️ Requeued {requeued} analyses whose workers stopped reporting")
+
+
+def fair_order(jobs, running, per_user, capacity):
+    """
+    Picks up to `capacity` of `jobs` (sorted by priority desc, then age):
+    priority levels in turn, round-robin across owners within a level, no
+    owner past `per_user` counting its `running` jobs.
+    """
+    taken = Counter()
+    picked = []
+    for _, level in groupby(jobs, key=lambda job: job.priority):
+        queues = OrderedDict()  # Owners in the order of their oldest job at this level
+        for job in level:
+            queues.setdefault(job.owner_id, []).append(job)
+
+        while queues and len(picked) < capacity:
+            for owner_id in list(queues):
+                if len(picked) >= capacity:
+                    break
+                if running.get(owner_id, 0) + taken[owner_id] >= per_user or not queues[owner_id]:
+                    del queues[owner_id]
+                    continue
+                picked.append(queues[owner_id].pop(0))
+                taken[owner_id] += 1
+    return picked
+
+
+def claim(limit=None):
+    """
+    Atomically moves the next jobs (see fair_order) from 'queued' to
+    'running' and returns their document ids, in dispatch order.
+    """
+    with transaction.atomic():
+        requeue_stale()
+
+        # 1. Lock the owners with queued work; owners another dispatcher holds are skipped
+        owner_ids = list(
+            get_user_model().objects.select_for_update(skip_locked=True, no_key=True)
+            .filter(id__in=AnalysisJob.objects.filter(state='queued').values('owner_id'))
+            .values_list('id', flat=True)
+        )
+        if not owner_ids:
+            return []
+
+        # 2. Free slots, globally and per owner
+        running = dict(
+            AnalysisJob.objects.filter(state='running').values('owner_id')
+            .annotate(count=Count('id')).values_list('owner_id', 'count')
+        )
+        capacity = settings.ANALYSIS_MAX_IN_FLIGHT - sum(running.values())
+        if limit is not None:
+            capacity = min(capacity, limit)
+        per_user = settings.ANALYSIS_MAX_IN_FLIGHT_PER_USER
+        if capacity <= 0:
+            return []
+
+        # 3. Each owner's next jobs (no owner can use more than per_user), then lock them
+        candidate_ids = (
+            AnalysisJob.objects.filter(state='queued', owner_id__in=owner_ids)
+            .annotate(owner_rank=Window(
+                RowNumber(),
+                partition_by=[F('owner_id')],
+                order_by=[F('priority').desc(), F('created_at').asc(), F('id').asc()]
+            ))
+            .filter(owner_rank__lte=per_user)
+            .values_list('id', flat=True)
+        )
+        jobs = list(
+            AnalysisJob.objects.select_for_update(skip_locked=True)
+            .filter(id__in=list(candidate_ids), state='queued')
+            .order_by('-priority', 'created_at', 'id')
+        )
+
+        # 4. Claim
+        picked = fair_order(jobs, running, per_user, capacity)
+        now = timezone.now()
+        AnalysisJob.objects.filter(id__in=[job.id for job in picked]).update(
+            state='running', claimed_at=now, heartbeat_at=now
+        )
+
+    return [job.document_id for job in picked]
+
+
+def unclaim(document_ids):
+    """Puts claimed jobs back in the queue (their tasks could not be published)."""
+    AnalysisJob.objects.filter(document_id__in=document_ids, state='running').update(
+        state='queued', claimed_at=None, heartbeat_at=None
+    )
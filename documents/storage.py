@@ -0,0 +1,54 @@
+import os
+import posixpath
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+from .hashing import stream_hash
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Saves every file under the SHA-256 of its bytes:
+
+        pdfs/report.pdf  ->  pdfs/3f/3f9a...c2.pdf
+
+    Uploading the same bytes again (any user, any title) points at the file
+    that is already there instead of writing a second copy. Deleting a
+    Document never removes its file, so shared files stay valid; files no
+    Document references any more are removed by `python manage.py gc_files`.
+
+    New files are written under a temporary name and renamed onto the hash
+    path, so two uploads of the same bytes racing past exists() both end up
+    at the one path, and no upload ever finds a half-written file there.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+
+        content.seek(0)
+        digest = stream_hash(content.chunks())
+        content.seek(0)
+
+        extension = os.path.splitext(name)[1].lower()
+        name = posixpath.join(posixpath.dirname(name), digest[:2], digest + extension)
+
+        if self.exists(name):
+            # Reused: a fresh mtime keeps gc_files away until the new row is saved
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # The hash path is the file: taken means already stored, never "pick another name"
+        return name
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        temporary = super()._save(posixpath.join(directory, f".{uuid.uuid4().hex}.{filename}.part"), content)
+        # Atomic; a concurrent upload of the same bytes just replaces identical bytes
+        os.replace(self.path(temporary), self.path(name))
+        return name
@@ -0,0 +1,90 @@
+import json
+import logging
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+logger = logging.getLogger(__name__)
+
+
+def sse_event(event, data, event_id=None):
+    """Formats one Server-Sent Event (with an `id:` line when `event_id` is given, for Last-Event-ID)."""
+    prefix = f"id: {event_id}\n" if event_id is not None else ''
+    return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF accept `Accept: text/event-stream` (what EventSource sends).
+    Streaming answers bypass rendering; plain responses such as a 400 are
+    sent as a single event (`error` for 4xx/5xx, `message` otherwise).
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        response = (renderer_context or {}).get('response')
+        event = 'error' if response is not None and response.status_code >= 400 else 'message'
+        return sse_event(event, data).encode(self.charset)
+
+
+def sse_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
+
+
+def stream_answer_response(meta, tokens, on_complete=None):
+    """
+    Streams an answer as SSE:
+        event: sources  -> `meta` (sources, confidence, ...) right after retrieval
+        event: token    -> {"text": "..."} for every piece the LLM yields
+        event: done     -> {"answer": full answer}
+        event: error    -> if the LLM stream breaks midway
+    `on_complete(answer)` runs once the whole answer has been streamed.
+    """
+    def events():
+        yield sse_event('sources', meta)
+
+        parts = []
+        try:
+            for token in tokens:
+                parts.append(token)
+                yield sse_event('token', {"text": token})
+        except Exception as e:
+            logger.error(f"Answer stream interrupted: {str(e)}", exc_info=True)
+            yield sse_event('error', {"error": "The answer stream was interrupted. Please try again."})
+            return
+
+        answer = ''.join(parts)
+        if on_complete is not None:
+            on_complete(answer)
+        yield sse_event('done', {"answer": answer})
+
+    return sse_response(events())
+
+
+def stream_payload_response(payload):
+    """Streams an already-complete answer payload (cache hits, fallbacks) in the same event format."""
+    meta = {key: value for key, value in payload.items() if key != 'answer'}
+    return stream_answer_response(meta, [payload.get('answer', '')])
+
+
+def stream_progress_response(events):
+    """
+    Relays analysis progress (the async progress.iter_events) as SSE: one
+    event per progress event, named after it, with its id. A None from
+    `events` (no news for a while) becomes a comment line that keeps proxies
+    from closing the connection. Served from an async view.
+    """
+    async def frames():
+        async for event in events:
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield sse_event(event["event"], event["data"], event_id=event["id"])
+
+    return sse_response(frames())
@@ -0,0 +1,213 @@
+"""
+Map-reduce analysis for documents longer than one summarization prompt
+(settings.SUMMARY_MODE = 'map_reduce').
+
+    sections  consecutive chunks, overlap removed, <= SUMMARY_SECTION_TOKENS each
+    map       llm_utils.summarize_section() per section, SUMMARY_CONCURRENCY at a time
+    reduce    llm_utils.combine_section_summaries() over the ordered notes, giving
+              the usual ## Summary / ## Key Insights / ## Document Type analysis
+
+Notes that don't fit in SUMMARY_REDUCE_TOKENS are first combined in groups
+(another map level). Section notes are cached in Redis by the section's text
+hash, the section prompt version and the model. Re-analyzing the same text
+(a retried analysis, a duplicate file) is all cache hits, and so are the
+sections before the first edit. Sections are cut by a running token budget
+over fixed-offset chunks, so an edit that changes the text's length shifts
+every later section and those are summarized again.
+
+Rate limits: every call goes through llm_client (Retry-After-aware backoff,
+a process-wide hold after a 429, the circuit breaker). At most
+SUMMARY_CONCURRENCY calls are in flight, and the first section that fails
+for good cancels the rest and fails the summary.
+"""
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import redis
+from django.conf import settings
+
+from . import scheduler
+from .caching import get_redis
+from .context_packing import get_tokenizer, overlap_length
+from .hashing import text_hash
+from .llm_utils import SECTION_PARAMS, SECTION_PROMPT_VERSION, combine_section_summaries, summarize_section
+from .models import DocumentChunk
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'smartdoc:section'
+
+
+# ============================================================================
+# SECTIONS
+# ============================================================================
+
+def chunk_texts(document_id):
+    """The document's chunk texts in order, streamed from the database."""
+    return (
+        DocumentChunk.objects.filter(document_id=document_id)
+        .order_by('chunk_index')
+        .values_list('text_content', flat=True)
+        .iterator(chunk_size=500)
+    )
+
+
+def iter_sections(texts, budget, tokenizer):
+    """
+    Joins consecutive chunk texts back into running text (the sliding-window
+    overlap kept once) and cuts it into sections of at most `budget` tokens,
+    on chunk boundaries. The same text always gives the same sections.
+    """
+    parts, tokens, previous = [], 0, None
+    for text in texts:
+        if previous is None:
+            piece = text
+        else:
+            overlap = overlap_length(previous, text)
+            piece = text[overlap:] if overlap else '\n' + text
+        previous = text
+
+        piece_tokens = tokenizer.count(piece)
+        if parts and tokens + piece_tokens > budget:
+            yield ''.join(parts).strip()
+            parts, tokens = [], 0
+        parts.append(piece)
+        tokens += piece_tokens
+
+    if parts:
+        yield ''.join(parts).strip()
+
+
+# ============================================================================
+# SECTION NOTES CACHE
+# ============================================================================
+
+class SectionCache:
+    """Section notes in Redis: KEY_PREFIX:v<prompt version>:<model>:<text sha256>."""
+
+    def __init__(self, redis_client=None, ttl=None):
+        self.redis = redis_client
+        self.ttl = ttl
+
+    def key(self, text):
+        return f"{KEY_PREFIX}:v{SECTION_PROMPT_VERSION}:{SECTION_PARAMS['model']}:{text_hash(text)}"
+
+    def get(self, text):
+        if self.redis is None:
+            return None
+        try:
+            raw = self.redis.get(self.key(text))
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ Section cache read failed: {str(e)}")
+            return None
+        return raw.decode('utf-8') if raw is not None else None
+
+    def set(self, text, notes):
+        if self.redis is None:
+            return
+        try:
+            self.redis.set(self.key(text), notes.encode('utf-8'), ex=self.ttl)
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ Section cache write failed: {str(e)}")
+
+
+def get_section_cache():
+    return SectionCache(
+        redis_client=get_redis(settings.SUMMARY_CACHE_REDIS_URL),
+        ttl=settings.SUMMARY_SECTION_CACHE_TTL or None,
+    )
+
+
+# ============================================================================
+# MAP-REDUCE
+# ============================================================================
+
+def map_sections(sections, summarize, cache, concurrency):
+    """
+    Notes for every section, in order, with at most `concurrency` LLM calls
+    in flight. Returns (notes, cached_count). Sections are pulled lazily, so
+    only a few are held in memory at once.
+    """
+    notes = {}
+    cached_count = 0
+    futures = {}
+
+    def collect(done):
+        for future in done:
+            index, text = futures.pop(future)
+            notes[index] = future.result()  # Re-raises LLMUnavailable
+            cache.set(text, notes[index])
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='summary') as pool:
+        try:
+            for index, text in enumerate(sections):
+                cached = cache.get(text)
+                if cached is not None:
+                    notes[index] = cached
+                    cached_count += 1
+                    continue
+
+                if len(futures) >= concurrency:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    collect(done)
+                futures[pool.submit(summarize, text)] = (index, text)
+
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                collect(done)
+        except BaseException:
+            # Don't start sections nobody will use
+            for future in futures:
+                future.cancel()
+            raise
+
+    return [notes[index] for index in range(len(notes))], cached_count
+
+
+def reduce_notes(notes, word_count, tokenizer):
+    """Combines notes into the final analysis, first merging groups of them while they exceed the budget."""
+    budget = settings.SUMMARY_REDUCE_TOKENS
+    while len(notes) > 1 and sum(tokenizer.count(note) for note in notes) > budget:
+        groups = list(iter_note_groups(notes, budget, tokenizer))
+        if len(groups) == len(notes):
+            break  # Every note is over the budget on its own; send them as they are
+        logger.info(f"🧩 Combining {len(notes)} section notes in {len(groups)} groups")
+        notes = [summarize_section('\n\n'.join(group)) for group in groups]
+
+    return combine_section_summaries(notes, word_count)
+
+
+def iter_note_groups(notes, budget, tokenizer):
+    group, tokens = [], 0
+    for note in notes:
+        note_tokens = tokenizer.count(note)
+        if group and tokens + note_tokens > budget:
+            yield group
+            group, tokens = [], 0
+        group.append(note)
+        tokens += note_tokens
+    if group:
+        yield group
+
+
+def summarize_document(document_id, word_count):
+    """
+    The full-document analysis for `document_id` (its chunks must be saved).
+    Returns {"insights", "summary_sections", "cached_sections"}.
+    Raises LLMUnavailable if any LLM call fails for good.
+    """
+    tokenizer = get_tokenizer()
+    sections = scheduler.beating(
+        document_id, iter_sections(chunk_texts(document_id), settings.SUMMARY_SECTION_TOKENS, tokenizer)
+    )
+
+    notes, cached_count = map_sections(
+        sections, summarize_section, get_section_cache(), settings.SUMMARY_CONCURRENCY
+    )
+    logger.info(f"📚 Document {document_id}: {len(notes)} sections summarized ({cached_count} from cache)")
+
+    return {
+        "insights": reduce_notes(notes, word_count, tokenizer),
+        "summary_sections": len(notes),
+        "cached_sections": cached_count,
+    }
@@ -1,8 +1,106 @@
-import fitz  # PyMuPDF
-from celery import shared_task
+"""
+Document analysis runs as a Celery canvas:
+
+    analyze_document_task            extract text, chunk, save chunks; chunks whose text
+                                     hash is unchanged keep their old vector
+        -> chord(
+               embed_chunks_task x N     one shard of new/changed chunks each, spread over workers
+               summarize_document_task   LLM insights, in parallel with the shards (map-reduce
+                                         over every section for long documents, see summarization.py)
+           )
+        -> finalize_analysis_task    runs only if every header task succeeded
+
+Any failure (including a failed shard) marks the document 'failed', via
+mark_analysis_failed on a worker or directly when tasks run eagerly.
+
+A file whose hash matches the last successful analysis is not re-analyzed,
+and a file already analyzed as another document has its chunks copied over
+(only from the same owner's documents unless ANALYSIS_DEDUP_ACROSS_OWNERS).
+Text that was analyzed before (same extracted text, prompt and model) gets
+its insights from the analysis cache instead of the summary task.
+
+Views don't call analyze_document_task directly: schedule_analysis() queues
+the documents and dispatch_analysis_task sends the next ones to Celery,
+fairly across users (see scheduler.py). Every analysis that ends, however it
+ends, frees its slot and dispatches again.
+
+Each step publishes progress events (progress.py) that clients follow over
+SSE at GET /documents/{id}/progress/ instead of polling the document.
+"""
+import logging
+from celery import chord, group, shared_task
+from django.conf import settings
+from django.db import transaction
+from . import analysis_cache, progress, scheduler
 from .models import Document, DocumentChunk
-from .embeddings import get_embedding
+from .embeddings import get_embeddings
 from .llm_utils import generate_beneficial_analysis
+from .extractors import get_extractor
+from .hashing import file_hash, text_hash
+from .pipeline import (
+    with_page_breaks, strip_stream, sliding_window_chunks, batched, Spool, TextStats, SUMMARY_INPUT_CHARS,
+)
+from .summarization import summarize_document
+
+logger = logging.getLogger(__name__)
+
+
+def _request_dispatch():
+    try:
+        dispatch_analysis_task.delay()
+    except Exception as e:
+        # The jobs are safe in the database; the periodic dispatch picks them up
+        logger.error(f"❌ Could not request an analysis dispatch: {str(e)}")
+
+
+def _analysis_finished(document_id):
+    """Frees the scheduler slot of a finished analysis and hands it to the next job."""
+    if scheduler.release(document_id):
+        _request_dispatch()
+
+
+def schedule_analysis(documents, priority):
+    """Queues `documents` for analysis (see scheduler.py) and dispatches what fits now."""
+    scheduler.schedule(documents, priority)
+    _request_dispatch()
+
+
+@shared_task
+def dispatch_analysis_task():
+    """
+    Claims the next analyses and publishes them as one group (one broker
+    connection). Runs on every schedule and finish, and periodically via
+    beat to recover from a broker outage or a crashed worker.
+    """
+    document_ids = scheduler.claim()
+    if not document_ids:
+        return {"dispatched": 0}
+
+    try:
+        group(analyze_document_task.s(document_id) for document_id in document_ids).apply_async()
+    except Exception as e:
+        # Still queued in the database; the next dispatch retries them
+        logger.error(f"❌ Could not publish {len(document_ids)} analyses: {str(e)}")
+        scheduler.unclaim(document_ids)
+        return {"dispatched": 0}
+
+    logger.info(f"🚚 Dispatched {len(document_ids)} analyses")
+    return {"dispatched": len(document_ids)}
+
+
+def _save_failure(document_id, error):
+    Document.objects.filter(id=document_id).update(
+        status='failed',
+        file_hash='',  # Never skip the next run of a document that failed
+        analysis_result={
+            "error": error,
+            "insights": f"Analysis failed: {error}",
+            "summary": f"Failed to process document: {error}"
+        }
+    )
+    progress.publish(document_id, 'failed', error=error)
+    _analysis_finished(document_id)
+
 
 @shared_task
 def analyze_document_task(document_id):
@@ -12,66 +110,261 @@ def analyze_document_task(document_id):
         document.status = 'processing'
         document.save()
 
-        # 1. Extract Text from PDF
-        doc = fitz.open(document.file.path)
-        full_text = ""
-        page_count = len(doc)
-        
-        for page in doc:
-            full_text += page.get_text() + "\n"
-        
-        full_text = full_text.strip()
-        if not full_text:
-            raise ValueError("No text could be extracted from this PDF.")
-
-        # 2. Clear old chunks (in case we are re-analyzing an existing file)
+        # 0. Same file as the last successful analysis: nothing to do
+        new_file_hash = file_hash(document.file.path)
+        if new_file_hash == document.file_hash and document.chunks.exists():
+            return _skip_unchanged(document)
+
+        # 0b. Same bytes already analyzed for another document: copy its chunks instead of recomputing.
+        #     Across owners only if allowed: a near-instant analysis tells them someone else has the file
+        sources = Document.objects.filter(file_hash=new_file_hash, status='completed').exclude(id=document.id)
+        if not settings.ANALYSIS_DEDUP_ACROSS_OWNERS:
+            sources = sources.filter(owner_id=document.owner_id)
+        source = sources.order_by('-id').first()
+        if source is not None:
+            return _clone_analysis(document, source, new_file_hash)
+
+        # 1. Stream text out of the PDF page by page (the whole text is never held in memory)
+        extractor = get_extractor()
+        page_count = extractor.page_count(document.file.path)
+        progress.start(document_id, page_count)
+        pages = scheduler.beating(
+            document_id, progress.track_pages(document_id, extractor.iter_pages(document.file.path), page_count)
+        )
+        stats = TextStats()
+        text_stream = stats.track(strip_stream(with_page_breaks(pages)))
+
+        # 2. The Sliding Window Algorithm (1000 chars, 200 overlap, carried across pages)
+        chunks = sliding_window_chunks(text_stream)
+
+        # 3. Run extraction, chunking and hashing to the end before any write: the chunks wait
+        #    in a temp file, so the transaction below only holds bulk inserts, never PDF parsing
+        with Spool((chunk_text, text_hash(chunk_text)) for chunk_text in chunks) as spooled_chunks:
+            # The old chunks stay in place
+            if stats.char_count == 0:
+                raise ValueError("No text could be extracted from this PDF.")
+
+            # 4. Save chunks in bulk, carrying over the embedding of any chunk whose text hasn't changed
+            old_chunk_ids = list(document.chunks.values_list('id', flat=True))
+            reusable = dict(
+                document.chunks.filter(embedding__isnull=False).exclude(content_hash='')
+                .values_list('content_hash', 'id')
+            )
+            chunk_count = 0
+            reused_count = 0
+            with transaction.atomic():
+                for batch in batched(spooled_chunks, settings.CHUNK_BULK_CREATE_BATCH_SIZE):
+                    vectors = dict(
+                        DocumentChunk.objects.filter(
+                            id__in=[reusable[chunk_hash] for _, chunk_hash in batch if chunk_hash in reusable]
+                        ).values_list('id', 'embedding')
+                    )
+                    new_chunks = [
+                        DocumentChunk(
+                            document=document,
+                            chunk_index=chunk_count + offset,
+                            text_content=chunk_text,
+                            content_hash=chunk_hash,
+                            embedding=vectors.get(reusable.get(chunk_hash))
+                        )
+                        for offset, (chunk_text, chunk_hash) in enumerate(batch)
+                    ]
+                    DocumentChunk.objects.bulk_create(new_chunks)
+                    chunk_count += len(batch)
+                    reused_count += sum(1 for chunk in new_chunks if chunk.embedding is not None)
+
+                # Old chunks go only once the new set is written
+                DocumentChunk.objects.filter(id__in=old_chunk_ids).delete()
+
+        # 5. Fan out: embedding shards (new/changed chunks only) + summary in parallel, then finalize
+        pending_indexes = list(
+            document.chunks.filter(embedding__isnull=True).order_by('chunk_index').values_list('chunk_index', flat=True)
+        )
+        progress.publish(
+            document_id, 'chunks_saved', chunks=chunk_count, to_embed=len(pending_indexes), reused=reused_count
+        )
+        shards = list(batched(pending_indexes, settings.EMBEDDING_SHARD_SIZE))
+        header = [
+            embed_chunks_task.s(document_id, shard[0], shard[-1] + 1, len(pending_indexes)) for shard in shards
+        ]
+
+        # Too long for one prompt: summarize every section from the saved chunks
+        map_reduce = settings.SUMMARY_MODE == 'map_reduce' and stats.char_count > SUMMARY_INPUT_CHARS
+        summary_key = analysis_cache.make_key(stats.text_hash, map_reduce)
+        cached_insights = analysis_cache.get(summary_key)
+        if cached_insights is None:
+            if map_reduce:
+                header.append(summarize_document_task.s('', document_id, word_count=stats.word_count, map_reduce=True))
+            else:
+                header.append(summarize_document_task.s(stats.prefix, document_id))
+        else:
+            progress.publish(document_id, 'summary_finished', cached=True)
+
+        result_stats = {
+            "char_count": stats.char_count,
+            "word_count": stats.word_count,
+            "page_count": page_count,
+            "chunk_count": chunk_count,
+            "reused_count": reused_count,
+        }
+        logger.info(
+            f"Document {document_id}: {chunk_count} chunks, {reused_count} reused, "
+            f"dispatching {len(shards)} embedding shard(s) for {len(pending_indexes)}"
+            f"{', summary from cache' if cached_insights is not None else ''}"
+        )
+        if header:
+            callback = finalize_analysis_task.s(
+                document_id, result_stats, new_file_hash, summary_key=summary_key, cached_insights=cached_insights
+            ).on_error(mark_analysis_failed.s(document_id))
+            chord(group(header))(callback)
+        else:
+            # Every vector reused and the summary cached: nothing to fan out
+            finalize_analysis_task([], document_id, result_stats, new_file_hash, cached_insights=cached_insights)
+        return {
+            "chunk_count": chunk_count,
+            "reused": reused_count,
+            "to_embed": len(pending_indexes),
+            "summary_cached": cached_insights is not None,
+        }
+
+    except Exception as e:
+        # Extraction errors, a broker that refuses the canvas, or (in eager mode) a failed shard
+        if 'document' in locals():
+            _save_failure(document_id, str(e))
+
+
+def _skip_unchanged(document):
+    chunk_count = document.chunks.count()
+    logger.info(f"⏭️ Document {document.id} unchanged since last analysis, reusing {chunk_count} chunks")
+
+    document.status = 'completed'
+    document.analysis_result = {**document.analysis_result, "reused_count": chunk_count, "embedded_count": 0}
+    document.save(update_fields=['status', 'analysis_result'])
+    progress.publish(document.id, 'completed', status='completed')
+    _analysis_finished(document.id)
+    return {"chunk_count": chunk_count, "reused": chunk_count, "to_embed": 0, "skipped": True}
+
+
+def _clone_analysis(document, source, new_file_hash):
+    """
+    Copies chunks, vectors and insights from a document with identical bytes.
+    The copies belong to `document`, so owner filtering works exactly as for
+    any other document (nothing about `source` is exposed).
+    """
+    source_chunks = source.chunks.order_by('chunk_index').values_list(
+        'chunk_index', 'text_content', 'content_hash', 'embedding'
+    )
+    chunk_count = 0
+    with transaction.atomic():
         document.chunks.all().delete()
 
-        # 3. The Sliding Window Algorithm
-        chunk_size = 1000
-        overlap = 200
-        chunks = []
-        
-        # Step through the text, going back 200 chars each time
-        for i in range(0, len(full_text), chunk_size - overlap):
-            chunk = full_text[i:i + chunk_size]
-            if len(chunk.strip()) > 50:  # Ignore tiny, useless fragments
-                chunks.append(chunk)
-
-        # 4. Generate AI Vectors and Save to Database
-        for index, chunk_text in enumerate(chunks):
-            # Turn this specific paragraph into math
-            vector = get_embedding(chunk_text)
-            
-            if vector:
-                DocumentChunk.objects.create(
+        for batch in batched(source_chunks.iterator(), settings.CHUNK_BULK_CREATE_BATCH_SIZE):
+            DocumentChunk.objects.bulk_create([
+                DocumentChunk(
                     document=document,
-                    chunk_index=index,
-                    text_content=chunk_text,
-                    embedding=vector
+                    chunk_index=chunk_index,
+                    text_content=text_content,
+                    content_hash=content_hash,
+                    embedding=embedding
                 )
+                for chunk_index, text_content, content_hash, embedding in batch
+            ])
+            chunk_count += len(batch)
 
-        # 5. GENERATE AI INSIGHTS
-        insights = generate_beneficial_analysis(full_text)
-
-        # 6. Mark Complete and save results
         document.status = 'completed'
+        document.content_version += 1
+        document.file_hash = new_file_hash
         document.analysis_result = {
-            "insights": insights,
-            "summary": insights,  # ✅ FIX: Add summary field (same as insights)
-            "char_count": len(full_text),
-            "word_count": len(full_text.split()),
-            "page_count": page_count,
-            "chunk_count": len(chunks),
+            **source.analysis_result,
+            "reused_count": chunk_count,
+            "embedded_count": 0,
+            "deduplicated": True,
         }
         document.save()
 
-    except Exception as e:
-        if 'document' in locals():
-            document.status = 'failed'
-            document.analysis_result = {
-                "error": str(e),
-                "insights": f"Analysis failed: {str(e)}",
-                "summary": f"Failed to process document: {str(e)}"
-            }
-            document.save()
\ No newline at end of file
+    logger.info(f"♻️ Document {document.id} is a duplicate upload, copied {chunk_count} analyzed chunks")
+    progress.publish(document.id, 'completed', status='completed')
+    _analysis_finished(document.id)
+    return {"chunk_count": chunk_count, "reused": chunk_count, "to_embed": 0, "deduplicated": True}
+
+
+@shared_task
+def embed_chunks_task(document_id, start_index, end_index, total=None):
+    """
+    Embeds the chunks in [start_index, end_index) of one document that have no vector yet.
+    `total` is the number of chunks all shards embed, for progress events.
+    """
+    chunks = list(
+        DocumentChunk.objects.filter(
+            document_id=document_id,
+            chunk_index__gte=start_index,
+            chunk_index__lt=end_index,
+            embedding__isnull=True
+        ).only('id', 'text_content').order_by('chunk_index')
+    )
+
+    for batch in scheduler.beating(document_id, batched(chunks, settings.EMBEDDING_BATCH_SIZE)):
+        # One forward pass per batch, not per chunk
+        vectors = get_embeddings([chunk.text_content for chunk in batch])
+        for chunk, vector in zip(batch, vectors):
+            chunk.embedding = vector
+        # Saved before it is reported, so "embedded" never counts vectors a crash would lose
+        DocumentChunk.objects.bulk_update(batch, ['embedding'], batch_size=settings.CHUNK_BULK_CREATE_BATCH_SIZE)
+        progress.chunks_embedded(document_id, len(batch), total)
+
+    return {"embedded": len(chunks)}
+
+
+@shared_task
+def summarize_document_task(text, document_id, word_count=0, map_reduce=False):
+    scheduler.heartbeat(document_id)
+    progress.publish(document_id, 'summary_started', mode='map_reduce' if map_reduce else 'single')
+
+    if map_reduce:
+        # Long document: every section, combined into one analysis
+        summary = summarize_document(document_id, word_count)
+    else:
+        # GENERATE AI INSIGHTS (the summarizer only reads the first 15,000 characters)
+        summary = {"insights": generate_beneficial_analysis(text)}
+
+    progress.publish(document_id, 'summary_finished', cached=False)
+    return summary
+
+
+@shared_task
+def finalize_analysis_task(results, document_id, stats, new_file_hash='', summary_key='', cached_insights=None):
+    """Chord callback: every shard and the summary (unless it came from the analysis cache) succeeded."""
+    if cached_insights is not None:
+        summary = {"insights": cached_insights}
+    else:
+        summary = next(result for result in results if "insights" in result)
+        if summary_key:
+            analysis_cache.store(summary_key, summary["insights"])
+    insights = summary["insights"]
+
+    # Mark Complete and save results
+    document = Document.objects.get(id=document_id)
+    document.status = 'completed'
+    document.content_version += 1  # Invalidates cached answers for the old content
+    document.file_hash = new_file_hash  # Only set on success, so a failed run is retried in full
+    document.analysis_result = {
+        "insights": insights,
+        "summary": insights,  # ✅ FIX: Add summary field (same as insights)
+        **stats,
+        "embedded_count": sum(result.get("embedded", 0) for result in results),
+        "summary_cached": cached_insights is not None,
+    }
+    if "summary_sections" in summary:
+        document.analysis_result["summary_sections"] = summary["summary_sections"]
+        document.analysis_result["cached_sections"] = summary["cached_sections"]
+    document.save()
+    progress.publish(document_id, 'completed', status='completed')
+    _analysis_finished(document_id)
+    return {"reused": stats.get("reused_count", 0), "embedded": document.analysis_result["embedded_count"]}
+
+
+@shared_task
+def mark_analysis_failed(request, exc, traceback, document_id):
+    """Error callback for the chord: a shard, the summary or the finalizer raised."""
+    logger.error(f"Analysis failed for document {document_id}: {str(exc)}")
+    _save_failure(document_id, str(exc))
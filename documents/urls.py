@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import DocumentViewSet
+from .async_views import ask_async, global_ask_async, progress_stream
 
 # A Router automatically generates the URLs for our ViewSet
 router = DefaultRouter()
@@ -8,5 +9,9 @@ router = DefaultRouter()
 router.register(r'', DocumentViewSet, basename='document')
 
 urlpatterns = [
+    # Async (ASGI) chat and progress endpoints; listed first so the router's detail route doesn't claim them
+    path('global_ask_async/', global_ask_async, name='document-global-ask-async'),
+    path('<int:pk>/ask_async/', ask_async, name='document-ask-async'),
+    path('<int:pk>/progress/', progress_stream, name='document-progress'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""
+Per-user in-memory vector index for global_ask.
+
+A user with a small corpus gets all of their completed chunks' embeddings
+as one contiguous, L2-normalized float32 matrix. Top-k is then a single
+matrix-vector product plus argpartition, with no join or distance sort in
+Postgres.
+
+Matrices are kept in a size-bounded LRU across users. If
+settings.USER_VECTOR_CACHE_DIR is set they are also written there as .npy
+files and memory-mapped, so every worker process on the host shares one copy
+through the page cache.
+
+Each matrix is stamped with the user's completed-document fingerprint, the
+(id, content_version) pairs global_ask already loads. A document finishing,
+failing, being re-analyzed or being deleted changes the fingerprint, so a
+stale matrix is never used, even one built by another process.
+invalidate_user() frees memory early. Corpora larger than
+settings.USER_VECTOR_CACHE_MAX_CHUNKS return None and stay on pgvector.
+"""
+import glob
+import hashlib
+import logging
+import os
+
+import numpy as np
+from django.conf import settings
+
+from .answer_cache import global_scope
+from .caching import LRUCache
+from .embeddings import EMBEDDING_DIMENSIONS
+from .models import DocumentChunk
+
+logger = logging.getLogger(__name__)
+
+# Global variable to hold the per-process matrix cache
+_cache = None
+
+
+class UserVectorIndex:
+    """One user's chunk ids and their normalized embedding matrix (row i <-> ids[i])."""
+
+    def __init__(self, fingerprint, ids, matrix):
+        self.fingerprint = fingerprint
+        self.ids = ids
+        self.matrix = matrix
+
+    @property
+    def nbytes(self):
+        # A memory-mapped matrix lives in the page cache, not in this process
+        matrix_bytes = 0 if isinstance(self.matrix, np.memmap) else self.matrix.nbytes
+        return self.ids.nbytes + matrix_bytes
+
+    def search(self, query_vector, limit):
+        """[(chunk_id, cosine distance)] of the `limit` nearest chunks, nearest first."""
+        if not len(self.ids) or limit <= 0:
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+
+        scores = self.matrix @ (query / norm)
+        limit = min(limit, len(scores))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(self.ids[i]), float(1.0 - scores[i])) for i in top]
+
+
+class TooLarge:
+    """Remembered for a fingerprint whose corpus is over the limit, so it isn't recounted on every question."""
+
+    nbytes = 0
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+
+
+def get_cache():
+    global _cache
+
+    if _cache is None:
+        _cache = LRUCache(
+            max_size=settings.USER_VECTOR_CACHE_MAX_USERS,
+            ttl=settings.USER_VECTOR_CACHE_TTL,
+            max_weight=settings.USER_VECTOR_CACHE_MAX_MB * 1024 * 1024,
+            weigh=lambda entry: entry.nbytes,
+        )
+    return _cache
+
+
+def invalidate_user(user_id):
+    if _cache is not None:
+        _cache.delete(user_id)
+
+
+def get_user_index(user_id, completed_docs):
+    """
+    The UserVectorIndex for `user_id`'s completed documents (`completed_docs`
+    is a list of (id, content_version) pairs), or None when the cache is
+    disabled, the user has nothing analyzed, or the corpus is too large.
+    """
+    if not settings.USER_VECTOR_CACHE_ENABLED or not completed_docs:
+        return None
+
+    cache = get_cache()
+    fingerprint = global_scope(user_id, completed_docs)
+    entry = cache.get(user_id)
+    if entry is None or entry.fingerprint != fingerprint:
+        entry = _load_from_disk(user_id, fingerprint) or _build(user_id, fingerprint, completed_docs)
+        cache.set(user_id, entry)
+
+    return None if isinstance(entry, TooLarge) else entry
+
+
+def _build(user_id, fingerprint, completed_docs):
+    chunks = DocumentChunk.objects.filter(
+        document_id__in=[doc_id for doc_id, _ in completed_docs],
+        embedding__isnull=False
+    )
+    count = chunks.count()
+    if count > settings.USER_VECTOR_CACHE_MAX_CHUNKS:
+        logger.info(f"User {user_id} has {count} chunks, global search stays on pgvector")
+        return TooLarge(fingerprint)
+
+    ids = np.empty(count, dtype=np.int64)
+    matrix = np.empty((count, EMBEDDING_DIMENSIONS), dtype=np.float32)
+    rows = 0
+    for chunk_id, embedding in chunks.order_by('id').values_list('id', 'embedding').iterator(chunk_size=2000):
+        if rows == count:
+            break  # Chunks added since the count; the next fingerprint change picks them up
+        ids[rows] = chunk_id
+        matrix[rows] = embedding
+        rows += 1
+    ids, matrix = ids[:rows], matrix[:rows]
+
+    # Normalize once so a dot product is the cosine similarity
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+
+    logger.info(f"🧮 Built vector matrix for user {user_id}: {rows} chunks, {matrix.nbytes / 1024 / 1024:.1f} MB")
+    index = UserVectorIndex(fingerprint, ids, matrix)
+    return _save_to_disk(user_id, index) or index
+
+
+def _disk_path(user_id, fingerprint):
+    digest = hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+    return os.path.join(settings.USER_VECTOR_CACHE_DIR, f"user-{user_id}-{digest}")
+
+
+def _load_from_disk(user_id, fingerprint):
+    if not settings.USER_VECTOR_CACHE_DIR:
+        return None
+    path = _disk_path(user_id, fingerprint)
+    try:
+        ids = np.load(f"{path}.ids.npy")
+        matrix = np.load(f"{path}.matrix.npy", mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    return UserVectorIndex(fingerprint, ids, matrix)
+
+
+def _save_to_disk(user_id, index):
+    """Writes the matrix next to the others and returns a memory-mapped copy (None if disabled or failed)."""
+    if not settings.USER_VECTOR_CACHE_DIR:
+        return None
+    path = _disk_path(user_id, index.fingerprint)
+    try:
+        os.makedirs(settings.USER_VECTOR_CACHE_DIR, exist_ok=True)
+        # Older matrices of this user are stale now
+        for stale in glob.glob(os.path.join(settings.USER_VECTOR_CACHE_DIR, f"user-{user_id}-*.npy")):
+            os.remove(stale)
+        for suffix, array in (('ids', index.ids), ('matrix', index.matrix)):
+            # Write then rename, so other processes never map a half-written file
+            tmp_path = f"{path}.{suffix}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, f"{path}.{suffix}.npy")
+    except OSError as e:
+        logger.warning(f"⚠️ Could not write vector matrix for user {user_id}: {str(e)}")
+        return None
+    return _load_from_disk(user_id, index.fingerprint)
@@ -0,0 +1,212 @@
+"""
+Vector search helpers.
+
+settings.VECTOR_STORAGE picks which HNSW index nearest() walks:
+
+    full      vector(768) with vector_cosine_ops (the model's own index)
+    halfvec   expression index on embedding::halfvec(768): half the index
+              size, cosine on 16-bit floats
+    binary    expression index on binary_quantize(embedding)::bit(768):
+              1 bit per dimension (~32x smaller), Hamming distance picks
+              VECTOR_BINARY_OVERSAMPLE x k candidates, then an exact cosine
+              re-rank on the full vectors picks the k
+
+The compact indexes need pgvector >= 0.7 and are created/dropped with
+`python manage.py vector_storage enable|disable <mode>`.
+
+Filtered queries (one owner's documents, one document) are the hard case:
+an HNSW scan only returns its ef_search nearest rows of the WHOLE table,
+and the filter is applied afterwards, so a small owner in a big table can
+get nothing back. search() handles it in two ways:
+
+    pgvector >= 0.8   hnsw.iterative_scan keeps walking the graph until
+                      enough rows pass the filter (up to VECTOR_SEARCH_MAX_SCAN_TUPLES)
+    any version       fewer than `limit` rows back -> exact_nearest(): the
+                      filtered rows (found through the document/owner btree
+                      indexes) sorted by distance, never a table scan
+"""
+from contextlib import contextmanager
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Field, Func, Value
+from django.db.models.functions import Cast
+from pgvector.django import CosineDistance
+from pgvector.utils import to_db
+
+from .embeddings import EMBEDDING_DIMENSIONS
+
+VECTOR_STORAGE_MODES = ('full', 'halfvec', 'binary')
+
+# pgvector version per database alias (read once per process)
+_pgvector_versions = {}
+
+
+def pgvector_version():
+    """The installed pgvector extension version as a tuple, e.g. (0, 8, 0); () if not installed."""
+    if connection.alias not in _pgvector_versions:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            row = cursor.fetchone()
+        _pgvector_versions[connection.alias] = (
+            tuple(int(part) for part in row[0].split('.') if part.isdigit()) if row else ()
+        )
+    return _pgvector_versions[connection.alias]
+
+
+@contextmanager
+def _local_settings(statements):
+    """
+    Runs `statements` (SET LOCAL ...) for the enclosed read-only queries only.
+    They are scoped to a savepoint that is rolled back on exit, so they
+    don't leak into the rest of an enclosing transaction.
+    """
+    with transaction.atomic():
+        savepoint = transaction.savepoint()
+        try:
+            with connection.cursor() as cursor:
+                for sql, params in statements:
+                    cursor.execute(sql, params)
+            yield
+        finally:
+            transaction.savepoint_rollback(savepoint)
+
+
+@contextmanager
+def ann_search(ef_search=None, limit=None):
+    """
+    Runs the enclosed vector queries with a per-query HNSW recall setting.
+
+    hnsw.ef_search is the size of the candidate list pgvector keeps while
+    walking the graph: higher = better recall, slower queries. It is also
+    the most rows an index scan can return, so it is raised to cover
+    `limit` (the largest nearest() limit used inside the block). On
+    pgvector >= 0.8 filtered scans are also iterative (see module docstring).
+    The settings only live inside the block, so querysets must be evaluated
+    (e.g. list(...)) inside it; the block is for reads only.
+    """
+    ef_search = ef_search or settings.VECTOR_SEARCH_EF_SEARCH
+    if limit:
+        ef_search = max(ef_search, candidates_needed(limit))
+
+    statements = [("SET LOCAL hnsw.ef_search = %s", [int(ef_search)])]
+    if settings.VECTOR_SEARCH_ITERATIVE_SCAN != 'off' and pgvector_version() >= (0, 8):
+        statements += [
+            (f"SET LOCAL hnsw.iterative_scan = {settings.VECTOR_SEARCH_ITERATIVE_SCAN}", []),
+            ("SET LOCAL hnsw.max_scan_tuples = %s", [int(settings.VECTOR_SEARCH_MAX_SCAN_TUPLES)]),
+        ]
+    with _local_settings(statements):
+        yield
+
+
+@contextmanager
+def exact_search():
+    """
+    Runs the enclosed vector queries as an exact (sequential scan) search.
+    Used as the ground truth when measuring ANN recall over the whole table.
+    Reads only, like ann_search().
+    """
+    with _local_settings([("SET LOCAL enable_indexscan = off", []), ("SET LOCAL enable_bitmapscan = off", [])]):
+        yield
+
+
+class _SqlType(Field):
+    """Lets Cast() target pgvector types Django has no field for (halfvec, bit)."""
+
+    def __init__(self, sql_type):
+        self.sql_type = sql_type
+        super().__init__()
+
+    def db_type(self, connection):
+        return self.sql_type
+
+
+def as_halfvec(expression):
+    return Cast(expression, _SqlType(f'halfvec({EMBEDDING_DIMENSIONS})'))
+
+
+def binary_quantized(expression):
+    return Cast(Func(expression, function='binary_quantize'), _SqlType(f'bit({EMBEDDING_DIMENSIONS})'))
+
+
+class HalfvecCosineDistance(Func):
+    function = ''
+    arg_joiner = ' <=> '
+
+    def __init__(self, expression, vector, **extra):
+        super().__init__(as_halfvec(expression), as_halfvec(_vector_value(vector)), **extra)
+
+
+class HammingDistance(Func):
+    function = ''
+    arg_joiner = ' <~> '
+
+    def __init__(self, expression, vector, **extra):
+        super().__init__(binary_quantized(expression), binary_quantized(_vector_value(vector)), **extra)
+
+
+def _vector_value(vector):
+    return Cast(Value(to_db(vector)), _SqlType(f'vector({EMBEDDING_DIMENSIONS})'))
+
+
+def candidates_needed(limit, storage=None):
+    """How many rows the HNSW scan has to return for nearest(limit)."""
+    storage = storage or settings.VECTOR_STORAGE
+    return limit * settings.VECTOR_BINARY_OVERSAMPLE if storage == 'binary' else limit
+
+
+def nearest(queryset, query_vector, limit, storage=None):
+    """
+    The `limit` rows of `queryset` closest to query_vector, annotated with
+    cosine `distance` and ordered nearest first, via the index of `storage`
+    (default settings.VECTOR_STORAGE). Evaluate inside ann_search().
+    """
+    storage = storage or settings.VECTOR_STORAGE
+    if storage not in VECTOR_STORAGE_MODES:
+        raise ValueError(f"Unknown VECTOR_STORAGE '{storage}'. Choose from: {', '.join(VECTOR_STORAGE_MODES)}")
+
+    if storage == 'halfvec':
+        return queryset.annotate(
+            distance=HalfvecCosineDistance(F('embedding'), query_vector)
+        ).order_by('distance')[:limit]
+
+    if storage == 'binary':
+        # Cheap Hamming pass over the bit index, then exact cosine on the survivors
+        candidate_ids = queryset.annotate(
+            hamming=HammingDistance(F('embedding'), query_vector)
+        ).order_by('hamming').values('id')[:candidates_needed(limit, storage)]
+        queryset = queryset.filter(id__in=candidate_ids)
+
+    return queryset.annotate(
+        distance=CosineDistance('embedding', query_vector)
+    ).order_by('distance')[:limit]
+
+
+def exact_nearest(queryset, query_vector, limit):
+    """
+    The exact `limit` nearest rows of `queryset`. Rows are sorted by
+    distance + 0, which no HNSW index can return in order, so Postgres
+    fetches the filtered rows through whatever other index fits the filter
+    and sorts them; no planner setting is switched off.
+    """
+    return queryset.filter(embedding__isnull=False).annotate(
+        distance=CosineDistance('embedding', query_vector)
+    ).order_by(F('distance') + Value(0.0))[:limit]
+
+
+def search(queryset, query_vector, limit, ef_search=None, storage=None):
+    """
+    nearest(), evaluated: the `limit` rows of `queryset` closest to
+    query_vector, nearest first. If the index scan returns fewer than
+    `limit` rows (the queryset's filter discarded what the HNSW scan found,
+    or it simply has fewer rows), exact_nearest() reads the filtered rows.
+    """
+    with ann_search(ef_search, limit=limit):
+        rows = list(nearest(queryset, query_vector, limit, storage=storage))
+
+    if len(rows) < limit:
+        rows = list(exact_nearest(queryset, query_vector, limit))
+
+    # An iterative scan in relaxed_order may return rows slightly out of order
+    return sorted(rows, key=attrgetter('distance'))
@@ -3,19 +3,108 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.throttling import UserRateThrottle, ScopedRateThrottle
-from pgvector.django import CosineDistance
+from rest_framework.parsers import MultiPartParser
+from rest_framework.settings import api_settings
+from django.conf import settings
 from django.db.models import Prefetch
 import logging
+import math
 
-from .models import Document, DocumentChunk
+from .models import AnalysisJob, Document, DocumentChunk
 from .serializers import DocumentSerializer
-from .tasks import analyze_document_task
-from .embeddings import get_embedding
-from .llm_utils import generate_answer, generate_multi_document_answer, validate_context_quality
+from .tasks import schedule_analysis
+from .bulk_upload import use_streaming_upload_handlers, store_uploads
+from .embedding_cache import get_query_embedding
+from .answer_cache import get_answer_cache, document_scope, global_scope
+from .retrieval import RETRIEVAL_MODES, CONTEXT_LABELS, context_label, retrieve_context
+from .user_vectors import get_user_index, invalidate_user
+from .llm_client import LLMUnavailable
+from .llm_utils import (
+    generate_answer, generate_multi_document_answer, validate_context_quality,
+    stream_answer, stream_multi_document_answer,
+)
+from .streaming import EventStreamRenderer, stream_answer_response, stream_payload_response
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# JSON as usual, plus text/event-stream for ?stream=1 on the chat endpoints
+CHAT_RENDERER_CLASSES = api_settings.DEFAULT_RENDERER_CLASSES + [EventStreamRenderer]
+
+
+def parse_retrieval_mode(data):
+    """{"retrieval": "vector" | "hybrid"} in the body, else settings.RETRIEVAL_MODE. None if invalid."""
+    mode = data.get('retrieval') or settings.RETRIEVAL_MODE
+    return mode if mode in RETRIEVAL_MODES else None
+
+
+def parse_rerank_options(data):
+    """
+    ({"rerank": true/false}, {"rerank_budget_ms": n}) from the body, defaulting to
+    settings. A request may tighten the budget but never raise it above RERANK_BUDGET_MS.
+    """
+    rerank = data.get('rerank', settings.RERANK_ENABLED)
+    if isinstance(rerank, str):
+        rerank = rerank.lower() in ('1', 'true', 'yes')
+
+    try:
+        budget_ms = int(data.get('rerank_budget_ms', settings.RERANK_BUDGET_MS))
+    except (TypeError, ValueError):
+        budget_ms = settings.RERANK_BUDGET_MS
+    return bool(rerank), max(0, min(budget_ms, settings.RERANK_BUDGET_MS))
+
+
+def _confidence(context_chunks):
+    avg_similarity = sum(1 - float(c.distance) for c in context_chunks) / len(context_chunks)
+    return "high" if avg_similarity > 0.7 else "medium" if avg_similarity > 0.5 else "low"
+
+
+def build_answer_meta(context_chunks, retrieval, reranked):
+    """Everything in an ask response except the answer (also used by async_views)."""
+    return {
+        "sources": [{
+            "page": chunk.chunk_index + 1,
+            "text": chunk.text_content[:200],  # First 200 chars
+            "relevance": round(1 - float(chunk.distance), 2)
+        } for chunk in context_chunks],
+        "confidence": _confidence(context_chunks),
+        "chunks_used": len(context_chunks),
+        "retrieval": retrieval,
+        "reranked": reranked
+    }
+
+
+def build_global_answer_meta(context_chunks, retrieval, reranked):
+    """Everything in a global_ask response except the answer (also used by async_views)."""
+    return {
+        "sources": [{
+            "document_id": chunk.document.id,
+            "document_title": chunk.document.title,
+            "page": chunk.chunk_index + 1,
+            "text": chunk.text_content[:200],
+            "relevance": round(1 - float(chunk.distance), 2)
+        } for chunk in context_chunks],
+        "confidence": _confidence(context_chunks),
+        "documents_searched": len(set(c.document.id for c in context_chunks)),
+        "chunks_used": len(context_chunks),
+        "retrieval": retrieval,
+        "reranked": reranked
+    }
+
+
+def llm_unavailable_body(error):
+    """(503 body, Retry-After seconds) when the LLM call failed (also used by async_views)."""
+    retry_after = math.ceil(error.retry_after or settings.LLM_RETRY_MAX_DELAY)
+    return {
+        "error": "The AI service is temporarily unavailable. Please try again shortly.",
+        "retry_after": retry_after
+    }, retry_after
+
+
+def llm_unavailable_response(error):
+    body, retry_after = llm_unavailable_body(error)
+    return Response(body, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": str(retry_after)})
+
 
 class DocumentViewSet(viewsets.ModelViewSet):
     """
@@ -24,10 +113,12 @@ class DocumentViewSet(viewsets.ModelViewSet):
     Endpoints:
     - GET /documents/ - List user's documents
     - POST /documents/ - Upload new document
+    - POST /documents/bulk_upload/ - Upload many PDFs and start their analysis
     - GET /documents/{id}/ - Retrieve specific document
     - PUT/PATCH /documents/{id}/ - Update document
     - DELETE /documents/{id}/ - Delete document
     - POST /documents/{id}/analyze/ - Start background analysis
+    - GET /documents/{id}/progress/ - Follow the analysis live (Server-Sent Events, async_views.progress_stream)
     - POST /documents/{id}/ask/ - Ask question about specific document
     - POST /documents/global_ask/ - Search across all documents
     """
@@ -53,6 +144,13 @@ class DocumentViewSet(viewsets.ModelViewSet):
             )
         ).order_by('-uploaded_at')
 
+    def initialize_request(self, request, *args, **kwargs):
+        request = super().initialize_request(request, *args, **kwargs)
+        if self.action == 'bulk_upload':
+            # Before anything reads the body: spool each file to disk instead of memory
+            use_streaming_upload_handlers(request._request)
+        return request
+
     def perform_create(self, serializer):
         """
         Automatically set the document owner to the authenticated user.
@@ -68,12 +166,38 @@ class DocumentViewSet(viewsets.ModelViewSet):
         document_id = document.id
         document_title = document.title
         
+        # Drop cached answers for this document right away instead of waiting for the TTL
+        answer_cache = get_answer_cache()
+        if answer_cache is not None:
+            for label in CONTEXT_LABELS:
+                answer_cache.invalidate(document_scope(document, label))
+        invalidate_user(document.owner_id)
+        
         # Perform deletion
         response = super().destroy(request, *args, **kwargs)
         
         logger.info(f"Document deleted: {document_id} ('{document_title}') by user {request.user.id}")
         return response
 
+    def _wants_stream(self, request):
+        """?stream=1 (or Accept: text/event-stream) switches ask/global_ask to Server-Sent Events."""
+        if request.query_params.get('stream', '').lower() in ('1', 'true', 'yes'):
+            return True
+        accepted_renderer = getattr(request, 'accepted_renderer', None)
+        return accepted_renderer is not None and accepted_renderer.format == 'sse'
+
+    def _retrieval_mode(self, request):
+        return parse_retrieval_mode(request.data)
+
+    def _rerank_options(self, request):
+        return parse_rerank_options(request.data)
+
+    def _answer_response(self, request, payload):
+        """Returns a finished answer payload as JSON, or as SSE in streaming mode."""
+        if self._wants_stream(request):
+            return stream_payload_response(payload)
+        return Response(payload, status=status.HTTP_200_OK)
+
     # ========================================================================
     # DOCUMENT ANALYSIS ENDPOINT
     # ========================================================================
@@ -107,34 +231,88 @@ class DocumentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if already completed
-        if document.status == 'completed':
-            return Response(
-                {
-                    "message": "Document has already been analyzed. Re-analyzing...",
-                    "status": "processing"
-                },
-                status=status.HTTP_202_ACCEPTED
-            )
-        
-        # Start analysis
-        document.status = 'processing'
-        document.save(update_fields=['status'])
+        # Already completed: re-analyze (unchanged files and chunks are reused, not re-embedded)
+        reanalyzing = document.status == 'completed'
         
-        # Trigger Celery task
-        analyze_document_task.delay(document.id)
+        # Start analysis: queued ahead of bulk work, dispatched as soon as the user has a free slot
+        schedule_analysis([document], AnalysisJob.PRIORITY_INTERACTIVE)
+        invalidate_user(document.owner_id)
         
         logger.info(f"Analysis started for document {document.id}")
         
         return Response(
             {
-                "message": "Document analysis started. This may take 30-60 seconds.",
+                "message": (
+                    "Document has already been analyzed. Re-analyzing..." if reanalyzing
+                    else "Document analysis started. This may take 30-60 seconds."
+                ),
                 "status": "processing",
                 "document_id": document.id
             },
             status=status.HTTP_202_ACCEPTED
         )
 
+    # ========================================================================
+    # BULK INGEST ENDPOINT
+    # ========================================================================
+
+    @action(
+        detail=False,
+        methods=['post'],
+        throttle_scope='bulk_uploads',  # 2 requests/minute, however many files each
+        parser_classes=[MultiPartParser]
+    )
+    def bulk_upload(self, request):
+        """
+        Upload many PDFs in one multipart request and analyze them all.
+
+        Request:
+            POST /documents/bulk_upload/
+            Body (multipart): files=<pdf>, files=<pdf>, ... (up to BULK_UPLOAD_MAX_FILES)
+
+        Response:
+            202 - {"results": [{"file", "id"} or {"file", "error"}, ...] in upload order,
+                   "created", "failed"}; every created document is queued for analysis
+            400 - No files, too many files, or no valid file
+        """
+        uploads = request.FILES.getlist('files')
+
+        # Validate input
+        if not uploads:
+            return Response(
+                {"error": "Send one or more PDFs in the 'files' field"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if len(uploads) > settings.BULK_UPLOAD_MAX_FILES:
+            return Response(
+                {"error": f"At most {settings.BULK_UPLOAD_MAX_FILES} files per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # 1. Store files and create every row in one INSERT
+        documents, results = store_uploads(uploads, request.user)
+        failed = len(results) - len(documents)
+        if not documents:
+            return Response(
+                {"results": results, "created": 0, "failed": failed},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # 2. Bulk priority: interactive analyses from other users still go first
+        schedule_analysis(documents, AnalysisJob.PRIORITY_BULK)
+
+        logger.info(f"Bulk upload by user {request.user.id}: {len(documents)} created, {failed} rejected")
+
+        return Response(
+            {
+                "results": results,
+                "created": len(documents),
+                "failed": failed
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
+
     # ========================================================================
     # SINGLE-DOCUMENT CHAT ENDPOINT
     # ========================================================================
@@ -142,7 +320,8 @@ class DocumentViewSet(viewsets.ModelViewSet):
     @action(
         detail=True, 
         methods=['post'], 
-        throttle_scope='ai_chat'  # 20 requests/minute
+        throttle_scope='ai_chat',  # 20 requests/minute
+        renderer_classes=CHAT_RENDERER_CLASSES
     )
     def ask(self, request, pk=None):
         """
@@ -150,7 +329,9 @@ class DocumentViewSet(viewsets.ModelViewSet):
         
         Request:
             POST /documents/{id}/ask/
-            Body: {"question": "What is this about?"}
+            Body: {"question": "What is this about?", "retrieval": "hybrid", "rerank": true}
+                  (retrieval, rerank and rerank_budget_ms are optional)
+            Add ?stream=1 to receive sources, then answer tokens, as Server-Sent Events.
         
         Response:
             200 - Answer with sources
@@ -174,6 +355,13 @@ class DocumentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        retrieval = self._retrieval_mode(request)
+        if retrieval is None:
+            return Response(
+                {"error": f"retrieval must be one of: {', '.join(RETRIEVAL_MODES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         # Check document status
         if document.status != 'completed':
             return Response(
@@ -185,9 +373,11 @@ class DocumentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        rerank, rerank_budget_ms = self._rerank_options(request)
+        
         try:
             # Generate embedding for the question
-            query_vector = get_embedding(question)
+            query_vector = get_query_embedding(question)
             
             if not query_vector:
                 logger.error(f"Failed to generate embedding for question: {question[:50]}...")
@@ -196,49 +386,63 @@ class DocumentViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
             
+            # Serve a cached answer if this (or a paraphrased) question was already answered
+            answer_cache = get_answer_cache()
+            scope = document_scope(document, context_label(retrieval, rerank))
+            if answer_cache is not None:
+                cached, similarity = answer_cache.get(scope, question, query_vector)
+                if cached is not None:
+                    logger.info(f"Cached answer served for document {document.id} (similarity: {similarity})")
+                    return self._answer_response(request, {**cached, "cached": True, "cache_similarity": similarity})
+            
             # Retrieve most relevant chunks
-            context_chunks = DocumentChunk.objects.filter(
-                document=document
-            ).annotate(
-                distance=CosineDistance('embedding', query_vector)
-            ).order_by('distance')[:3]  # Top 3 most relevant chunks
+            context_chunks, reranked = retrieve_context(
+                DocumentChunk.objects.filter(document=document),
+                question, query_vector,
+                top_k=3,  # Top 3 most relevant chunks
+                mode=retrieval,
+                rerank=rerank,
+                rerank_budget_ms=rerank_budget_ms
+            )
             
             # Validate context quality
             is_valid, reason = validate_context_quality(question, context_chunks)
             
             if not is_valid:
-                return Response(
-                    {
-                        "answer": f"I couldn't find relevant information to answer your question. {reason}",
-                        "sources": [],
-                        "confidence": "low"
-                    },
-                    status=status.HTTP_200_OK
+                return self._answer_response(request, {
+                    "answer": f"I couldn't find relevant information to answer your question. {reason}",
+                    "sources": [],
+                    "confidence": "low"
+                })
+            
+            # Sources and confidence for the response
+            meta = build_answer_meta(context_chunks, retrieval, reranked)
+            confidence = meta["confidence"]
+            
+            def cache_answer(answer):
+                if answer_cache is not None:
+                    answer_cache.set(scope, question, query_vector, {"answer": answer, **meta})
+            
+            # Streaming mode: sources go out now, answer tokens as the LLM produces them
+            if self._wants_stream(request):
+                return stream_answer_response(
+                    {**meta, "cached": False},
+                    stream_answer(question, context_chunks),
+                    on_complete=cache_answer
                 )
             
             # Generate answer using enhanced LLM
             answer = generate_answer(question, context_chunks)
             
-            # Calculate average confidence
-            avg_similarity = sum(1 - float(c.distance) for c in context_chunks) / len(context_chunks)
-            confidence = "high" if avg_similarity > 0.7 else "medium" if avg_similarity > 0.5 else "low"
-            
-            # Prepare sources for response
-            sources = [{
-                "page": chunk.chunk_index + 1,
-                "text": chunk.text_content[:200],  # First 200 chars
-                "relevance": round(1 - float(chunk.distance), 2)
-            } for chunk in context_chunks]
-            
             logger.info(f"Question answered for document {document.id}, confidence: {confidence}")
             
-            return Response({
-                "answer": answer,
-                "sources": sources,
-                "confidence": confidence,
-                "chunks_used": len(context_chunks)
-            })
+            cache_answer(answer)
+            return Response({"answer": answer, **meta, "cached": False})
             
+        except LLMUnavailable as e:
+            # Nothing was cached: the next request tries the LLM again
+            logger.warning(f"LLM unavailable for document {document.id}: {str(e)}")
+            return llm_unavailable_response(e)
         except Exception as e:
             logger.error(f"Error in ask endpoint for document {document.id}: {str(e)}", exc_info=True)
             return Response(
@@ -256,7 +460,8 @@ class DocumentViewSet(viewsets.ModelViewSet):
     @action(
         detail=False, 
         methods=['post'], 
-        throttle_scope='ai_chat'  # 20 requests/minute
+        throttle_scope='ai_chat',  # 20 requests/minute
+        renderer_classes=CHAT_RENDERER_CLASSES
     )
     def global_ask(self, request):
         """
@@ -264,7 +469,9 @@ class DocumentViewSet(viewsets.ModelViewSet):
         
         Request:
             POST /documents/global_ask/
-            Body: {"question": "What themes appear across my documents?"}
+            Body: {"question": "What themes appear across my documents?", "retrieval": "hybrid", "rerank": true}
+                  (retrieval, rerank and rerank_budget_ms are optional)
+            Add ?stream=1 to receive sources, then answer tokens, as Server-Sent Events.
         
         Response:
             200 - Answer with multi-document sources
@@ -287,9 +494,18 @@ class DocumentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        retrieval = self._retrieval_mode(request)
+        if retrieval is None:
+            return Response(
+                {"error": f"retrieval must be one of: {', '.join(RETRIEVAL_MODES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        rerank, rerank_budget_ms = self._rerank_options(request)
+        
         try:
             # Generate embedding
-            query_vector = get_embedding(question)
+            query_vector = get_query_embedding(question)
             
             if not query_vector:
                 logger.error(f"Failed to generate embedding for global question: {question[:50]}...")
@@ -298,22 +514,38 @@ class DocumentViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
             
+            # The cache scope is the exact set of completed documents (and their versions)
+            completed_docs = list(Document.objects.filter(
+                owner=request.user,
+                status='completed'
+            ).values_list('id', 'content_version'))
+            
+            answer_cache = get_answer_cache()
+            scope = global_scope(request.user.id, completed_docs, context_label(retrieval, rerank))
+            if answer_cache is not None and completed_docs:
+                cached, similarity = answer_cache.get(scope, question, query_vector)
+                if cached is not None:
+                    logger.info(f"Cached global answer served for user {request.user.id} (similarity: {similarity})")
+                    return self._answer_response(request, {**cached, "cached": True, "cache_similarity": similarity})
+            
             # Retrieve top chunks across ALL completed documents
-            context_chunks = DocumentChunk.objects.filter(
-                document__owner=request.user,
-                document__status='completed'
-            ).select_related(
-                'document'
-            ).annotate(
-                distance=CosineDistance('embedding', query_vector)
-            ).order_by('distance')[:5]  # Top 5 across all documents
+            context_chunks, reranked = retrieve_context(
+                DocumentChunk.objects.filter(
+                    document__owner=request.user,
+                    document__status='completed'
+                ).select_related('document'),
+                question, query_vector,
+                top_k=5,  # Top 5 across all documents
+                mode=retrieval,
+                rerank=rerank,
+                rerank_budget_ms=rerank_budget_ms,
+                # Small corpora: top-k from an in-memory matrix of this user's chunks
+                vector_index=get_user_index(request.user.id, completed_docs)
+            )
             
             # Check if user has any analyzed documents
-            if not context_chunks.exists():
-                completed_count = Document.objects.filter(
-                    owner=request.user,
-                    status='completed'
-                ).count()
+            if not context_chunks:
+                completed_count = len(completed_docs)
                 
                 if completed_count == 0:
                     return Response(
@@ -324,60 +556,52 @@ class DocumentViewSet(viewsets.ModelViewSet):
                         status=status.HTTP_404_NOT_FOUND
                     )
                 else:
-                    return Response(
-                        {
-                            "answer": "I couldn't find relevant information across your documents to answer this question.",
-                            "sources": [],
-                            "documents_searched": completed_count
-                        },
-                        status=status.HTTP_200_OK
-                    )
+                    return self._answer_response(request, {
+                        "answer": "I couldn't find relevant information across your documents to answer this question.",
+                        "sources": [],
+                        "documents_searched": completed_count
+                    })
             
             # Validate context quality
             is_valid, reason = validate_context_quality(question, context_chunks)
             
             if not is_valid:
-                return Response(
-                    {
-                        "answer": f"I found some content but it's not sufficient to answer your question. {reason}",
-                        "sources": [],
-                        "confidence": "low"
-                    },
-                    status=status.HTTP_200_OK
-                )
+                return self._answer_response(request, {
+                    "answer": f"I found some content but it's not sufficient to answer your question. {reason}",
+                    "sources": [],
+                    "confidence": "low"
+                })
             
-            # Generate answer using multi-document LLM
-            answer = generate_multi_document_answer(question, context_chunks)
+            # Sources (with document info) and confidence for the response
+            meta = build_global_answer_meta(context_chunks, retrieval, reranked)
+            confidence = meta["confidence"]
             
-            # Calculate confidence
-            avg_similarity = sum(1 - float(c.distance) for c in context_chunks) / len(context_chunks)
-            confidence = "high" if avg_similarity > 0.7 else "medium" if avg_similarity > 0.5 else "low"
+            def cache_answer(answer):
+                if answer_cache is not None:
+                    answer_cache.set(scope, question, query_vector, {"answer": answer, **meta})
             
-            # Get unique documents
-            unique_docs = set(c.document.id for c in context_chunks)
+            # Streaming mode: sources go out now, answer tokens as the LLM produces them
+            if self._wants_stream(request):
+                return stream_answer_response(
+                    {**meta, "cached": False},
+                    stream_multi_document_answer(question, context_chunks),
+                    on_complete=cache_answer
+                )
             
-            # Prepare sources with document info
-            sources = [{
-                "document_id": chunk.document.id,
-                "document_title": chunk.document.title,
-                "page": chunk.chunk_index + 1,
-                "text": chunk.text_content[:200],
-                "relevance": round(1 - float(chunk.distance), 2)
-            } for chunk in context_chunks]
+            # Generate answer using multi-document LLM
+            answer = generate_multi_document_answer(question, context_chunks)
             
             logger.info(
                 f"Global search answered for user {request.user.id}, "
-                f"{len(unique_docs)} documents, confidence: {confidence}"
+                f"{meta['documents_searched']} documents, confidence: {confidence}"
             )
             
-            return Response({
-                "answer": answer,
-                "sources": sources,
-                "confidence": confidence,
-                "documents_searched": len(unique_docs),
-                "chunks_used": len(context_chunks)
-            })
+            cache_answer(answer)
+            return Response({"answer": answer, **meta, "cached": False})
             
+        except LLMUnavailable as e:
+            logger.warning(f"LLM unavailable for global search of user {request.user.id}: {str(e)}")
+            return llm_unavailable_response(e)
         except Exception as e:
             logger.error(f"Error in global_ask endpoint: {str(e)}", exc_info=True)
             return Response(
@@ -445,12 +669,11 @@ class DocumentViewSet(viewsets.ModelViewSet):
         Response:
             Number of documents queued for analysis
         """
-        pending_docs = Document.objects.filter(
-            owner=request.user,
-            status='pending'
+        pending_docs = list(
+            Document.objects.filter(owner=request.user, status='pending').only('id', 'owner_id')
         )
         
-        count = pending_docs.count()
+        count = len(pending_docs)
         
         if count == 0:
             return Response(
@@ -458,12 +681,8 @@ class DocumentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_200_OK
             )
         
-        # Update all to processing
-        pending_docs.update(status='processing')
-        
-        # Queue all for analysis
-        for doc in pending_docs:
-            analyze_document_task.delay(doc.id)
+        # Queue all as bulk work: the scheduler feeds them to workers a few at a time
+        schedule_analysis(pending_docs, AnalysisJob.PRIORITY_BULK)
         
         logger.info(f"Batch analysis started for {count} documents by user {request.user.id}")
         
@@ -0,0 +1,63 @@
+"""Fixtures shared by the analysis pipeline tests (tasks, summaries, caches, uploads, scheduling, progress)."""
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from config.celery import app as celery_app
+from documents import progress, summarization, tasks
+from documents.models import Document
+from tests.utils import make_pdf
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path_factory):
+    """Uploads of a test that doesn't pick its own MEDIA_ROOT still never land in the repository's media/."""
+    settings.MEDIA_ROOT = str(tmp_path_factory.mktemp("media"))
+
+
+@pytest.fixture
+def eager_celery(monkeypatch):
+    """Runs the whole canvas (shards, chord callback, errback) in-process."""
+    monkeypatch.setattr(celery_app.conf, 'task_always_eager', True)
+
+
+@pytest.fixture
+def fake_ai(eager_celery, monkeypatch, settings):
+    """Replaces the embedding model and the LLM (single-pass and map-reduce) with cheap fakes."""
+    calls = {"embedded": [], "summarized": [], "combined": []}
+    settings.SUMMARY_CACHE_REDIS_URL = ''
+    settings.PROGRESS_REDIS_URL = ''  # In-process progress events, fresh for every test
+    monkeypatch.setattr(progress, '_brokers', {})
+
+    def fake_get_embeddings(texts, batch_size=None):
+        calls["embedded"].append(len(texts))
+        return [[0.1] * 768 for _ in texts]
+
+    def fake_analysis(text):
+        calls["summarized"].append(text)
+        return "## Summary\nA test document."
+
+    def fake_combine(notes, word_count):
+        calls["combined"].append(notes)
+        return "## Summary\nA test document."
+
+    monkeypatch.setattr(tasks, 'get_embeddings', fake_get_embeddings)
+    monkeypatch.setattr(tasks, 'generate_beneficial_analysis', fake_analysis)
+    monkeypatch.setattr(summarization, 'summarize_section', fake_analysis)
+    monkeypatch.setattr(summarization, 'combine_section_summaries', fake_combine)
+    return calls
+
+
+@pytest.fixture
+def make_document(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    User = get_user_model()
+    user = User.objects.create_user(username="ingest", email="ingest@test.com", password="password123")
+
+    def _make(pages, title="Handbook", owner=None):
+        return Document.objects.create(
+            title=title,
+            file=SimpleUploadedFile(f"{title}.pdf", make_pdf(pages), content_type="application/pdf"),
+            owner=owner or user
+        )
+    return _make
@@ -0,0 +1,89 @@
+from datetime import timedelta
+
+import fitz
+import pytest
+from django.utils import timezone
+
+from documents import analysis_cache, tasks
+from documents.models import AnalysisCache
+
+PAGES = [f"Page {n}. " + "The landlord repairs the roof and the tenant pays the heating. " * 10 for n in range(4)]
+
+
+def reexport(document, title):
+    """Rewrites the document's PDF metadata: same text, different bytes (so not a duplicate upload)."""
+    pdf = fitz.open(document.file.path)
+    pdf.set_metadata({"title": title})
+    pdf.saveIncr()
+    pdf.close()
+
+
+@pytest.mark.django_db
+def test_same_text_in_a_different_file_reuses_cached_insights(fake_ai, make_document):
+    """
+    Scenario: A PDF is analyzed, then a re-export of it (same text, different metadata so different bytes).
+    Expected: The second analysis embeds its chunks but takes the insights from the cache, with no LLM call.
+    """
+    # 1. First analysis fills the cache
+    first = make_document(PAGES, title="Lease")
+    tasks.analyze_document_task(first.id)
+    first.refresh_from_db()
+    assert first.analysis_result['summary_cached'] is False
+    assert AnalysisCache.objects.count() == 1
+
+    # 2. Same text, different bytes: not a duplicate upload, but the same analysis
+    second = make_document(PAGES, title="Lease copy")
+    reexport(second, "Lease (signed copy)")
+    assert tasks.file_hash(second.file.path) != first.file_hash
+
+    result = tasks.analyze_document_task(second.id)
+
+    second.refresh_from_db()
+    assert result['summary_cached'] is True
+    assert second.status == 'completed'
+    assert second.analysis_result['summary_cached'] is True
+    assert second.analysis_result['insights'] == first.analysis_result['insights']
+    assert second.analysis_result['embedded_count'] == second.analysis_result['chunk_count']
+    assert len(fake_ai["summarized"]) == 1
+
+
+@pytest.mark.django_db
+def test_changed_prompt_version_misses_the_cache(fake_ai, make_document, monkeypatch):
+    """
+    Scenario: The same text is analyzed before and after ANALYSIS_PROMPT_VERSION is bumped.
+    Expected: The new prompt's analysis is computed, not served from the old entry.
+    """
+    tasks.analyze_document_task(make_document(PAGES, title="Before").id)
+
+    monkeypatch.setattr(analysis_cache, 'ANALYSIS_PROMPT_VERSION', 2)
+    after = make_document(PAGES, title="After")
+    reexport(after, "Lease v2")
+    result = tasks.analyze_document_task(after.id)
+
+    assert result['summary_cached'] is False
+    assert len(fake_ai["summarized"]) == 2
+    assert AnalysisCache.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_cache_evicts_expired_and_least_recently_used_entries(settings):
+    """
+    Scenario: With a 2-entry limit and a 1-day TTL: one stale entry, then three fresh ones, one re-read.
+    Expected: The stale entry is never served and is dropped; the least recently used fresh one goes too.
+    """
+    # 1. Setup: a stale entry
+    settings.ANALYSIS_CACHE_MAX_ENTRIES = 2
+    settings.ANALYSIS_CACHE_TTL = 86400
+    analysis_cache.store("stale", "old insights")
+    AnalysisCache.objects.filter(key="stale").update(created_at=timezone.now() - timedelta(days=2))
+    assert analysis_cache.get("stale") is None
+
+    # 2. Fresh entries; "a" is read again so "b" is the least recently used
+    analysis_cache.store("a", "insights a")
+    analysis_cache.store("b", "insights b")
+    AnalysisCache.objects.filter(key="b").update(last_used_at=timezone.now() - timedelta(hours=1))
+    assert analysis_cache.get("a") == "insights a"
+    analysis_cache.store("c", "insights c")
+
+    # 3. Check
+    assert set(AnalysisCache.objects.values_list('key', flat=True)) == {"a", "c"}
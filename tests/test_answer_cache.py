@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+from documents.answer_cache import AnswerCache, document_scope, global_scope
+
+
+def test_answer_cache_matches_exact_and_paraphrased_questions():
+    """
+    Scenario: An answer is cached, then a reworded question with a very similar embedding is asked.
+    Expected: Exact and paraphrased questions hit; an unrelated question misses.
+    """
+    # 1. Cache one answer
+    cache = AnswerCache(redis_client=None, threshold=0.95)
+    scope = document_scope(SimpleNamespace(id=7, content_version=1))
+    cache.set(scope, "What is the notice period?", [1.0, 0.0, 0.0], {"answer": "30 days"})
+
+    # 2. Exact (after normalization) and paraphrase hits
+    assert cache.get(scope, "what is the NOTICE period?", [0.0, 1.0, 0.0]) == ({"answer": "30 days"}, 1.0)
+    cached, similarity = cache.get(scope, "How much notice is required?", [0.99, 0.05, 0.0])
+    assert cached == {"answer": "30 days"} and similarity >= 0.95
+
+    # 3. Unrelated question misses
+    assert cache.get(scope, "Who signed it?", [0.0, 1.0, 0.0]) == (None, None)
+
+
+def test_answer_cache_scopes_follow_content_version():
+    """
+    Scenario: The document is re-analyzed (content_version 1 -> 2).
+    Expected: The old answer is not served for the new version.
+    """
+    cache = AnswerCache(redis_client=None)
+    old_scope = document_scope(SimpleNamespace(id=7, content_version=1))
+    new_scope = document_scope(SimpleNamespace(id=7, content_version=2))
+    cache.set(old_scope, "q", [1.0, 0.0], {"answer": "old"})
+
+    assert cache.get(new_scope, "q", [1.0, 0.0]) == (None, None)
+
+    # Global scope changes when the set of documents changes, not their order
+    assert global_scope(1, [(1, 1), (2, 1)]) == global_scope(1, [(2, 1), (1, 1)])
+    assert global_scope(1, [(1, 1), (2, 1)]) != global_scope(1, [(1, 1)])
@@ -0,0 +1,125 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from documents import async_views, llm_utils, retrieval
+from documents.fake_llm import FakeAsyncGroqClient
+from documents.models import Document, DocumentChunk
+
+
+@pytest.fixture
+def chat(settings, tmp_path, monkeypatch):
+    """A user with one completed 3-chunk document, a fake async LLM and a JWT header."""
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.ANSWER_CACHE_ENABLED = False
+
+    user = get_user_model().objects.create_user(username="asyncer", email="as@test.com", password="password123")
+    document = Document.objects.create(
+        title="Contract", file=SimpleUploadedFile("contract.pdf", b"%PDF contract"), owner=user, status='completed'
+    )
+    for index, text in enumerate(["Payment is due in 30 days.", "Late fees are 2%.", "Governing law is Delaware."]):
+        vector = [0.0] * 768
+        vector[0], vector[1] = 1.0, index * 0.1
+        DocumentChunk.objects.create(document=document, chunk_index=index, text_content=text, embedding=vector)
+
+    llm = FakeAsyncGroqClient(reply="Payment is due in 30 days [Page 1].")
+    monkeypatch.setattr(async_views, 'get_query_embedding', lambda question: [1.0] + [0.0] * 767)
+    monkeypatch.setattr(llm_utils, 'async_client', llm)
+    # The test Client runs the async views through async_to_sync, exercising the same code path as ASGI
+    headers = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+    return document, llm, headers
+
+
+@pytest.mark.django_db
+def test_ask_async_answers_like_ask(chat):
+    """
+    Scenario: An authenticated user POSTs a question to the async endpoint.
+    Expected: 200 with the same answer/sources payload as /ask/; the LLM got the nearest chunks.
+    """
+    document, llm, headers = chat
+
+    response = Client().post(
+        f'/api/documents/{document.id}/ask_async/',
+        {"question": "When is payment due?"},
+        content_type='application/json',
+        **headers
+    )
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body['answer'] == "Payment is due in 30 days [Page 1]."
+    assert [source['page'] for source in body['sources']] == [1, 2, 3]
+    assert body['retrieval'] == 'vector' and body['cached'] is False
+    assert "Payment is due in 30 days." in llm.chat.completions.calls[0]['messages'][-1]['content']
+
+
+@pytest.mark.django_db
+def test_ask_async_retrieves_through_the_sync_search_path(chat, monkeypatch):
+    """
+    Scenario: A plain vector question (no rerank) is asked on the async endpoint.
+    Expected: Chunks come from vector_search.search(), which applies ef_search and the filtered-query fallback.
+    """
+    document, llm, headers = chat
+    calls = []
+    original_search = retrieval.search
+
+    def recording_search(queryset, query_vector, limit, **kwargs):
+        calls.append(limit)
+        return original_search(queryset, query_vector, limit, **kwargs)
+
+    monkeypatch.setattr(retrieval, 'search', recording_search)
+
+    response = Client().post(
+        f'/api/documents/{document.id}/ask_async/',
+        {"question": "When is payment due?", "retrieval": "vector"},
+        content_type='application/json',
+        **headers
+    )
+
+    assert response.status_code == 200
+    assert len(calls) == 1
+    assert [source['page'] for source in response.json()['sources']] == [1, 2, 3]
+
+
+@pytest.mark.django_db
+def test_global_ask_async_searches_all_documents(chat):
+    """
+    Scenario: The same user asks across all documents through the async endpoint.
+    Expected: 200 with one searched document and the fake LLM's synthesis.
+    """
+    _, _, headers = chat
+
+    response = Client().post(
+        '/api/documents/global_ask_async/',
+        {"question": "What law governs the contract?"},
+        content_type='application/json',
+        **headers
+    )
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body['documents_searched'] == 1
+    assert body['answer'] == "Payment is due in 30 days [Page 1]."
+
+
+@pytest.mark.django_db
+def test_ask_async_requires_token_and_ownership(chat):
+    """
+    Scenario: A request without a token, then another user's token on this document.
+    Expected: 401, then 404 (documents stay private), and the LLM is never called.
+    """
+    document, llm, _ = chat
+    other = get_user_model().objects.create_user(username="other", email="o@test.com", password="password123")
+    path = f'/api/documents/{document.id}/ask_async/'
+
+    anonymous = Client().post(path, {"question": "Hi?"}, content_type='application/json')
+    foreign = Client().post(
+        path, {"question": "Hi?"}, content_type='application/json',
+        HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(other).access_token}"
+    )
+
+    assert anonymous.status_code == 401
+    assert foreign.status_code == 404
+    assert llm.chat.completions.calls == []
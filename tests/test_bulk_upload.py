@@ -0,0 +1,116 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from kombu.exceptions import OperationalError
+from rest_framework.test import APIClient
+
+from documents import bulk_upload, tasks, views
+from documents.models import AnalysisJob, Document
+from tests.utils import make_pdf
+
+
+@pytest.fixture
+def client(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    User = get_user_model()
+    user = User.objects.create_user(username="onboarding", email="onboarding@test.com", password="password123")
+    client = APIClient()
+    client.force_authenticate(user=user)
+    client.user = user
+    return client
+
+
+def pdf_upload(name, text):
+    return SimpleUploadedFile(name, make_pdf([f"{text} " * 40]), content_type="application/pdf")
+
+
+@pytest.mark.django_db
+def test_bulk_upload_creates_and_analyzes_valid_files_and_reports_bad_ones(client, fake_ai, monkeypatch):
+    """
+    Scenario: Five files in one request: three PDFs, a text file and a file that only claims to be a PDF.
+    Expected: Per-file ids and errors in upload order, one INSERT for the rows, every PDF analyzed.
+    """
+    # 1. Setup: record what the view receives from the upload handlers
+    received = []
+
+    def recording_store_uploads(uploads, owner):
+        received.extend(type(upload) for upload in uploads)
+        return bulk_upload.store_uploads(uploads, owner)
+
+    monkeypatch.setattr(views, 'store_uploads', recording_store_uploads)
+    files = [
+        pdf_upload("lease.pdf", "The tenant pays rent monthly."),
+        SimpleUploadedFile("notes.txt", b"just some notes", content_type="text/plain"),
+        pdf_upload("invoice.pdf", "Invoice total is due in thirty days."),
+        SimpleUploadedFile("fake.pdf", b"not really a pdf", content_type="application/pdf"),
+        pdf_upload("policy.pdf", "Employees accrue leave every month."),
+    ]
+
+    # 2. Upload
+    with CaptureQueriesContext(connection) as queries:
+        response = client.post('/api/documents/bulk_upload/', {"files": files}, format='multipart')
+
+    # 3. Check the response
+    body = response.json()
+    assert response.status_code == 202
+    assert (body["created"], body["failed"]) == (3, 2)
+    assert [result["file"] for result in body["results"]] == [
+        "lease.pdf", "notes.txt", "invoice.pdf", "fake.pdf", "policy.pdf"
+    ]
+    assert body["results"][1]["error"] == "Only PDF files are supported"
+    assert body["results"][3]["error"] == "File is not a valid PDF"
+
+    # 4. Streamed to disk, one INSERT, every document analyzed by the group
+    assert set(received) == {TemporaryUploadedFile}
+    inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "documents_document"')]
+    assert len(inserts) == 1
+    ids = [result["id"] for result in body["results"] if "id" in result]
+    documents = Document.objects.filter(id__in=ids, owner=client.user)
+    assert sorted(documents.values_list('title', flat=True)) == ["invoice", "lease", "policy"]
+    assert set(documents.values_list('status', flat=True)) == {'completed'}
+    assert len(fake_ai["summarized"]) == 3
+
+
+@pytest.mark.django_db
+def test_bulk_upload_keeps_analyses_queued_while_broker_is_down(client, fake_ai, monkeypatch):
+    """
+    Scenario: Two PDFs are uploaded while the Celery broker refuses the analysis tasks; then it recovers.
+    Expected: The upload succeeds with the jobs kept in the queue; the next dispatch analyzes both.
+    """
+    # 1. Broker down: nothing can be published
+    def unreachable(*args, **kwargs):
+        raise OperationalError("Error 111 connecting to redis:6379. Connection refused.")
+
+    with monkeypatch.context() as broker_down:
+        broker_down.setattr(tasks.group, 'apply_async', unreachable)
+        files = [pdf_upload("a.pdf", "First contract."), pdf_upload("b.pdf", "Second contract.")]
+        response = client.post('/api/documents/bulk_upload/', {"files": files}, format='multipart')
+
+    assert response.status_code == 202
+    assert list(AnalysisJob.objects.values_list('state', flat=True)) == ['queued'] * 2
+
+    # 2. Broker back: the periodic dispatch picks the jobs up
+    assert tasks.dispatch_analysis_task() == {"dispatched": 2}
+    assert list(Document.objects.filter(owner=client.user).values_list('status', flat=True)) == ['completed'] * 2
+    assert not AnalysisJob.objects.exists()
+
+
+@pytest.mark.django_db
+def test_bulk_upload_rejects_too_many_or_no_valid_files(client, settings):
+    """
+    Scenario: A request over BULK_UPLOAD_MAX_FILES, then one with only invalid files.
+    Expected: 400 for both, and no document is created.
+    """
+    settings.BULK_UPLOAD_MAX_FILES = 2
+    too_many = [pdf_upload(f"{n}.pdf", "Contract.") for n in range(3)]
+    invalid = [SimpleUploadedFile("empty.pdf", b"", content_type="application/pdf")]
+
+    first = client.post('/api/documents/bulk_upload/', {"files": too_many}, format='multipart')
+    second = client.post('/api/documents/bulk_upload/', {"files": invalid}, format='multipart')
+
+    assert first.status_code == 400
+    assert second.status_code == 400
+    assert second.json()["results"] == [{"file": "empty.pdf", "error": "File is empty"}]
+    assert not Document.objects.exists()
@@ -0,0 +1,29 @@
+from config.celery import EMBED_QUEUE, LLM_QUEUE, app
+from documents import tasks
+
+
+def queue_of(task):
+    return app.amqp.router.route({}, task.name)['queue'].name
+
+
+def test_analysis_tasks_are_routed_by_what_they_wait_on(settings):
+    """
+    Scenario: The analysis canvas's tasks are routed with config/celery.py's task_routes (in-process embedding).
+    Expected: Extraction and embedding go to 'embed', the LLM summary to 'llm', bookkeeping to the default queue.
+    """
+    settings.EMBEDDING_BACKEND = 'local'
+    assert queue_of(tasks.analyze_document_task) == EMBED_QUEUE
+    assert queue_of(tasks.embed_chunks_task) == EMBED_QUEUE
+    assert queue_of(tasks.summarize_document_task) == LLM_QUEUE
+    assert queue_of(tasks.finalize_analysis_task) == app.conf.task_default_queue
+    assert queue_of(tasks.dispatch_analysis_task) == app.conf.task_default_queue
+
+
+def test_embedding_through_the_server_goes_to_the_io_pool(settings):
+    """
+    Scenario: Workers embed through the shared embedding server (EMBEDDING_BACKEND='server').
+    Expected: embed_chunks_task goes to the gevent 'llm' queue; extraction stays on 'embed'.
+    """
+    settings.EMBEDDING_BACKEND = 'server'
+    assert queue_of(tasks.embed_chunks_task) == LLM_QUEUE
+    assert queue_of(tasks.analyze_document_task) == EMBED_QUEUE
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from documents.context_packing import EstimateTokenizer, merge_chunks, pack_context
+from documents.pipeline import sliding_window_chunks
+
+TEXT = " ".join(f"Sentence number {i} of the master services agreement." for i in range(200))
+
+
+def retrieved(indexes, document_id=1):
+    """Real 1000/200 sliding-window chunks, returned in the given (relevance) order."""
+    windows = list(sliding_window_chunks([TEXT]))
+    return [
+        SimpleNamespace(document_id=document_id, chunk_index=i, text_content=windows[i], distance=0.1 * rank)
+        for rank, i in enumerate(indexes)
+    ]
+
+
+def test_adjacent_chunks_merge_without_duplicated_overlap():
+    """
+    Scenario: Chunks 3, 2, 4 and 7 are retrieved; 2-4 are neighbours sharing 200 characters each.
+    Expected: Two spans; the merged one is exactly the original text for pages 3-5, so 400 chars shorter.
+    """
+    chunks = retrieved([3, 2, 4, 7])
+
+    spans = merge_chunks(chunks)
+
+    assert [span.pages for span in spans] == ["Pages 3-5", "Page 8"]
+    assert spans[0].text_content == TEXT[2 * 800:4 * 800 + 1000]
+    assert sum(len(span.text_content) for span in spans) == sum(len(c.text_content) for c in chunks) - 400
+    assert spans[0].distance == 0.0
+
+
+def test_same_index_in_different_documents_is_not_merged():
+    """
+    Scenario: global_ask retrieves chunk 0 of one document and chunk 1 of another.
+    Expected: Two separate spans, most relevant first.
+    """
+    chunks = retrieved([1], document_id=2) + retrieved([0], document_id=1)
+
+    spans = merge_chunks(chunks)
+
+    assert [(span.document_id, span.chunk_index) for span in spans] == [(2, 1), (1, 0)]
+
+
+def test_pack_context_keeps_most_relevant_spans_within_budget():
+    """
+    Scenario: A 270-token budget; the best span needs 250 tokens, the next 250, a short one 20.
+    Expected: The best and the short span are sent; a lone oversized span is truncated to the budget.
+    """
+    tokenizer = EstimateTokenizer()
+    chunks = [
+        SimpleNamespace(document_id=1, chunk_index=0, text_content="a" * 1000, distance=0.1),
+        SimpleNamespace(document_id=1, chunk_index=5, text_content="b" * 1000, distance=0.2),
+        SimpleNamespace(document_id=1, chunk_index=9, text_content="c" * 80, distance=0.3),
+    ]
+
+    packed = pack_context(chunks, budget=270, tokenizer=tokenizer)
+    truncated = pack_context(chunks[:1], budget=100, tokenizer=tokenizer)
+
+    assert [span.chunk_index for span in packed] == [0, 9]
+    assert tokenizer.count(truncated[0].text_content) == 100
@@ -1,16 +1,20 @@
+import os
+
 import pytest
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from documents.models import Document
 
 @pytest.mark.django_db
-def test_upload_document_api():
+def test_upload_document_api(settings, tmp_path):
     """
     Scenario: A logged-in user uploads a PDF.
     Expected: API returns 201 Created, and Document exists in DB.
     """
     # 1. Setup User and Client
+    settings.MEDIA_ROOT = str(tmp_path)
     User = get_user_model()
     user = User.objects.create_user(username="amr_test", email="amr@test.com", password="password123")
     
@@ -36,4 +40,100 @@ def test_upload_document_api():
     assert response.status_code == 201
     assert Document.objects.count() == 1
     assert Document.objects.first().title == "My Important Doc"
-    assert Document.objects.first().owner == user
\ No newline at end of file
+    assert Document.objects.first().owner == user
+
+@pytest.mark.django_db
+def test_identical_uploads_share_one_file_but_stay_private(settings, tmp_path):
+    """
+    Scenario: Two users upload byte-identical PDFs under different names.
+    Expected: The bytes are stored once, yet each user only sees their own document.
+    """
+    # 1. Setup two users
+    settings.MEDIA_ROOT = str(tmp_path)
+    User = get_user_model()
+    alice = User.objects.create_user(username="alice", email="alice@test.com", password="password123")
+    bob = User.objects.create_user(username="bob", email="bob@test.com", password="password123")
+    content = b"%PDF-1.4 identical policy handbook"
+
+    # 2. Both upload the same bytes
+    for user, filename in ((alice, "policy.pdf"), (bob, "handbook_v2.pdf")):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.post(
+            '/api/documents/',
+            {"title": filename, "file": SimpleUploadedFile(filename, content, content_type="application/pdf")},
+            format='multipart'
+        )
+        assert response.status_code == 201
+
+    # 3. One file on disk, two private documents
+    alice_doc = Document.objects.get(owner=alice)
+    bob_doc = Document.objects.get(owner=bob)
+    assert alice_doc.file.name == bob_doc.file.name
+    assert len([path for path in tmp_path.rglob('*') if path.is_file()]) == 1
+
+    client = APIClient()
+    client.force_authenticate(user=bob)
+    listed = client.get('/api/documents/').json()
+    results = listed['results'] if isinstance(listed, dict) else listed
+    assert [doc['id'] for doc in results] == [bob_doc.id]
+    assert client.get(f'/api/documents/{alice_doc.id}/').status_code == 404
+
+
+def test_identical_uploads_racing_past_exists_share_one_file(settings, tmp_path, monkeypatch):
+    """
+    Scenario: A second upload of the same bytes checked exists() just before the first one finished writing.
+    Expected: It still gets the hash path (no suffixed second copy); one complete file is left, no temporaries.
+    """
+    settings.MEDIA_ROOT = str(tmp_path)
+    storage = Document.file.field.storage
+    first = storage.save("pdfs/a.pdf", SimpleUploadedFile("a.pdf", b"%PDF same bytes"))
+
+    # The second upload's own exists() check misses; later checks see the file
+    real_exists, checks = storage.exists, []
+
+    def racing_exists(name):
+        checks.append(name)
+        return False if len(checks) == 1 else real_exists(name)
+
+    monkeypatch.setattr(storage, 'exists', racing_exists)
+    second = storage.save("pdfs/b.pdf", SimpleUploadedFile("b.pdf", b"%PDF same bytes"))
+
+    assert second == first
+    directory = os.path.dirname(storage.path(first))
+    assert os.listdir(directory) == [os.path.basename(first)]
+    with storage.open(first) as f:
+        assert f.read() == b"%PDF same bytes"
+
+
+@pytest.mark.django_db
+def test_gc_files_deletes_only_unreferenced_files_past_the_grace_period(settings, tmp_path, capsys):
+    """
+    Scenario: Two of three stored files lose their last Document; one of them was just reused by an upload.
+    Expected: gc_files keeps the referenced file and the fresh one, deletes the other; --dry-run deletes nothing.
+    """
+    # 1. Three files, each uploaded once
+    settings.MEDIA_ROOT = str(tmp_path)
+    user = get_user_model().objects.create_user(username="gc", email="gc@test.com", password="password123")
+    kept, orphan, fresh = (
+        Document.objects.create(title=name, file=SimpleUploadedFile(f"{name}.pdf", f"%PDF {name}".encode()), owner=user)
+        for name in ("kept", "orphan", "fresh")
+    )
+    for document in (orphan, fresh):
+        document.delete()
+    old = 1_000_000_000  # 2001: well past any grace period
+    for document in (kept, orphan, fresh):
+        os.utime(document.file.path, (old, old))
+
+    # 2. Someone uploads the fresh file's bytes again (its row is not saved yet)
+    Document.file.field.storage.save("pdfs/again.pdf", SimpleUploadedFile("again.pdf", b"%PDF fresh"))
+
+    # 3. Dry run, then for real
+    call_command('gc_files', dry_run=True)
+    assert os.path.exists(orphan.file.path)
+    assert "Would delete 1 of 3 files" in capsys.readouterr().out
+
+    call_command('gc_files')
+    assert os.path.exists(kept.file.path)
+    assert os.path.exists(fresh.file.path)
+    assert not os.path.exists(orphan.file.path)
@@ -0,0 +1,51 @@
+import time
+from documents import embedding_cache
+from documents.caching import LRUCache
+
+
+def test_lru_cache_evicts_oldest_and_expires():
+    """
+    Scenario: A 2-entry LRU receives 3 keys, and a 0.05s TTL cache is read after expiry.
+    Expected: The least recently used key is evicted, and expired entries are gone.
+    """
+    # 1. Size limit
+    cache = LRUCache(max_size=2, ttl=None)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "a" is now most recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    # 2. TTL
+    short = LRUCache(max_size=10, ttl=0.05)
+    short.set("k", "v")
+    time.sleep(0.06)
+    assert short.get("k") is None
+
+
+def test_query_embedding_cache_hits_on_normalized_question(monkeypatch):
+    """
+    Scenario: The same question is asked twice with different case/spacing.
+    Expected: The model runs once, and the second lookup is an L1 hit.
+    """
+    # 1. Count model calls
+    calls = []
+
+    def fake_get_embedding(text):
+        calls.append(text)
+        return [0.5] * 768
+
+    monkeypatch.setattr(embedding_cache, 'get_embedding', fake_get_embedding)
+    cache = embedding_cache.QueryEmbeddingCache(max_size=10, ttl=60, redis_client=None)
+
+    # 2. Ask twice
+    first = cache.get_embedding("What is the  notice period?")
+    second = cache.get_embedding("what is the notice period?")
+
+    # 3. One encode, one hit
+    assert first == second
+    assert calls == ["what is the notice period?"]
+    stats = cache.stats()
+    assert stats['l1_hits'] == 1 and stats['misses'] == 1
+    assert stats['hit_rate'] == 0.5
@@ -0,0 +1,48 @@
+import threading
+import pytest
+from documents.embedding_server import MicroBatcher
+
+
+def test_micro_batcher_merges_concurrent_requests():
+    """
+    Scenario: 8 threads each submit one text at the same time.
+    Expected: Every caller gets its own vector back, from fewer forward passes than callers.
+    """
+    # 1. Encoder that records each batch it sees
+    batches = []
+    gate = threading.Event()
+
+    def encode(texts):
+        gate.wait(timeout=1)  # Hold the first batch so the rest pile up
+        batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    batcher = MicroBatcher(encode, max_batch_size=64, max_wait_ms=50)
+
+    # 2. Fire concurrent requests
+    texts = ["x" * n for n in range(1, 9)]
+    futures = [batcher.submit([text]) for text in texts]
+    gate.set()
+    results = [future.result(timeout=5) for future in futures]
+    batcher.stop()
+
+    # 3. Each caller got its own answer, and batching happened
+    assert results == [[[float(n)]] for n in range(1, 9)]
+    assert len(batches) < len(texts)
+    assert sum(len(batch) for batch in batches) == len(texts)
+
+
+def test_micro_batcher_propagates_errors():
+    """
+    Scenario: The model raises while encoding.
+    Expected: The caller's future raises the same error instead of hanging.
+    """
+    def encode(texts):
+        raise RuntimeError("model exploded")
+
+    batcher = MicroBatcher(encode, max_batch_size=4, max_wait_ms=1)
+    future = batcher.submit(["hello"])
+
+    with pytest.raises(RuntimeError, match="model exploded"):
+        future.result(timeout=5)
+    batcher.stop()
@@ -0,0 +1,76 @@
+import numpy as np
+from documents import embeddings
+
+
+class FakeModel:
+    """Stands in for SentenceTransformer so tests don't download 400MB."""
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        if isinstance(sentences, str):
+            return np.full(768, len(sentences), dtype=np.float32)
+        self.batches.append(list(sentences))
+        return np.array([np.full(768, len(s), dtype=np.float32) for s in sentences])
+
+
+def test_get_embeddings_batches_and_keeps_order(monkeypatch):
+    """
+    Scenario: 5 texts (one empty) are embedded with batch_size=2.
+    Expected: The model sees 2 batches of non-empty texts, and vectors come back in input order.
+    """
+    # 1. Swap in the fake model
+    fake = FakeModel()
+    monkeypatch.setattr(embeddings, '_model', fake)
+
+    # 2. Embed a mixed list
+    texts = ["a", "bb", "", "dddd", "eeeee"]
+    vectors = embeddings.get_embeddings(texts, batch_size=2)
+
+    # 3. Check batching and ordering
+    assert fake.batches == [["a", "bb"], ["dddd", "eeeee"]]
+    assert [v[0] for v in vectors] == [1.0, 2.0, 0.0, 4.0, 5.0]
+    assert all(len(v) == 768 for v in vectors)
+
+
+def test_get_embeddings_matches_single_calls(monkeypatch):
+    """
+    Scenario: The batch API and the single-text API embed the same text.
+    Expected: Both return the same vector.
+    """
+    monkeypatch.setattr(embeddings, '_model', FakeModel())
+
+    assert embeddings.get_embeddings(["hello"]) == [embeddings.get_embedding("hello")]
+    assert embeddings.get_embeddings([]) == []
+
+
+def test_onnx_backend_mean_pools_and_normalizes():
+    """
+    Scenario: The ONNX session returns token embeddings for a padded batch.
+    Expected: Padding tokens are ignored and each vector has unit length (like SentenceTransformer).
+    """
+    # 1. Fake tokenizer/session: second text has one padding token
+    class FakeTokenizer:
+        def __call__(self, texts, **kwargs):
+            return {
+                'input_ids': np.array([[1, 2], [3, 0]]),
+                'attention_mask': np.array([[1, 1], [1, 0]]),
+            }
+
+    class FakeSession:
+        def run(self, output_names, inputs):
+            return [np.array([
+                [[3.0, 0.0], [3.0, 0.0]],
+                [[0.0, 4.0], [100.0, 100.0]],  # Padding token must not leak in
+            ])]
+
+    backend = embeddings.OnnxBackend(quantized=True)
+    backend._tokenizer = FakeTokenizer()
+    backend._session = FakeSession()
+
+    # 2. Encode
+    vectors = backend.encode(["first", "second"], batch_size=2)
+
+    # 3. Mean-pooled over real tokens, then L2-normalized
+    assert np.allclose(vectors, [[1.0, 0.0], [0.0, 1.0]])
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+from documents import extractors
+from documents.ai_engine import AIEngine
+from documents.extractors import FitzExtractor, ParallelFitzExtractor, get_extractor
+from tests.utils import make_pdf
+
+
+def test_parallel_extraction_matches_sequential_order(tmp_path):
+    """
+    Scenario: A 23-page PDF is split into 3-page ranges across 2 worker processes.
+    Expected: Page texts come back in the same order as a sequential read.
+    """
+    # 1. Build a PDF where every page says which page it is
+    path = tmp_path / "long.pdf"
+    path.write_bytes(make_pdf([f"This is page number {n}." for n in range(23)]))
+
+    # 2. Extract both ways
+    sequential = list(FitzExtractor().iter_pages(str(path)))
+    parallel = list(ParallelFitzExtractor(workers=2, min_pages=0, pages_per_task=3).iter_pages(str(path)))
+
+    # 3. Same pages, same order
+    assert len(parallel) == 23
+    assert parallel == sequential
+    assert "page number 22" in parallel[-1]
+
+
+def test_parallel_extraction_reads_sequentially_in_a_daemonic_worker(tmp_path, monkeypatch):
+    """
+    Scenario: The parallel extractor runs in a daemonic process, like a Celery prefork child.
+    Expected: No process pool is started; the pages come back from a sequential read.
+    """
+    path = tmp_path / "long.pdf"
+    path.write_bytes(make_pdf([f"This is page number {n}." for n in range(5)]))
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("daemonic processes are not allowed to have children")
+
+    monkeypatch.setattr(extractors.multiprocessing, 'current_process', lambda: SimpleNamespace(daemon=True))
+    monkeypatch.setattr(extractors, 'ProcessPoolExecutor', no_pool)
+
+    pages = list(ParallelFitzExtractor(workers=2, min_pages=0, pages_per_task=2).iter_pages(str(path)))
+
+    assert pages == list(FitzExtractor().iter_pages(str(path)))
+
+
+def test_pypdf2_extractor_backs_ai_engine(tmp_path):
+    """
+    Scenario: AIEngine.extract_text reads a 2-page PDF.
+    Expected: It uses the PyPDF2 extractor and returns both pages' text.
+    """
+    path = tmp_path / "short.pdf"
+    path.write_bytes(make_pdf(["Invoice for March.", "Total due: 120 USD."]))
+
+    text = AIEngine.extract_text(str(path))
+
+    assert text == get_extractor('pypdf2').extract_text(str(path))
+    assert "Invoice for March." in text and "Total due" in text
@@ -0,0 +1,132 @@
+import time
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+
+from documents import llm_client, llm_utils, views
+from documents.answer_cache import AnswerCache
+from documents.fake_llm import FakeLLMServer
+from documents.llm_client import CircuitBreaker, LLMUnavailable, build_client, complete
+from documents.models import Document, DocumentChunk
+
+MESSAGES = [{"role": "user", "content": "Hello?"}]
+
+
+@pytest.fixture
+def resilience(settings, monkeypatch):
+    """Fast retry settings and a fresh circuit breaker for every test."""
+    settings.LLM_TIMEOUT = 0.3
+    settings.LLM_MAX_RETRIES = 2
+    settings.LLM_RETRY_BASE_DELAY = 0.01
+    settings.LLM_RETRY_MAX_DELAY = 1.0
+    settings.LLM_BREAKER_THRESHOLD = 3
+    settings.LLM_BREAKER_RESET = 30
+    monkeypatch.setattr(llm_client, '_breaker', None)
+    return settings
+
+
+def test_retries_429_after_retry_after(resilience):
+    """
+    Scenario: The provider answers 429 with Retry-After: 0.2, then succeeds.
+    Expected: The answer comes back on the second request, after waiting at least 0.2s.
+    """
+    with FakeLLMServer(script=[429, 'ok'], reply="Recovered.", retry_after=0.2) as server:
+        start = time.perf_counter()
+        answer = complete(build_client("test-key", server.url), MESSAGES, model="fake")
+
+    assert answer == "Recovered."
+    assert server.requests == 2
+    assert time.perf_counter() - start >= 0.2
+
+
+def test_hung_provider_times_out_instead_of_blocking(resilience):
+    """
+    Scenario: Every request hangs for 5 seconds; the read timeout is 0.3s with 2 retries.
+    Expected: LLMUnavailable after 3 attempts, well before the provider would have answered.
+    """
+    with FakeLLMServer(script=['hang'], hang_seconds=5) as server:
+        start = time.perf_counter()
+        with pytest.raises(LLMUnavailable):
+            complete(build_client("test-key", server.url), MESSAGES, model="fake")
+        elapsed = time.perf_counter() - start
+
+    assert server.requests == 3
+    assert elapsed < 3
+
+
+def test_long_retry_after_gives_up_immediately(resilience):
+    """
+    Scenario: A 429 asks the client to come back in 60 seconds.
+    Expected: No retry; LLMUnavailable carries the provider's Retry-After for the 503.
+    """
+    with FakeLLMServer(script=[429], retry_after=60) as server:
+        with pytest.raises(LLMUnavailable) as error:
+            complete(build_client("test-key", server.url), MESSAGES, model="fake")
+
+    assert server.requests == 1
+    assert error.value.retry_after == 60
+
+
+def test_circuit_breaker_fails_fast_then_recovers(resilience, monkeypatch):
+    """
+    Scenario: The provider returns 503s until the breaker opens, then recovers.
+    Expected: While open, calls fail without a request; after the reset period one trial closes it.
+    """
+    now = [0.0]
+    breaker = CircuitBreaker(threshold=3, reset_timeout=30, clock=lambda: now[0])
+    monkeypatch.setattr(llm_client, '_breaker', breaker)
+
+    with FakeLLMServer(script=[503, 503, 503, 'ok'], reply="Back.", retry_after=0) as server:
+        client = build_client("test-key", server.url)
+
+        # 1. Three failed attempts (1 call + 2 retries) open the breaker
+        with pytest.raises(LLMUnavailable):
+            complete(client, MESSAGES, model="fake")
+        assert breaker.state == 'open' and server.requests == 3
+
+        # 2. Open: fail fast, the provider is not contacted
+        with pytest.raises(LLMUnavailable):
+            complete(client, MESSAGES, model="fake")
+        assert server.requests == 3
+
+        # 3. After the reset period the trial call succeeds and closes it
+        now[0] = 31
+        assert complete(client, MESSAGES, model="fake") == "Back."
+        assert breaker.state == 'closed'
+
+
+@pytest.mark.django_db
+def test_ask_returns_503_and_caches_nothing_when_llm_is_down(resilience, monkeypatch, tmp_path):
+    """
+    Scenario: A question is asked while the provider returns 500s, then again after it recovers.
+    Expected: First a 503 with Retry-After (not an error string as the answer), then a real, uncached answer.
+    """
+    resilience.MEDIA_ROOT = str(tmp_path)
+    user = get_user_model().objects.create_user(username="resilient", email="re@test.com", password="password123")
+    document = Document.objects.create(
+        title="Lease", file=SimpleUploadedFile("lease.pdf", b"%PDF lease"), owner=user, status='completed'
+    )
+    DocumentChunk.objects.create(
+        document=document, chunk_index=0, embedding=[1.0] + [0.0] * 767,
+        text_content="The notice period for termination of this lease is thirty days."
+    )
+    answer_cache = AnswerCache(redis_client=None)
+    monkeypatch.setattr(views, 'get_query_embedding', lambda question: [1.0] + [0.0] * 767)
+    monkeypatch.setattr(views, 'get_answer_cache', lambda: answer_cache)
+    api = APIClient()
+    api.force_authenticate(user=user)
+
+    with FakeLLMServer(script=[500, 500, 500, 'ok'], reply="Thirty days.", retry_after=0) as server:
+        monkeypatch.setattr(llm_utils, 'client', build_client("test-key", server.url))
+        down = api.post(f'/api/documents/{document.id}/ask/', {"question": "What is the notice period?"},
+                        format='json')
+        monkeypatch.setattr(llm_client, '_breaker', None)  # Provider is back
+        up = api.post(f'/api/documents/{document.id}/ask/', {"question": "What is the notice period?"},
+                      format='json')
+
+    assert down.status_code == 503
+    assert 'answer' not in down.json() and down['Retry-After']
+    assert up.status_code == 200
+    assert up.json()['answer'] == "Thirty days." and up.json()['cached'] is False
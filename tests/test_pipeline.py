@@ -0,0 +1,72 @@
+import random
+from documents.pipeline import sliding_window_chunks, strip_stream, Spool, TextStats, batched
+
+
+def old_chunks(text, chunk_size=1000, overlap=200):
+    """The original full-text sliding window from analyze_document_task."""
+    chunks = []
+    for i in range(0, len(text), chunk_size - overlap):
+        chunk = text[i:i + chunk_size]
+        if len(chunk.strip()) > 50:
+            chunks.append(chunk)
+    return chunks
+
+
+def random_pages(seed, count):
+    rng = random.Random(seed)
+    words = ["contract", "tenant", "notice", "clause", "7.3", "", "\n", "  "]
+    return [
+        " ".join(rng.choice(words) for _ in range(rng.randint(0, 400))) + "\n"
+        for _ in range(count)
+    ]
+
+
+def test_streaming_chunks_match_full_text_algorithm():
+    """
+    Scenario: Random pages (some empty, some whitespace-only) go through the streaming pipeline.
+    Expected: Chunks, char count, word count and summary prefix match the old full_text approach.
+    """
+    for seed in range(20):
+        pages = ["\n  \n"] + random_pages(seed, 30) + ["   \n"]
+        full_text = "".join(pages).strip()
+
+        # 1. Streaming pipeline
+        stats = TextStats(prefix_chars=3000)
+        chunks = list(sliding_window_chunks(stats.track(strip_stream(pages))))
+
+        # 2. Same output as building full_text first
+        assert chunks == old_chunks(full_text)
+        assert stats.char_count == len(full_text)
+        assert stats.word_count == len(full_text.split())
+        assert stats.prefix == full_text[:3000]
+
+        # 3. Pieces cut mid-word (page boundaries don't always fall on whitespace)
+        rng = random.Random(seed)
+        cuts = sorted(rng.sample(range(1, len(full_text)), 25))
+        pieces = [full_text[a:b] for a, b in zip([0] + cuts, cuts + [len(full_text)])]
+        stats = TextStats()
+        assert list(sliding_window_chunks(stats.track(strip_stream(pieces)))) == old_chunks(full_text)
+        assert stats.word_count == len(full_text.split())
+
+
+def test_batched_splits_into_fixed_size_lists():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(batched([], 3)) == []
+
+
+def test_spool_replays_items_in_order():
+    """
+    Scenario: A generator of (text, hash) pairs is drained into a Spool.
+    Expected: The generator is exhausted up front; iterating gives the same items, in order, every time.
+    """
+    produced = []
+
+    def items():
+        for index in range(5):
+            produced.append(index)
+            yield [f"chunk {index}", f"hash {index}"]
+
+    with Spool(items()) as spool:
+        assert produced == [0, 1, 2, 3, 4] and spool.count == 5
+        assert list(spool) == [[f"chunk {index}", f"hash {index}"] for index in range(5)]
+        assert list(spool) == list(spool)
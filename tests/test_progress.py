@@ -0,0 +1,179 @@
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from documents import progress, tasks
+from documents.models import Document
+
+PAGE_TEXT = "The contractor maintains insurance for the duration of the works. " * 20
+
+
+def parse_sse(body):
+    """[(id, event)] of an SSE body (keep-alive comments kept as (None, 'keepalive'))."""
+    events = []
+    for frame in body.strip().split("\n\n"):
+        if frame.startswith(":"):
+            events.append((None, "keepalive"))
+            continue
+        fields = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((int(fields["id"]) if "id" in fields else None, fields["event"]))
+    return events
+
+
+async def read_stream(document, after_first_frame=None, headers=None):
+    token = await sync_to_async(lambda: str(RefreshToken.for_user(document.owner).access_token))()
+    response = await AsyncClient().get(
+        f'/api/documents/{document.id}/progress/',
+        headers={"Accept": "text/event-stream", "Authorization": f"Bearer {token}", **(headers or {})},
+    )
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'text/event-stream'
+
+    frames = []
+    async for frame in response.streaming_content:
+        frames.append(frame)
+        if len(frames) == 1 and after_first_frame is not None:
+            await sync_to_async(after_first_frame)()
+    return b''.join(frames).decode()
+
+
+def stream(document, after_first_frame=None, headers=None):
+    """The whole SSE body of the async progress endpoint; `after_first_frame()` runs once the stream is open."""
+    return async_to_sync(read_stream)(document, after_first_frame, headers)
+
+
+@pytest.mark.django_db
+def test_analysis_publishes_progress_in_order(fake_ai, make_document, settings):
+    """
+    Scenario: A 10-page PDF is analyzed with small embedding shards.
+    Expected: started, page counts up to 10, chunks saved, embedded counts up to the total, summary, completed.
+    """
+    # 1. Setup
+    settings.EMBEDDING_SHARD_SIZE = 4
+    settings.EMBEDDING_BATCH_SIZE = 2
+    document = make_document([f"Page {n}. {PAGE_TEXT}" for n in range(10)])
+
+    # 2. Analyze
+    tasks.analyze_document_task(document.id)
+
+    # 3. Check the replay buffer
+    events = progress.get_broker().replay(document.id)
+    names = [event["event"] for event in events]
+    embedded = [event["data"] for event in events if event["event"] == "chunks_embedded"]
+    pages = [event["data"]["pages"] for event in events if event["event"] == "pages_extracted"]
+    chunks_saved = next(event["data"] for event in events if event["event"] == "chunks_saved")
+
+    assert names[0] == "started" and names[-1] == "completed"
+    assert names.index("chunks_saved") > names.index("pages_extracted")
+    assert names.index("summary_started") < names.index("summary_finished")
+    assert pages == list(range(1, 11))
+    counts = [item["embedded"] for item in embedded]
+    assert counts == sorted(counts) and len(counts) > 4
+    assert counts[-1] == chunks_saved["to_embed"] == chunks_saved["chunks"]
+    assert {item["total"] for item in embedded} == {chunks_saved["to_embed"]}
+    assert [event["id"] for event in events] == sorted(event["id"] for event in events)
+
+
+@pytest.mark.django_db
+def test_embedded_count_is_published_only_after_vectors_are_saved(fake_ai, make_document, settings, monkeypatch):
+    """
+    Scenario: Every chunks_embedded event checks, as it is published, how many vectors the database holds.
+    Expected: The published count never runs ahead of the saved vectors.
+    """
+    settings.EMBEDDING_SHARD_SIZE = 4
+    settings.EMBEDDING_BATCH_SIZE = 2
+    document = make_document([f"Page {n}. {PAGE_TEXT}" for n in range(6)])
+    observed = []
+    publish_embedded = progress.chunks_embedded
+
+    def checking_chunks_embedded(document_id, count, total):
+        publish_embedded(document_id, count, total)
+        published = progress.get_broker().replay(document_id)[-1]["data"]["embedded"]
+        observed.append((published, document.chunks.filter(embedding__isnull=False).count()))
+
+    monkeypatch.setattr(progress, 'chunks_embedded', checking_chunks_embedded)
+
+    tasks.analyze_document_task(document.id)
+
+    assert len(observed) > 2
+    assert all(published <= saved for published, saved in observed)
+
+
+@pytest.mark.django_db
+def test_late_subscriber_gets_the_replay_and_can_resume(fake_ai, make_document):
+    """
+    Scenario: A client connects after the analysis finished, then reconnects with Last-Event-ID.
+    Expected: The first stream replays every event and ends at 'completed'; the second only what came after.
+    """
+    document = make_document([f"Page {n}. {PAGE_TEXT}" for n in range(3)])
+    tasks.analyze_document_task(document.id)
+
+    replayed = parse_sse(stream(document))
+    resume_after = replayed[2][0]
+    resumed = parse_sse(stream(document, headers={"Last-Event-ID": str(resume_after)}))
+
+    assert [name for _, name in replayed] == [event["event"] for event in progress.get_broker().replay(document.id)]
+    assert replayed[-1][1] == "completed"
+    assert resumed == replayed[3:]
+
+
+@pytest.mark.django_db
+def test_live_stream_relays_new_events_and_skips_a_previous_run(fake_ai, make_document, settings):
+    """
+    Scenario: A document finished once and is being re-analyzed; a client connects before the new run starts.
+    Expected: The old run's events are not replayed; the new ones arrive live, with keep-alives, until 'completed'.
+    """
+    # 1. Setup: the previous run's events are still buffered
+    settings.PROGRESS_KEEPALIVE = 0.05
+    document = make_document([PAGE_TEXT])
+    progress.publish(document.id, 'started', page_count=1)
+    progress.publish(document.id, 'completed', status='completed')
+    Document.objects.filter(id=document.id).update(status='processing')
+
+    # 2. The new run starts once the client is connected (its first frame is a keep-alive)
+    def new_run():
+        progress.start(document.id, page_count=1)
+        progress.publish(document.id, 'pages_extracted', pages=1, total=1)
+        progress.publish(document.id, 'completed', status='completed')
+
+    # 3. Connect and read until the stream ends
+    events = [name for _, name in parse_sse(stream(document, after_first_frame=new_run))]
+
+    # 4. Check
+    assert events[0] == "keepalive"
+    assert [name for name in events if name != "keepalive"] == ["started", "pages_extracted", "completed"]
+
+
+@pytest.mark.django_db
+def test_stream_of_an_old_analysis_is_just_its_final_state(fake_ai, make_document):
+    """
+    Scenario: A client follows a document whose analysis failed long ago (its events expired).
+    Expected: A single 'failed' event with the error, then the stream ends.
+    """
+    document = make_document([PAGE_TEXT])
+    Document.objects.filter(id=document.id).update(status='failed', analysis_result={"error": "No text"})
+
+    body = stream(document)
+
+    assert body == 'id: 0\nevent: failed\ndata: {"error": "No text"}\n\n'
+
+
+@pytest.mark.django_db
+def test_progress_stream_requires_a_token_and_ownership(fake_ai, make_document):
+    """
+    Scenario: The async progress endpoint is opened without a token, and by a user who doesn't own the document.
+    Expected: 401, then 404; neither opens a stream.
+    """
+    document = make_document([PAGE_TEXT])
+    stranger = get_user_model().objects.create_user(username="stranger", email="s@test.com", password="password123")
+    url = f'/api/documents/{document.id}/progress/'
+
+    anonymous = async_to_sync(AsyncClient().get)(url)
+    foreign = async_to_sync(AsyncClient().get)(
+        url, headers={"Authorization": f"Bearer {RefreshToken.for_user(stranger).access_token}"}
+    )
+
+    assert anonymous.status_code == 401
+    assert foreign.status_code == 404
@@ -0,0 +1,111 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+
+from documents import llm_utils, reranking, views
+from documents.fake_llm import FakeGroqClient
+from documents.models import Document, DocumentChunk
+from documents.reranking import StubReranker, rerank
+
+
+def make_chunks(*texts):
+    return [SimpleNamespace(chunk_index=index, text_content=text) for index, text in enumerate(texts)]
+
+
+CANDIDATES = (
+    "Office hours are nine to five.",
+    "The parking garage closes at midnight.",
+    "The notice period for termination is thirty days.",
+    "Termination requires written notice to the landlord.",
+)
+
+
+def test_rerank_keeps_best_k_by_score():
+    """
+    Scenario: Four retrieved chunks, the two relevant ones ranked last by vector search.
+    Expected: One scoring call for all candidates; the relevant chunks come back first.
+    """
+    reranker = StubReranker()
+
+    chunks, reranked = rerank("what is the notice period for termination", make_chunks(*CANDIDATES), top_k=2,
+                              budget_ms=1000, reranker=reranker)
+
+    assert reranked is True
+    assert [chunk.chunk_index for chunk in chunks] == [2, 3]
+    assert reranker.calls == [4]
+
+
+def test_rerank_over_budget_falls_back_to_retrieval_order():
+    """
+    Scenario: The cross-encoder takes 300ms but the request allows 20ms.
+    Expected: The request stops waiting at the budget and keeps the vector order.
+    """
+    start = time.perf_counter()
+    chunks, reranked = rerank("notice period", make_chunks(*CANDIDATES), top_k=2,
+                              budget_ms=20, reranker=StubReranker(delay_ms=300))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    assert reranked is False
+    assert [chunk.chunk_index for chunk in chunks] == [0, 1]
+    assert elapsed_ms < 200
+
+
+def test_rerank_error_falls_back_to_retrieval_order():
+    """
+    Scenario: The reranker raises (e.g. the model failed to load).
+    Expected: No exception reaches the caller; the first k chunks are returned unchanged.
+    """
+    class BrokenReranker(StubReranker):
+        def score(self, question, texts):
+            raise RuntimeError("model missing")
+
+    chunks, reranked = rerank("notice", make_chunks(*CANDIDATES), top_k=3, budget_ms=1000, reranker=BrokenReranker())
+
+    assert reranked is False
+    assert [chunk.chunk_index for chunk in chunks] == [0, 1, 2]
+
+
+@pytest.mark.django_db
+def test_ask_with_rerank_sends_reranked_context(monkeypatch, settings, tmp_path):
+    """
+    Scenario: A user asks with {"rerank": true}; vector order puts the answer in 4th place.
+    Expected: The 4 candidates are reranked and the relevant chunk is the first source.
+    """
+    # 1. Setup: stub reranker, document whose chunk vectors rank the answer last
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.ANSWER_CACHE_ENABLED = False
+    settings.RERANKER = 'stub'
+    settings.RERANK_CANDIDATES = 4
+    monkeypatch.setattr(reranking, '_reranker', None)
+
+    user = get_user_model().objects.create_user(username="reranker", email="rr@test.com", password="password123")
+    document = Document.objects.create(
+        title="Lease", file=SimpleUploadedFile("lease.pdf", b"%PDF lease"), owner=user, status='completed'
+    )
+    for index, text in enumerate(CANDIDATES):
+        vector = [0.0] * 768
+        vector[0], vector[1] = 1.0, index * 0.1  # Distance grows with the index
+        DocumentChunk.objects.create(document=document, chunk_index=index, text_content=text, embedding=vector)
+
+    monkeypatch.setattr(views, 'get_query_embedding', lambda question: [1.0] + [0.0] * 767)
+    monkeypatch.setattr(llm_utils, 'client', FakeGroqClient(reply="Thirty days."))
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    # 2. Ask with reranking
+    response = client.post(
+        f'/api/documents/{document.id}/ask/',
+        {"question": "What is the notice period for termination?", "rerank": True},
+        format='json'
+    )
+
+    # 3. The reranked order reached the response
+    body = response.json()
+    assert response.status_code == 200
+    assert body['reranked'] is True
+    assert body['sources'][0]['page'] == 3
+    assert len(body['sources']) == 3
@@ -0,0 +1,172 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from rest_framework.test import APIClient
+
+from documents import views
+from documents.models import Document, DocumentChunk
+from documents.retrieval import keyword_query, keyword_terms, reciprocal_rank_fusion, retrieve_chunks
+from documents.vector_search import exact_nearest
+
+
+def basis(*weights):
+    """768-d vector with the given leading components."""
+    return list(weights) + [0.0] * (768 - len(weights))
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    """
+    Scenario: Two rankings share one item near the top of both.
+    Expected: The shared item wins; items in only one list follow by rank.
+    """
+    fused = reciprocal_rank_fusion([[1, 2, 3], [4, 2, 5]], k=60)
+
+    assert fused[0] == 2
+    assert fused[1:3] == [1, 4]
+    assert set(fused) == {1, 2, 3, 4, 5}
+
+
+def test_keyword_query_keeps_identifiers_whole():
+    """
+    Scenario: A question mentions a clause number and a product code.
+    Expected: They survive tokenization as single terms; punctuation-only input gives no query.
+    """
+    terms = keyword_terms("What does clause 14.2 say about SKU-4471?")
+
+    assert terms == ["what", "does", "clause", "14.2", "say", "about", "sku-4471"]
+    assert keyword_query("?!") is None
+
+
+@pytest.fixture
+def catalog(settings, tmp_path):
+    """One completed document whose chunk 3 is the only one naming SKU-4471."""
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.RETRIEVAL_CANDIDATES = 10
+    user = get_user_model().objects.create_user(username="retriever", email="r@test.com", password="password123")
+    document = Document.objects.create(
+        title="Catalog",
+        file=SimpleUploadedFile("catalog.pdf", b"%PDF catalog"),
+        owner=user,
+        status='completed'
+    )
+    texts = [
+        "Warranty terms cover manufacturing defects for two years.",
+        "Returns are accepted within thirty days with a receipt.",
+        "Shipping is free for orders above fifty dollars.",
+        "SKU-4471 is the replacement filter kept in warehouse B.",
+        "Support is available on weekdays from nine to five.",
+    ]
+    for index, text in enumerate(texts):
+        vector = [0.0] * 768
+        vector[index] = 1.0
+        DocumentChunk.objects.create(document=document, chunk_index=index, text_content=text, embedding=vector)
+    return user, document
+
+
+@pytest.mark.django_db
+def test_hybrid_retrieval_finds_exact_identifier(catalog):
+    """
+    Scenario: The query embedding points at the warranty/returns chunks, but the question names SKU-4471.
+    Expected: Vector-only misses the SKU chunk in its top 2; hybrid brings it in.
+    """
+    user, document = catalog
+    chunks = DocumentChunk.objects.filter(document=document)
+    question = "Which warehouse has SKU-4471?"
+    query_vector = basis(1.0, 0.5)
+
+    vector_hits = retrieve_chunks(chunks, question, query_vector, top_k=2, mode='vector')
+    hybrid_hits = retrieve_chunks(chunks, question, query_vector, top_k=2, mode='hybrid')
+
+    assert [chunk.chunk_index for chunk in vector_hits] == [0, 1]
+    assert 3 in [chunk.chunk_index for chunk in hybrid_hits]
+    assert all(hasattr(chunk, 'distance') for chunk in hybrid_hits)
+
+
+@pytest.mark.django_db
+def test_ask_rejects_unknown_retrieval_mode(catalog, monkeypatch):
+    """
+    Scenario: A client asks with {"retrieval": "bm25"}.
+    Expected: 400 listing the valid modes, before any embedding work.
+    """
+    user, document = catalog
+    monkeypatch.setattr(views, 'get_query_embedding', lambda question: pytest.fail("should not embed"))
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    response = client.post(
+        f'/api/documents/{document.id}/ask/',
+        {"question": "Where is SKU-4471?", "retrieval": "bm25"},
+        format='json'
+    )
+
+    assert response.status_code == 400
+    assert "hybrid" in response.json()['error']
+
+
+@pytest.mark.django_db
+def test_filtered_vector_search_is_not_starved_by_other_owners(settings, tmp_path):
+    """
+    Scenario: Another owner has hundreds of chunks right next to the query; the asking owner has
+              ten chunks far from it, and the planner walks the HNSW index (as it does on a big table).
+    Expected: The owner still gets top_k of their own chunks, nearest first, although every row the
+              index scan returns first belongs to the other owner.
+    """
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.VECTOR_SEARCH_EF_SEARCH = 40
+    users = get_user_model().objects
+    crowd = users.create_user(username="crowd", email="crowd@test.com", password="password123")
+    owner = users.create_user(username="owner", email="owner@test.com", password="password123")
+
+    def corpus(user, vectors):
+        document = Document.objects.create(
+            title=user.username, file=SimpleUploadedFile("c.pdf", b"%PDF"), owner=user, status='completed'
+        )
+        DocumentChunk.objects.bulk_create([
+            DocumentChunk(document=document, chunk_index=index, text_content=f"chunk {index}", embedding=vector)
+            for index, vector in enumerate(vectors)
+        ])
+
+    corpus(crowd, [basis(1.0, 0.001 * index) for index in range(600)])
+    corpus(owner, [basis(0.0, 1.0, 0.1 * index) for index in range(10)])
+
+    with connection.cursor() as cursor:
+        # Only the HNSW index can return rows in distance order (ends with the test's transaction)
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute("SET LOCAL enable_sort = off")
+
+    chunks = DocumentChunk.objects.filter(document__owner=owner, document__status='completed')
+    hits = retrieve_chunks(chunks, "anything", basis(1.0), top_k=5, mode='vector')
+
+    assert [chunk.chunk_index for chunk in hits] == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.django_db
+def test_short_result_fallback_reads_only_the_filtered_rows(settings, tmp_path):
+    """
+    Scenario: A 3-chunk document is searched for top 5 in a table of 3000 chunks (so the fallback runs).
+    Expected: The fallback finds the document's chunks through the document_id index and sorts just those;
+              it never walks the HNSW index nor scans the whole chunk table.
+    """
+    settings.MEDIA_ROOT = str(tmp_path)
+    user = get_user_model().objects.create_user(username="small", email="small@test.com", password="password123")
+    big, small = (
+        Document.objects.create(title=title, file=SimpleUploadedFile("c.pdf", b"%PDF"), owner=user, status='completed')
+        for title in ("big", "small")
+    )
+    DocumentChunk.objects.bulk_create(
+        [DocumentChunk(document=big, chunk_index=i, text_content="c", embedding=basis(1.0, 0.001 * i))
+         for i in range(3000)]
+        + [DocumentChunk(document=small, chunk_index=i, text_content="c", embedding=basis(0.1 * i, 1.0))
+           for i in range(3)]
+    )
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE documents_documentchunk")
+
+    chunks = DocumentChunk.objects.filter(document=small)
+    plan = exact_nearest(chunks, basis(1.0), 5).explain()
+
+    assert "documents_documentchunk_document_id" in plan
+    assert "documentchunk_embedding_hnsw" not in plan
+    assert "Seq Scan on documents_documentchunk" not in plan
+    assert [chunk.chunk_index for chunk in retrieve_chunks(chunks, "q", basis(1.0), 5, mode='vector')] == [2, 1, 0]
@@ -0,0 +1,137 @@
+import threading
+from collections import Counter
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from documents import scheduler
+from documents.models import AnalysisJob, Document
+
+BULK, INTERACTIVE = AnalysisJob.PRIORITY_BULK, AnalysisJob.PRIORITY_INTERACTIVE
+
+
+def queue_documents(username, count, priority=BULK):
+    """`count` documents for a new user, scheduled at `priority` (no file needed: nothing runs them)."""
+    user = get_user_model().objects.create_user(username=username, email=f"{username}@test.com", password="pw")
+    documents = Document.objects.bulk_create(
+        [Document(title=f"{username} {n}", file=f"pdfs/{username}-{n}.pdf", owner=user) for n in range(count)]
+    )
+    scheduler.schedule(documents, priority)
+    return user, [document.id for document in documents]
+
+
+@pytest.mark.django_db
+def test_claim_serves_interactive_first_then_round_robin_within_caps(settings):
+    """
+    Scenario: Alice queued a 20-file backfill first, Bob 3 files after, Carol clicks analyze on one document.
+    Expected: Carol's job goes first, then Alice and Bob alternate, none past 2 running; freed slots refill fairly.
+    """
+    # 1. Setup: 5 slots, 2 per user
+    settings.ANALYSIS_MAX_IN_FLIGHT = 5
+    settings.ANALYSIS_MAX_IN_FLIGHT_PER_USER = 2
+    _, alice = queue_documents("alice", 20)
+    _, bob = queue_documents("bob", 3)
+    _, carol = queue_documents("carol", 1, priority=INTERACTIVE)
+
+    # 2. First dispatch fills every slot, fairly
+    assert scheduler.claim() == [carol[0], alice[0], bob[0], alice[1], bob[1]]
+    assert scheduler.claim() == []
+
+    # 3. Carol's and one of Alice's analyses finish: Bob is at his cap, so Alice gets one more
+    scheduler.release(carol[0])
+    scheduler.release(alice[0])
+    assert scheduler.claim() == [alice[2]]
+    assert Counter(AnalysisJob.objects.filter(state='running').values_list('owner__username', flat=True)) == {
+        "alice": 2, "bob": 2
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_dispatchers_never_claim_a_job_twice(settings):
+    """
+    Scenario: Eight dispatchers claim at the same moment, each on its own database connection.
+    Expected: Every claimed job is claimed once, and no user goes past the per-user cap.
+    """
+    # 1. Setup: 4 users x 10 queued documents, 3 slots each
+    settings.ANALYSIS_MAX_IN_FLIGHT = 100
+    settings.ANALYSIS_MAX_IN_FLIGHT_PER_USER = 3
+    for n in range(4):
+        queue_documents(f"user{n}", 10)
+
+    # 2. Race
+    start = threading.Barrier(8)
+    claimed, errors = [], []
+
+    def dispatcher():
+        try:
+            start.wait()
+            claimed.extend(scheduler.claim())
+        except Exception as e:  # Surfaced below; a thread can't fail the test itself
+            errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=dispatcher) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 3. Check
+    assert errors == []
+    assert len(claimed) == len(set(claimed)) == 12
+    running = AnalysisJob.objects.filter(state='running')
+    assert sorted(running.values_list('document_id', flat=True)) == sorted(claimed)
+    assert set(Counter(running.values_list('owner_id', flat=True)).values()) == {3}
+
+
+@pytest.mark.django_db
+def test_only_jobs_whose_heartbeat_stopped_are_requeued(settings, monkeypatch):
+    """
+    Scenario: Two analyses were claimed two hours ago (timeout: one hour); only one worker still sends heartbeats.
+    Expected: The silent job is queued again; the long but live one keeps running. Heartbeats are throttled.
+    """
+    # 1. Both claimed long ago
+    settings.ANALYSIS_JOB_TIMEOUT = 3600
+    settings.ANALYSIS_HEARTBEAT_INTERVAL = 60
+    monkeypatch.setattr(scheduler, '_last_beats', {})
+    _, (live, dead) = queue_documents("alice", 2)
+    assert sorted(scheduler.claim()) == sorted([live, dead])
+    long_ago = timezone.now() - timedelta(hours=2)
+    AnalysisJob.objects.update(claimed_at=long_ago, heartbeat_at=long_ago)
+
+    # 2. One worker reports progress; a second report within the interval writes nothing
+    scheduler.heartbeat(live)
+    beat = AnalysisJob.objects.get(document_id=live).heartbeat_at
+    scheduler.heartbeat(live)
+    assert AnalysisJob.objects.get(document_id=live).heartbeat_at == beat > long_ago
+
+    # 3. Requeue
+    scheduler.requeue_stale()
+    assert AnalysisJob.objects.get(document_id=live).state == 'running'
+    assert AnalysisJob.objects.get(document_id=dead).state == 'queued'
+
+
+@pytest.mark.django_db
+def test_analyze_all_queues_and_analyzes_every_pending_document(fake_ai, make_document, settings):
+    """
+    Scenario: A user with three pending documents calls analyze_all, with one analysis allowed at a time.
+    Expected: All three are analyzed (each finished job dispatches the next), and the queue ends empty.
+    """
+    settings.ANALYSIS_MAX_IN_FLIGHT_PER_USER = 1
+    page_text = "The supplier delivers the goods within ten business days. " * 10
+    documents = [make_document([page_text + str(n)], title=f"Contract {n}") for n in range(3)]
+    client = APIClient()
+    client.force_authenticate(user=documents[0].owner)
+
+    response = client.post('/api/documents/analyze_all/')
+
+    assert response.status_code == 202
+    assert response.json()["count"] == 3
+    assert set(Document.objects.values_list('status', flat=True)) == {'completed'}
+    assert len(fake_ai["summarized"]) == 3
+    assert not AnalysisJob.objects.exists()
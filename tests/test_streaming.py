@@ -0,0 +1,93 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+
+from documents import llm_utils, views
+from documents.fake_llm import FakeGroqClient
+from documents.models import Document, DocumentChunk
+from documents.streaming import stream_answer_response
+
+
+def parse_events(response):
+    """Turns an SSE body into a list of (event, data) tuples."""
+    body = b''.join(response.streaming_content).decode()
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_stream_answer_sends_sources_then_tokens(monkeypatch):
+    """
+    Scenario: An answer is streamed from the fake LLM.
+    Expected: 'sources' comes first, then one 'token' per piece, then 'done' with the full answer.
+    """
+    # 1. Fake LLM with a short reply
+    monkeypatch.setattr(llm_utils, 'client', FakeGroqClient(reply="Thirty days notice."))
+    chunk = SimpleNamespace(chunk_index=0, distance=0.1, text_content="Notice period is thirty days.")
+    completed = []
+
+    # 2. Stream it
+    response = stream_answer_response(
+        {"sources": [{"page": 1}]},
+        llm_utils.stream_answer("What is the notice period?", [chunk]),
+        on_complete=completed.append
+    )
+    events = parse_events(response)
+
+    # 3. Order and content
+    assert response['Content-Type'] == 'text/event-stream'
+    assert events[0] == ('sources', {"sources": [{"page": 1}]})
+    assert [data['text'] for event, data in events if event == 'token'] == ["Thirty ", "days ", "notice."]
+    assert events[-1] == ('done', {"answer": "Thirty days notice."})
+    assert completed == ["Thirty days notice."]
+
+
+@pytest.mark.django_db
+def test_ask_endpoint_streams_with_query_param(monkeypatch, settings, tmp_path):
+    """
+    Scenario: A user asks about a completed document with ?stream=1.
+    Expected: The response is an SSE stream with sources first and the fake LLM answer after.
+    """
+    # 1. Setup user, document and one chunk
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.ANSWER_CACHE_ENABLED = False
+    User = get_user_model()
+    user = User.objects.create_user(username="streamer", email="stream@test.com", password="password123")
+    document = Document.objects.create(
+        title="Lease",
+        file=SimpleUploadedFile("lease.pdf", b"%PDF fake"),
+        owner=user,
+        status='completed'
+    )
+    DocumentChunk.objects.create(
+        document=document,
+        chunk_index=0,
+        text_content="The tenant must give thirty days written notice before leaving the property.",
+        embedding=[0.1] * 768
+    )
+
+    monkeypatch.setattr(views, 'get_query_embedding', lambda question: [0.1] * 768)
+    monkeypatch.setattr(llm_utils, 'client', FakeGroqClient(reply="Thirty days."))
+
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    # 2. Ask in streaming mode
+    response = client.post(
+        f'/api/documents/{document.id}/ask/?stream=1',
+        {"question": "What is the notice period?"},
+        format='json'
+    )
+
+    # 3. Sources, then tokens, then done
+    assert response.status_code == 200
+    events = parse_events(response)
+    assert events[0][0] == 'sources'
+    assert events[0][1]['sources'][0]['page'] == 1
+    assert events[-1] == ('done', {"answer": "Thirty days."})
@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+
+from documents import summarization, tasks
+from documents.context_packing import EstimateTokenizer
+from documents.llm_client import LLMUnavailable
+from documents.pipeline import sliding_window_chunks
+from documents.summarization import SectionCache, iter_sections, map_sections
+from tests.utils import make_pdf
+
+TEXT = " ".join(f"Clause {i} sets out the obligations of the supplier." for i in range(600))
+
+
+class DictRedis:
+    """Just enough of redis.Redis for SectionCache."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+
+def test_sections_rebuild_the_text_within_budget():
+    """
+    Scenario: A long text is chunked with the 1000/200 sliding window, then cut into 500-token sections.
+    Expected: Sections hold the original text exactly once, each within the budget, the same on every run.
+    """
+    tokenizer = EstimateTokenizer()
+    chunks = list(sliding_window_chunks([TEXT]))
+
+    sections = list(iter_sections(chunks, 500, tokenizer))
+
+    assert len(sections) > 5
+    assert ''.join(''.join(sections).split()) == ''.join(TEXT.split())
+    assert all(tokenizer.count(section) <= 500 for section in sections)
+    assert list(iter_sections(chunks, 500, tokenizer)) == sections
+
+
+def test_map_sections_bounds_concurrency_and_keeps_order():
+    """
+    Scenario: Eight sections are summarized with a concurrency limit of 3, then summarized again.
+    Expected: Never more than 3 calls in flight, notes in section order; the second run is all cache hits.
+    """
+    sections = [f"section {i}" for i in range(8)]
+    in_flight, peak, lock = [0], [0], threading.Lock()
+
+    def summarize(text):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+        return f"notes on {text}"
+
+    cache = SectionCache(redis_client=DictRedis())
+    notes, cached = map_sections(iter(sections), summarize, cache, concurrency=3)
+    again, cached_again = map_sections(iter(sections), lambda text: pytest.fail("not cached"), cache, concurrency=3)
+
+    assert notes == again == [f"notes on section {i}" for i in range(8)]
+    assert peak[0] == 3
+    assert (cached, cached_again) == (0, 8)
+
+
+def test_map_sections_stops_at_the_first_failure():
+    """
+    Scenario: The LLM fails for good on the second of 50 sections.
+    Expected: LLMUnavailable reaches the caller and the remaining sections are never sent.
+    """
+    calls = []
+
+    def summarize(text):
+        calls.append(text)
+        if text == "section 1":
+            raise LLMUnavailable("down")
+        time.sleep(0.01)
+        return "notes"
+
+    with pytest.raises(LLMUnavailable):
+        map_sections((f"section {i}" for i in range(50)), summarize, SectionCache(), concurrency=2)
+
+    assert len(calls) < 10
+
+
+@pytest.mark.django_db
+def test_long_document_is_summarized_map_reduce_and_reuses_sections(fake_ai, make_document, settings, monkeypatch):
+    """
+    Scenario: A 30-page PDF (past the 15,000-char prefix) is analyzed, then its last page is rewritten.
+    Expected: Every section is summarized and combined; re-analysis only summarizes the changed tail.
+    """
+    # 1. Setup: small sections, an in-memory section cache
+    settings.SUMMARY_SECTION_TOKENS = 1000
+    cache = SectionCache(redis_client=DictRedis())
+    monkeypatch.setattr(summarization, 'get_section_cache', lambda: cache)
+    pages = [f"Page {n}. " + f"Section {n} describes warranty terms for product line {n}. " * 20 for n in range(30)]
+    document = make_document(pages)
+
+    # 2. First analysis covers the whole text, not the first 15,000 characters
+    tasks.analyze_document_task(document.id)
+    document.refresh_from_db()
+    sections = document.analysis_result['summary_sections']
+    assert document.status == 'completed'
+    assert sections == len(fake_ai["summarized"]) > 2
+    assert any("product line 29" in section for section in fake_ai["summarized"])
+    assert len(fake_ai["combined"][0]) == sections
+
+    # 3. Rewrite the last page: unchanged sections come from the cache
+    pages[-1] = "Page 29. " + "The warranty for this line was withdrawn. " * 20
+    with open(document.file.path, 'wb') as f:
+        f.write(make_pdf(pages))
+    tasks.analyze_document_task(document.id)
+
+    document.refresh_from_db()
+    assert document.status == 'completed'
+    assert document.analysis_result['cached_sections'] == sections - 1
+    assert len(fake_ai["summarized"]) == sections + 1
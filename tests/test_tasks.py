@@ -0,0 +1,269 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+
+from documents import tasks
+from documents.models import Document
+from tests.utils import make_pdf
+
+
+@pytest.mark.django_db
+def test_analyze_document_task_chunks_embeds_and_completes(fake_ai, make_document, settings):
+    """
+    Scenario: A 12-page PDF is analyzed in eager mode with 10-chunk shards.
+    Expected: Chunks are saved in order, every shard embeds its chunks, and the chord completes the document.
+    """
+    # 1. Setup
+    settings.EMBEDDING_BATCH_SIZE = 8
+    settings.EMBEDDING_SHARD_SIZE = 10
+    page_text = "The tenant shall give thirty days written notice before leaving. " * 20
+    document = make_document([f"Page {n}. {page_text}" for n in range(12)])
+
+    # 2. Run the task synchronously
+    tasks.analyze_document_task(document.id)
+
+    # 3. Check results
+    document.refresh_from_db()
+    chunk_indexes = list(document.chunks.order_by('chunk_index').values_list('chunk_index', flat=True))
+    assert document.status == 'completed'
+    assert document.content_version == 1
+    assert document.analysis_result['page_count'] == 12
+    assert document.analysis_result['chunk_count'] == len(chunk_indexes) > 8
+    assert chunk_indexes == list(range(len(chunk_indexes)))
+    assert document.analysis_result['embedded_count'] == len(chunk_indexes)
+    assert not document.chunks.filter(embedding__isnull=True).exists()
+    assert max(fake_ai["embedded"]) <= 8
+    assert fake_ai["summarized"][0].startswith("Page 0.")
+
+
+@pytest.mark.django_db
+def test_analyze_document_task_fails_on_empty_pdf(fake_ai, make_document):
+    """
+    Scenario: A PDF with no extractable text is analyzed.
+    Expected: Status is 'failed' with an error, and the LLM is never called.
+    """
+    document = make_document([""])
+
+    tasks.analyze_document_task(document.id)
+
+    document.refresh_from_db()
+    assert document.status == 'failed'
+    assert "No text" in document.analysis_result['error']
+    assert fake_ai["summarized"] == []
+
+
+@pytest.mark.django_db
+def test_failed_shard_marks_document_failed(fake_ai, make_document, monkeypatch, settings):
+    """
+    Scenario: One embedding shard raises (e.g. the model crashes mid-document).
+    Expected: The chord never completes the document; it ends up 'failed' with the error.
+    """
+    # 1. Embedding blows up on the second shard
+    settings.EMBEDDING_SHARD_SIZE = 5
+    calls = []
+
+    def flaky_get_embeddings(texts, batch_size=None):
+        calls.append(len(texts))
+        if len(calls) == 2:
+            raise RuntimeError("embedding worker crashed")
+        return [[0.1] * 768 for _ in texts]
+
+    monkeypatch.setattr(tasks, 'get_embeddings', flaky_get_embeddings)
+    page_text = "Clause text about payment terms and delivery schedules. " * 30
+    document = make_document([page_text for _ in range(6)])
+
+    # 2. Run
+    tasks.analyze_document_task(document.id)
+
+    # 3. Failed, not completed
+    document.refresh_from_db()
+    assert document.status == 'failed'
+    assert "embedding worker crashed" in document.analysis_result['error']
+
+
+@pytest.mark.django_db
+def test_pdf_is_parsed_before_the_chunk_transaction_opens(fake_ai, make_document, monkeypatch):
+    """
+    Scenario: A PDF is analyzed while every page read records how many transactions are open.
+    Expected: Pages are read at the caller's transaction depth, never inside the chunk-saving transaction.
+    """
+    extractor = tasks.get_extractor()
+    iter_pages = extractor.iter_pages
+    depths = []
+
+    def recording_pages(path):
+        for page in iter_pages(path):
+            depths.append(len(connection.atomic_blocks))
+            yield page
+
+    monkeypatch.setattr(extractor, 'iter_pages', recording_pages)
+    monkeypatch.setattr(tasks, 'get_extractor', lambda: extractor)
+    document = make_document(["Rent is due on the first day of each month. " * 20 for _ in range(3)])
+    outer_depth = len(connection.atomic_blocks)
+
+    tasks.analyze_document_task(document.id)
+
+    document.refresh_from_db()
+    assert document.status == 'completed'
+    assert depths == [outer_depth] * 3
+
+
+@pytest.mark.django_db
+def test_reanalyzing_unchanged_file_is_skipped(fake_ai, make_document):
+    """
+    Scenario: A completed document is analyzed again without its file changing.
+    Expected: Nothing is re-embedded or re-summarized; the old chunks and version stay.
+    """
+    # 1. First analysis
+    page_text = "The landlord keeps the deposit in a separate account. " * 20
+    document = make_document([page_text for _ in range(4)])
+    tasks.analyze_document_task(document.id)
+    chunk_ids = set(document.chunks.values_list('id', flat=True))
+    embedded_before = sum(fake_ai["embedded"])
+
+    # 2. Same file again
+    result = tasks.analyze_document_task(document.id)
+
+    # 3. Skipped entirely
+    document.refresh_from_db()
+    assert result["skipped"] is True
+    assert result["reused"] == len(chunk_ids)
+    assert document.status == 'completed'
+    assert document.content_version == 1
+    assert document.analysis_result['embedded_count'] == 0
+    assert set(document.chunks.values_list('id', flat=True)) == chunk_ids
+    assert sum(fake_ai["embedded"]) == embedded_before
+    assert len(fake_ai["summarized"]) == 1
+
+
+@pytest.mark.django_db
+def test_reanalyzing_changed_file_only_embeds_changed_chunks(fake_ai, make_document):
+    """
+    Scenario: The last page of an analyzed PDF is rewritten and the document is re-analyzed.
+    Expected: Chunks of the untouched pages keep their vectors; only the changed ones are encoded.
+    """
+    # 1. First analysis
+    page_text = "Payment is due on the first business day of each month. " * 20
+    pages = [f"Page {n}. {page_text}" for n in range(8)]
+    document = make_document(pages)
+    tasks.analyze_document_task(document.id)
+    first_embedded = sum(fake_ai["embedded"])
+
+    # 2. Rewrite the last page
+    pages[-1] = "Page 7. " + "Late payments carry a five percent penalty fee. " * 20
+    with open(document.file.path, 'wb') as f:
+        f.write(make_pdf(pages))
+
+    result = tasks.analyze_document_task(document.id)
+
+    # 3. Most chunks were reused, the rest re-embedded, and everything has a vector
+    document.refresh_from_db()
+    reembedded = sum(fake_ai["embedded"]) - first_embedded
+    assert document.status == 'completed'
+    assert document.content_version == 2
+    assert 0 < reembedded < first_embedded
+    assert result["reused"] == document.analysis_result['reused_count'] > 0
+    assert document.analysis_result['embedded_count'] == reembedded
+    assert document.analysis_result['reused_count'] + reembedded == document.chunks.count()
+    assert not document.chunks.filter(embedding__isnull=True).exists()
+
+
+@pytest.mark.django_db
+def test_duplicate_upload_copies_analysis_without_recomputing(fake_ai, make_document):
+    """
+    Scenario: A user uploads the same handbook twice under different titles; the first copy has been analyzed.
+    Expected: Both share one stored file, and the second gets its own copies of the
+              chunks and vectors without any extraction, embedding or LLM call.
+    """
+    # 1. Same bytes, same owner, different titles
+    pages = ["Employees accrue two vacation days per month of service. " * 20 for _ in range(3)]
+    original = make_document(pages, title="Handbook")
+    with original.file.open('rb') as f:
+        duplicate = Document.objects.create(
+            title="Employee Handbook",
+            file=SimpleUploadedFile("employee_handbook.pdf", f.read(), content_type="application/pdf"),
+            owner=original.owner
+        )
+    assert duplicate.file.name == original.file.name
+
+    tasks.analyze_document_task(original.id)
+    embedded_before = sum(fake_ai["embedded"])
+
+    # 2. Analyze the duplicate
+    result = tasks.analyze_document_task(duplicate.id)
+
+    # 3. Copied, not recomputed, into chunks of its own
+    original.refresh_from_db()
+    duplicate.refresh_from_db()
+    assert result["deduplicated"] is True
+    assert duplicate.status == 'completed'
+    assert duplicate.analysis_result['deduplicated'] is True
+    assert duplicate.analysis_result['insights'] == original.analysis_result['insights']
+    assert sum(fake_ai["embedded"]) == embedded_before
+    assert len(fake_ai["summarized"]) == 1
+    assert duplicate.chunks.count() == original.chunks.count()
+    assert not duplicate.chunks.filter(embedding__isnull=True).exists()
+    assert set(duplicate.chunks.values_list('id', flat=True)).isdisjoint(original.chunks.values_list('id', flat=True))
+
+
+@pytest.mark.django_db
+def test_duplicate_of_another_owners_file_copies_the_analysis(fake_ai, make_document):
+    """
+    Scenario: A second user uploads a handbook another user has already analyzed (default settings).
+    Expected: The analysis is copied across owners: nothing is embedded or summarized again.
+    """
+    pages = ["Employees accrue two vacation days per month of service. " * 20 for _ in range(3)]
+    original = make_document(pages, title="Handbook")
+    other_user = get_user_model().objects.create_user(username="other", email="other@test.com", password="password123")
+    with original.file.open('rb') as f:
+        duplicate = Document.objects.create(
+            title="Employee Handbook",
+            file=SimpleUploadedFile("employee_handbook.pdf", f.read(), content_type="application/pdf"),
+            owner=other_user
+        )
+
+    tasks.analyze_document_task(original.id)
+    embedded_before = sum(fake_ai["embedded"])
+
+    result = tasks.analyze_document_task(duplicate.id)
+
+    duplicate.refresh_from_db()
+    assert result["deduplicated"] is True
+    assert duplicate.status == 'completed'
+    assert sum(fake_ai["embedded"]) == embedded_before
+    assert len(fake_ai["summarized"]) == 1
+    assert duplicate.chunks.count() == original.chunks.count()
+
+
+@pytest.mark.django_db
+def test_duplicate_of_another_owners_file_is_analyzed_from_scratch_when_sharing_is_off(
+    fake_ai, make_document, settings
+):
+    """
+    Scenario: ANALYSIS_DEDUP_ACROSS_OWNERS is off; a second user uploads bytes another user has already analyzed.
+    Expected: The file is still stored once, but the analysis is not copied across owners (its speed
+              would reveal that someone else has the file): every chunk is embedded again.
+    """
+    settings.ANALYSIS_DEDUP_ACROSS_OWNERS = False
+    pages = ["Employees accrue two vacation days per month of service. " * 20 for _ in range(3)]
+    original = make_document(pages, title="Handbook")
+    other_user = get_user_model().objects.create_user(username="other", email="other@test.com", password="password123")
+    with original.file.open('rb') as f:
+        duplicate = Document.objects.create(
+            title="Employee Handbook",
+            file=SimpleUploadedFile("employee_handbook.pdf", f.read(), content_type="application/pdf"),
+            owner=other_user
+        )
+    assert duplicate.file.name == original.file.name
+
+    tasks.analyze_document_task(original.id)
+    embedded_before = sum(fake_ai["embedded"])
+
+    result = tasks.analyze_document_task(duplicate.id)
+
+    duplicate.refresh_from_db()
+    assert "deduplicated" not in result
+    assert duplicate.status == 'completed'
+    assert "deduplicated" not in duplicate.analysis_result
+    assert sum(fake_ai["embedded"]) - embedded_before == duplicate.chunks.count() > 0
@@ -0,0 +1,146 @@
+import numpy as np
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from documents import user_vectors
+from documents.caching import LRUCache
+from documents.models import Document, DocumentChunk
+from documents.retrieval import retrieve_chunks
+from documents.user_vectors import UserVectorIndex, get_user_index
+
+
+def test_search_matches_brute_force_cosine():
+    """
+    Scenario: 500 random normalized vectors are searched with argpartition.
+    Expected: Same ids, order and distances as sorting every cosine distance.
+    """
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((500, 768)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    ids = np.arange(1000, 1500)
+    query = rng.standard_normal(768)
+
+    hits = UserVectorIndex("fp", ids, matrix).search(query, 10)
+
+    distances = 1 - matrix @ (query / np.linalg.norm(query)).astype(np.float32)
+    expected = np.argsort(distances)[:10]
+    assert [chunk_id for chunk_id, _ in hits] == list(ids[expected])
+    assert np.allclose([distance for _, distance in hits], distances[expected], atol=1e-5)
+
+
+def test_lru_evicts_by_weight():
+    """
+    Scenario: A weight-bounded LRU holds 100 units and receives three 40-unit entries.
+    Expected: The oldest is evicted; an entry heavier than the limit is never stored.
+    """
+    cache = LRUCache(max_size=10, ttl=None, max_weight=100, weigh=len)
+
+    for key in ("a", "b", "c"):
+        cache.set(key, "x" * 40)
+    cache.set("huge", "x" * 101)
+
+    assert cache.get("a") is None
+    assert cache.get("b") and cache.get("c")
+    assert cache.get("huge") is None
+    assert cache.weight == 80
+
+
+@pytest.fixture
+def corpus(settings, tmp_path, monkeypatch):
+    """A user with two completed documents of 6 chunks each, and a fresh matrix cache."""
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    settings.USER_VECTOR_CACHE_ENABLED = True
+    settings.USER_VECTOR_CACHE_DIR = ''
+    monkeypatch.setattr(user_vectors, '_cache', None)
+
+    user = get_user_model().objects.create_user(username="matrix", email="m@test.com", password="password123")
+    rng = np.random.default_rng(1)
+
+    def add_document(title, status='completed'):
+        document = Document.objects.create(
+            title=title, file=SimpleUploadedFile(f"{title}.pdf", title.encode()), owner=user, status=status
+        )
+        for index in range(6):
+            DocumentChunk.objects.create(
+                document=document, chunk_index=index, text_content=f"{title} {index}",
+                embedding=rng.standard_normal(768).tolist()
+            )
+        return document
+
+    add_document("first")
+    add_document("second")
+
+    def completed_docs():
+        return list(Document.objects.filter(owner=user, status='completed').values_list('id', 'content_version'))
+
+    return user, add_document, completed_docs
+
+
+@pytest.mark.django_db
+def test_matrix_results_match_pgvector(corpus):
+    """
+    Scenario: global_ask-style retrieval runs once through pgvector and once through the user matrix.
+    Expected: The same chunks in the same order, with matching distances.
+    """
+    user, _, completed_docs = corpus
+    queryset = DocumentChunk.objects.filter(document__owner=user, document__status='completed')
+    query = np.random.default_rng(2).standard_normal(768).tolist()
+
+    from_db = retrieve_chunks(queryset, "q", query, top_k=5, mode='vector')
+    from_matrix = retrieve_chunks(queryset, "q", query, top_k=5, mode='vector',
+                                  vector_index=get_user_index(user.id, completed_docs()))
+
+    assert [chunk.id for chunk in from_matrix] == [chunk.id for chunk in from_db]
+    assert np.allclose([chunk.distance for chunk in from_matrix], [float(chunk.distance) for chunk in from_db],
+                       atol=1e-4)
+
+
+@pytest.mark.django_db
+def test_matrix_is_reused_until_documents_change(corpus, django_assert_num_queries):
+    """
+    Scenario: The same user asks twice, then a third document completes.
+    Expected: The second lookup hits no database; the new fingerprint triggers a rebuild with 18 rows.
+    """
+    user, add_document, completed_docs = corpus
+    docs = completed_docs()
+    first = get_user_index(user.id, docs)
+
+    with django_assert_num_queries(0):
+        assert get_user_index(user.id, docs) is first
+
+    add_document("third")
+    rebuilt = get_user_index(user.id, completed_docs())
+    assert rebuilt is not first
+    assert len(rebuilt.ids) == 18
+
+
+@pytest.mark.django_db
+def test_large_corpus_falls_back_to_pgvector(corpus, settings):
+    """
+    Scenario: The user has 12 chunks but the matrix limit is 10.
+    Expected: No matrix is built (None), so global_ask keeps using pgvector.
+    """
+    user, _, completed_docs = corpus
+    settings.USER_VECTOR_CACHE_MAX_CHUNKS = 10
+
+    assert get_user_index(user.id, completed_docs()) is None
+
+
+@pytest.mark.django_db
+def test_matrix_is_memory_mapped_from_disk(corpus, settings, tmp_path, monkeypatch, django_assert_num_queries):
+    """
+    Scenario: USER_VECTOR_CACHE_DIR is set and a second process (empty LRU) needs the same matrix.
+    Expected: It is memory-mapped from the saved .npy file without querying the database.
+    """
+    user, _, completed_docs = corpus
+    settings.USER_VECTOR_CACHE_DIR = str(tmp_path / "vectors")
+    docs = completed_docs()
+    get_user_index(user.id, docs)
+
+    monkeypatch.setattr(user_vectors, '_cache', None)  # A fresh worker process
+    with django_assert_num_queries(0):
+        index = get_user_index(user.id, docs)
+
+    assert isinstance(index.matrix, np.memmap)
+    assert len(index.ids) == 12
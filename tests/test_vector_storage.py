@@ -0,0 +1,105 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+
+from documents.management.commands import vector_storage
+from documents.models import Document, DocumentChunk
+from documents.vector_search import nearest
+
+
+def test_binary_storage_searches_bits_then_reranks_exactly(settings):
+    """
+    Scenario: A nearest-neighbour query is built with VECTOR_STORAGE='binary'.
+    Expected: Hamming distance over binary_quantize() picks OVERSAMPLE x k candidates; cosine orders the final k.
+    """
+    settings.VECTOR_BINARY_OVERSAMPLE = 4
+
+    sql = str(nearest(DocumentChunk.objects.all(), [0.1] * 768, 5, storage='binary').query)
+
+    assert "binary_quantize" in sql and "<~>" in sql
+    assert "LIMIT 20" in sql
+    assert sql.rstrip().endswith("LIMIT 5")
+
+
+def test_halfvec_storage_casts_both_sides():
+    """
+    Scenario: A query is built with VECTOR_STORAGE='halfvec'.
+    Expected: Column and query vector are both cast to halfvec(768), matching the expression index.
+    """
+    sql = str(nearest(DocumentChunk.objects.all(), [0.1] * 768, 5, storage='halfvec').query)
+
+    assert '("documents_documentchunk"."embedding")::halfvec(768) <=>' in sql
+
+
+@pytest.mark.django_db
+def test_enable_refuses_old_pgvector(monkeypatch):
+    """
+    Scenario: The database runs pgvector 0.6, which has no halfvec type.
+    Expected: enable stops with a clear error instead of failing halfway through.
+    """
+    monkeypatch.setattr(vector_storage.Command, '_extension_version', lambda self: '0.6.2')
+
+    with pytest.raises(CommandError, match="pgvector >= 0.7.0"):
+        call_command('vector_storage', 'enable', 'halfvec')
+
+
+@pytest.mark.django_db
+def test_benchmark_reports_full_index(settings, tmp_path, capsys):
+    """
+    Scenario: The benchmark runs on a small corpus with only the default index.
+    Expected: Sizes are listed, missing compact indexes are skipped, and the full index has perfect recall.
+    """
+    settings.MEDIA_ROOT = str(tmp_path)
+    user = get_user_model().objects.create_user(username="bench", email="b@test.com", password="password123")
+    document = Document.objects.create(title="Doc", file=SimpleUploadedFile("d.pdf", b"%PDF d"), owner=user)
+    for index in range(12):
+        vector = [0.0] * 768
+        vector[index] = 1.0
+        vector[-1] = (index + 1) / 12  # No two neighbours at the same distance, so the top k is unambiguous
+        DocumentChunk.objects.create(document=document, chunk_index=index, text_content=f"chunk {index}", embedding=vector)
+
+    with connection.cursor() as cursor:
+        # Drop the entries of rows other tests rolled back; they would use up the ef_search budget
+        cursor.execute("REINDEX INDEX documentchunk_embedding_hnsw")
+
+    call_command('vector_storage', 'benchmark', k=3, queries=5)
+
+    output = capsys.readouterr().out
+    assert "not built" in output
+    assert "full     index=" in output
+    assert "recall@k=1.000" in output
+
+
+@pytest.mark.django_db
+def test_recall_reports_owner_and_document_scopes(settings, tmp_path, capsys):
+    """
+    Scenario: Two owners' completed documents are measured with vector_recall.
+    Expected: Recall is reported for the whole table and for the owner and document filters ask/global_ask use.
+    """
+    settings.MEDIA_ROOT = str(tmp_path)
+    for owner_index in range(2):
+        user = get_user_model().objects.create_user(
+            username=f"recall{owner_index}", email=f"r{owner_index}@test.com", password="password123"
+        )
+        document = Document.objects.create(
+            title="Doc", file=SimpleUploadedFile("d.pdf", b"%PDF d"), owner=user, status='completed'
+        )
+        for index in range(6):
+            vector = [0.0] * 768
+            vector[owner_index * 6 + index] = 1.0
+            vector[-1] = (owner_index * 6 + index + 1) / 12
+            DocumentChunk.objects.create(document=document, chunk_index=index, text_content="chunk", embedding=vector)
+
+    with connection.cursor() as cursor:
+        cursor.execute("REINDEX INDEX documentchunk_embedding_hnsw")  # See test_benchmark_reports_full_index
+
+    call_command('vector_recall', k=3, queries=4, ef_search='40')
+
+    output = capsys.readouterr().out
+    assert "Corpus: 12 chunks, 4 queries, k=3" in output
+    for scope in ("all", "owner", "document"):
+        assert f"\n{scope}\n  exact" in output
+    assert output.count("ef_search=40") == 3
+    assert output.count("recall@k=1.000") == 6
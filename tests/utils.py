@@ -0,0 +1,10 @@
+import fitz  # PyMuPDF
+
+
+def make_pdf(pages):
+    """Builds a real PDF in memory with one text block per page."""
+    pdf = fitz.open()
+    for text in pages:
+        page = pdf.new_page()
+        page.insert_textbox(fitz.Rect(36, 36, 560, 800), text, fontsize=8)
+    return pdf.tobytes()